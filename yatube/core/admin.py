@@ -0,0 +1,29 @@
+from django.contrib import admin
+from django.utils import timezone
+
+from yatube.settings import EMPTY_VALUE_DISPLAY
+
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = (
+        'pk', 'name', 'status', 'priority', 'attempts', 'run_after', 'worker'
+    )
+    list_filter = ('status', 'name')
+    search_fields = ('dedup_key',)
+    actions = ('retry',)
+    empty_value_display = EMPTY_VALUE_DISPLAY
+
+    def retry(self, request, queryset):
+        # Если такая же задача уже ждёт в очереди, вторая не нужна
+        waiting = Job.objects.filter(
+            status=Job.PENDING, dedup_key__isnull=False
+        ).values('dedup_key')
+        queryset.filter(status=Job.FAILED).exclude(
+            dedup_key__in=waiting
+        ).update(
+            status=Job.PENDING, attempts=0, run_after=timezone.now()
+        )
+    retry.short_description = 'Повторить упавшие задачи'
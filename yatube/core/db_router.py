@@ -0,0 +1,58 @@
+import random
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+_state = threading.local()
+
+
+def is_pinned():
+    return getattr(_state, 'pinned', 0) > 0
+
+
+@contextmanager
+def primary():
+    """Все чтения внутри блока идут в основную базу."""
+    _state.pinned = getattr(_state, 'pinned', 0) + 1
+    try:
+        yield
+    finally:
+        _state.pinned -= 1
+
+
+def reset_writes():
+    _state.wrote = False
+
+
+def has_written():
+    return getattr(_state, 'wrote', False)
+
+
+class ReplicaRouter:
+    """Чтение из реплик, запись в основную базу.
+
+    Читать из основной базы приходится, когда чтения закреплены
+    за ней через primary() (например, сразу после записи того же
+    пользователя) и внутри транзакции: в реплике ещё нет того,
+    что транзакция успела записать.
+    """
+
+    def db_for_read(self, model, **hints):
+        replicas = settings.DATABASE_REPLICAS
+        if (
+            not replicas
+            or is_pinned()
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        _state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики хранят те же данные, что и основная база
+        return True
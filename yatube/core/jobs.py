@@ -0,0 +1,185 @@
+"""Фоновая очередь задач в базе данных.
+
+Задача - функция, помеченная декоратором task. Модули jobs приложений
+загружает CoreConfig.ready, прочие задачи регистрируются при импорте
+своих модулей. Вызов task.delay(...) ставит задачу в таблицу Job после
+коммита текущей транзакции: если запрос откатится, задача не появится.
+Аргументы хранятся в JSON.
+
+Команда run_jobs разбирает очередь несколькими процессами. Задача
+захватывается условным UPDATE, поэтому два обработчика не возьмут
+одну и ту же. Упавшая задача повторяется с растущей паузой, пока не
+кончатся попытки. Задача, чей обработчик умер, через JOB_TIMEOUT
+секунд считается упавшей попыткой и тоже повторяется с паузой: так
+задача, которая роняет обработчик, не крутится бесконечно.
+
+Задачи выполняются в другом процессе, чем запросы, поэтому кэш,
+который они сбрасывают, должен быть общим для всех процессов.
+"""
+import json
+import logging
+import random
+import threading
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from core.models import Job
+
+logger = logging.getLogger(__name__)
+
+registry = {}
+
+# Сколько кандидатов читать за раз при захвате задачи
+CLAIM_BATCH = 10
+
+
+class WorkerLost(Exception):
+    """Обработчик не завершил задачу за JOB_TIMEOUT."""
+
+
+class Task:
+    def __init__(self, func, name, priority, max_attempts):
+        self.func = func
+        self.name = name
+        self.priority = priority
+        self.max_attempts = max_attempts
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def delay(self, *args, priority=None, dedup_key=None, run_after=None,
+              **kwargs):
+        """Ставит задачу в очередь после коммита транзакции."""
+        transaction.on_commit(lambda: self.enqueue(
+            args, kwargs, priority, dedup_key, run_after
+        ))
+
+    def enqueue(self, args=(), kwargs=None, priority=None, dedup_key=None,
+                run_after=None):
+        """Сразу записывает задачу; дубль по dedup_key даёт None."""
+        job = Job(
+            name=self.name,
+            arguments=json.dumps([list(args), kwargs or {}]),
+            priority=self.priority if priority is None else priority,
+            dedup_key=dedup_key,
+            max_attempts=self.max_attempts or settings.JOB_MAX_ATTEMPTS,
+            run_after=run_after or timezone.now(),
+        )
+        try:
+            with transaction.atomic():
+                job.save()
+        except IntegrityError:
+            if dedup_key is None:
+                raise
+            return None
+        return job
+
+
+def task(name=None, priority=0, max_attempts=None):
+    """Регистрирует функцию как фоновую задачу.
+
+    Чем больше priority, тем раньше задача выполняется.
+    """
+    def decorator(func):
+        task_name = name or f'{func.__module__}.{func.__name__}'
+        registry[task_name] = Task(func, task_name, priority, max_attempts)
+        return registry[task_name]
+    return decorator
+
+
+def claim(worker):
+    """Захватывает следующую задачу или возвращает None."""
+    now = timezone.now()
+    stale = now - timedelta(seconds=settings.JOB_TIMEOUT)
+    candidates = Job.objects.filter(
+        Q(status=Job.PENDING, run_after__lte=now)
+        | Q(status=Job.RUNNING, started__lt=stale)
+    ).order_by('-priority', 'run_after', 'id').values_list(
+        'id', 'status', 'started', 'worker'
+    )[:CLAIM_BATCH]
+    for job_id, status, started, previous in candidates:
+        # Строку мог захватить другой обработчик: тогда UPDATE
+        # не найдёт её в прежнем состоянии
+        if not Job.objects.filter(
+            id=job_id, status=status, started=started
+        ).update(status=Job.RUNNING, started=now, worker=worker):
+            continue
+        job = Job.objects.get(id=job_id)
+        if status == Job.RUNNING:
+            _fail(job, WorkerLost(
+                f'Обработчик {previous} не завершил задачу '
+                f'за {settings.JOB_TIMEOUT} с'
+            ))
+            continue
+        return job
+    return None
+
+
+def backoff(attempts):
+    """Пауза перед следующей попыткой: растёт вдвое, с разбросом."""
+    delay = min(
+        settings.JOB_RETRY_DELAY * 2 ** (attempts - 1),
+        settings.JOB_RETRY_MAX_DELAY,
+    )
+    return timedelta(seconds=delay * random.uniform(1, 1.25))
+
+
+def _fail(job, error):
+    job.attempts += 1
+    job.last_error = ''.join(traceback.format_exception(
+        type(error), error, error.__traceback__
+    ))
+    if job.attempts >= job.max_attempts:
+        job.status = Job.FAILED
+        logger.error('Задача %s %s не выполнена: %s', job.id, job.name, error)
+    else:
+        job.status = Job.PENDING
+        job.run_after = timezone.now() + backoff(job.attempts)
+        logger.warning('Задача %s %s упала, попытка %s: %s',
+                       job.id, job.name, job.attempts, error)
+    try:
+        with transaction.atomic():
+            job.save(update_fields=(
+                'attempts', 'last_error', 'status', 'run_after'
+            ))
+    except IntegrityError:
+        # Пока задача выполнялась, в очередь встала такая же
+        job.delete()
+
+
+def perform(job):
+    """Выполняет захваченную задачу; удачную удаляет из очереди."""
+    try:
+        registered = registry[job.name]
+        args, kwargs = json.loads(job.arguments)
+        registered.func(*args, **kwargs)
+    except Exception as error:
+        _fail(job, error)
+        return False
+    job.delete()
+    return True
+
+
+def work(worker, once=False, poll=None, stop=None):
+    """Цикл обработчика: выполняет задачи, пока не попросят остановиться.
+
+    С once выходит, когда доступных задач не осталось.
+    Возвращает число выполненных задач.
+    """
+    poll = settings.JOB_POLL_INTERVAL if poll is None else poll
+    stop = stop or threading.Event()
+    done = 0
+    while not stop.is_set():
+        job = claim(worker)
+        if job is None:
+            if once:
+                break
+            stop.wait(poll)
+            continue
+        done += perform(job)
+    return done
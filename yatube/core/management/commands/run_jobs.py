@@ -0,0 +1,87 @@
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from core.jobs import work
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def run_worker(once, poll, stop):
+    # Останавливает родитель через stop: начатая задача доделывается
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    try:
+        work(worker_name(), once=once, poll=poll, stop=stop)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Выполняет фоновые задачи из очереди в нескольких процессах'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes',
+            type=int,
+            default=settings.JOB_WORKERS,
+            help='Сколько процессов выполняют задачи, 1 - в этом процессе',
+        )
+        parser.add_argument(
+            '--poll',
+            type=float,
+            default=settings.JOB_POLL_INTERVAL,
+            help='Пауза в секундах, когда очередь пуста',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Выйти, когда доступных задач не останется',
+        )
+
+    def stop_on_signals(self, stop):
+        def shutdown(signum, frame):
+            self.stdout.write('Останавливаемся после текущих задач')
+            stop.set()
+
+        signal.signal(signal.SIGINT, shutdown)
+        signal.signal(signal.SIGTERM, shutdown)
+
+    def handle(self, *args, **options):
+        if options['processes'] <= 1:
+            stop = threading.Event()
+            if not options['once']:
+                self.stop_on_signals(stop)
+            done = work(
+                worker_name(), once=options['once'], poll=options['poll'],
+                stop=stop,
+            )
+            self.stdout.write(self.style.SUCCESS(
+                f'Готово, выполнено задач: {done}'
+            ))
+            return
+        stop = multiprocessing.Event()
+        # Дочерние процессы не должны делить соединения с родителем
+        connections.close_all()
+        processes = [
+            multiprocessing.Process(
+                target=run_worker,
+                args=(options['once'], options['poll'], stop),
+            )
+            for _ in range(options['processes'])
+        ]
+        for process in processes:
+            process.start()
+        self.stdout.write(f'Запущено обработчиков: {len(processes)}')
+        self.stop_on_signals(stop)
+        for process in processes:
+            process.join()
+        self.stdout.write(self.style.SUCCESS('Обработчики остановлены'))
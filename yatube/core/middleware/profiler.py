@@ -0,0 +1,38 @@
+import random
+import threading
+import time
+
+from django.conf import settings
+
+from core import profiler
+
+
+class ProfilerMiddleware:
+    """Профилирует часть запросов и копит стеки по view.
+
+    В выборку попадает доля PROFILER_SAMPLE_RATE запросов. Если задан
+    PROFILER_SLOW_MS, профилируются все запросы, но сохраняются только
+    вошедшие в выборку и те, что шли дольше порога.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        sampled = random.random() < settings.PROFILER_SAMPLE_RATE
+        slow_ms = settings.PROFILER_SLOW_MS
+        if not sampled and slow_ms is None:
+            return self.get_response(request)
+        thread_id = threading.get_ident()
+        profiler.sampler.register(thread_id, self.__call__.__code__)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            samples = profiler.sampler.unregister(thread_id)
+        duration = time.perf_counter() - started
+        if samples and (sampled or duration * 1000 >= slow_ms):
+            match = getattr(request, 'resolver_match', None)
+            view = match.view_name if match else request.path
+            profiler.record(view, request.path, duration, samples)
+        return response
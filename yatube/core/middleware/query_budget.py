@@ -0,0 +1,65 @@
+import logging
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(Exception):
+    """View сделал больше запросов к БД, чем заявлено."""
+
+
+def query_budget(number):
+    """Заявляет, сколько запросов к БД может сделать view."""
+    def decorator(view_func):
+        view_func.query_budget = number
+        return view_func
+    return decorator
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class QueryBudgetMiddleware:
+    """Следит за числом запросов view с заявленным бюджетом.
+
+    Считаются запросы ко всем базам, в том числе к репликам.
+    При превышении пишет предупреждение в лог, а с настройкой
+    QUERY_BUDGET_RAISE (её включают тесты) бросает исключение.
+    С настройкой QUERY_COUNT_HEADER отдаёт число запросов заголовком.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counter = QueryCounter()
+        with ExitStack() as stack:
+            for alias_connection in connections.all():
+                stack.enter_context(
+                    alias_connection.execute_wrapper(counter)
+                )
+            response = self.get_response(request)
+        budget = getattr(request, 'query_budget', None)
+        if budget is not None and counter.count > budget:
+            message = (
+                f'{request.path}: {counter.count} запросов к БД '
+                f'при бюджете {budget}'
+            )
+            if settings.QUERY_BUDGET_RAISE:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        if settings.QUERY_COUNT_HEADER:
+            response['X-Query-Count'] = str(counter.count)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.query_budget = getattr(view_func, 'query_budget', None)
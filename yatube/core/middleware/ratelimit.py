@@ -0,0 +1,24 @@
+from core import ratelimit
+
+
+class RateLimitMiddleware:
+    """Лимиты RATE_LIMITS для view без декоратора rate_limit.
+
+    Область - имя URL вида 'users:login'. View с декоратором
+    проверяет свой лимит сам, второй раз токен не берётся.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if hasattr(view_func, 'rate_limit_scope'):
+            return None
+        scope = request.resolver_match.view_name
+        limit = ratelimit.get_limit(scope)
+        if limit is None:
+            return None
+        return ratelimit.check(request, scope, limit)
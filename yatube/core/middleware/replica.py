@@ -0,0 +1,41 @@
+from django.conf import settings
+
+from core.db_router import has_written, primary, reset_writes
+
+PIN_COOKIE = 'use_primary_db'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class ReplicaPinMiddleware:
+    """Закрепляет чтения за основной базой после записи.
+
+    Небезопасные запросы целиком читают из основной базы. Если запрос
+    что-то записал, клиент получает куку на REPLICA_PIN_SECONDS
+    секунд, и пока она жива, его запросы тоже не ходят в реплики:
+    пользователь сразу видит свой пост или комментарий, даже если
+    реплика отстаёт.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.DATABASE_REPLICAS:
+            return self.get_response(request)
+        pinned = (
+            request.method not in SAFE_METHODS
+            or PIN_COOKIE in request.COOKIES
+        )
+        reset_writes()
+        if pinned:
+            with primary():
+                response = self.get_response(request)
+        else:
+            response = self.get_response(request)
+        if has_written():
+            response.set_cookie(
+                PIN_COOKIE, '1',
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True,
+            )
+        return response
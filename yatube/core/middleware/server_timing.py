@@ -0,0 +1,34 @@
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from core import timing
+
+
+class ServerTimingMiddleware:
+    """Отдаёт заголовком Server-Timing, на что ушло время запроса.
+
+    Метрики: db (запросы ко всем базам), cache-get и cache-set,
+    template и thumbnail. В desc - число операций. Метрики
+    пересекаются: запросы из шаблона входят и в db, и в template.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.SERVER_TIMING:
+            return self.get_response(request)
+        started = time.perf_counter()
+        with timing.collect() as timings, ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(
+                    connection.execute_wrapper(timing.QueryTimer())
+                )
+            response = self.get_response(request)
+        response['Server-Timing'] = timings.header(
+            time.perf_counter() - started
+        )
+        return response
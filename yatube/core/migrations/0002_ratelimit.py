@@ -0,0 +1,46 @@
+# Generated by Django 2.2.16 on 2026-10-18 19:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RateLimitRejection',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(max_length=200, unique=True, verbose_name='Область')),
+                ('rejected', models.PositiveIntegerField(default=0, verbose_name='Отказов')),
+            ],
+            options={
+                'verbose_name': 'Отказы лимита запросов',
+                'verbose_name_plural': 'Отказы лимитов запросов',
+            },
+        ),
+        migrations.CreateModel(
+            name='RateLimitWindow',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=255, verbose_name='Область и клиент')),
+                ('expires', models.BigIntegerField(verbose_name='Конец окна, секунды Unix')),
+                ('hits', models.PositiveIntegerField(default=0, verbose_name='Запросов')),
+            ],
+            options={
+                'verbose_name': 'Окно лимита запросов',
+                'verbose_name_plural': 'Окна лимитов запросов',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='ratelimitwindow',
+            index=models.Index(fields=['expires'], name='core_rateli_expires_69e03a_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='ratelimitwindow',
+            constraint=models.UniqueConstraint(fields=('key', 'expires'), name='unique_rate_limit_window'),
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 
 
 class CreatedModel(models.Model):
@@ -10,3 +11,81 @@ class CreatedModel(models.Model):
 
     class Meta:
         abstract = True
+
+
+class Job(CreatedModel):
+    """Задача фоновой очереди, её выполняет команда run_jobs.
+
+    Выполненные задачи удаляются, в таблице остаются ждущие,
+    выполняемые и упавшие после всех попыток.
+    """
+    PENDING = 'pending'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (FAILED, 'Ошибка'),
+    )
+
+    name = models.CharField('Задача', max_length=200)
+    arguments = models.TextField('Аргументы', default='[[], {}]')
+    priority = models.SmallIntegerField('Приоритет', default=0)
+    # Пока в очереди ждёт задача с тем же ключом, такая же не ставится
+    dedup_key = models.CharField(
+        'Ключ дедупликации', max_length=200, null=True, blank=True
+    )
+    status = models.CharField(
+        'Состояние', max_length=10, choices=STATUSES, default=PENDING
+    )
+    attempts = models.PositiveSmallIntegerField('Попыток', default=0)
+    max_attempts = models.PositiveSmallIntegerField('Наибольшее число попыток')
+    run_after = models.DateTimeField('Не раньше', default=timezone.now)
+    started = models.DateTimeField('Начало выполнения', null=True, blank=True)
+    worker = models.CharField('Обработчик', max_length=100, blank=True)
+    last_error = models.TextField('Последняя ошибка', blank=True)
+
+    class Meta:
+        verbose_name = 'Фоновая задача'
+        verbose_name_plural = 'Фоновые задачи'
+        indexes = [models.Index(fields=('status', '-priority', 'run_after'))]
+        constraints = [
+            models.UniqueConstraint(
+                fields=('dedup_key',),
+                condition=models.Q(status='pending'),
+                name='unique_pending_job',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.name} ({self.get_status_display()})'
+
+
+class RateLimitWindow(models.Model):
+    """Запросы клиента к области лимита за одно окно.
+
+    Строки прошедших окон удаляются, когда заводится новое окно.
+    """
+    key = models.CharField('Область и клиент', max_length=255)
+    expires = models.BigIntegerField('Конец окна, секунды Unix')
+    hits = models.PositiveIntegerField('Запросов', default=0)
+
+    class Meta:
+        verbose_name = 'Окно лимита запросов'
+        verbose_name_plural = 'Окна лимитов запросов'
+        indexes = [models.Index(fields=('expires',))]
+        constraints = [
+            models.UniqueConstraint(
+                fields=('key', 'expires'), name='unique_rate_limit_window'
+            ),
+        ]
+
+
+class RateLimitRejection(models.Model):
+    """Сколько запросов отклонил лимит области."""
+    scope = models.CharField('Область', max_length=200, unique=True)
+    rejected = models.PositiveIntegerField('Отказов', default=0)
+
+    class Meta:
+        verbose_name = 'Отказы лимита запросов'
+        verbose_name_plural = 'Отказы лимитов запросов'
@@ -0,0 +1,174 @@
+import base64
+import binascii
+
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+def seek(queryset, keys, cursor=None, newer=False):
+    """Записи за курсором по ключу keys, ближайшие к курсору первыми.
+
+    Без newer - старше курсора по убыванию ключа, с newer - новее
+    по возрастанию. Без курсора - с самого начала.
+    """
+    date_key, id_key = keys
+    order = (date_key, id_key) if newer else (f'-{date_key}', f'-{id_key}')
+    if cursor is None:
+        return queryset.order_by(*order)
+    date, pk = cursor
+    lookup = 'gt' if newer else 'lt'
+    return queryset.filter(
+        Q(**{f'{date_key}__{lookup}': date})
+        | Q(**{date_key: date, f'{id_key}__{lookup}': pk})
+    ).order_by(*order)
+
+
+class CursorWindow:
+    """Ленивое окно записей страницы для навигации.
+
+    Одним запросом выбирает per_page + 1 строк: лишняя строка говорит
+    о том, что дальше есть ещё записи, а крайние строки дают курсоры.
+    Заменяет COUNT(*) обычного Paginator и, как и он, не трогает
+    page_obj.object_list: тот остаётся ленивым QuerySet.
+    """
+
+    def __init__(self, queryset, per_page, reverse=False):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.reverse = reverse
+        self._rows = None
+        self._has_more = False
+
+    def _fetch(self):
+        if self._rows is None:
+            rows = list(self.queryset[:self.per_page + 1])
+            self._has_more = len(rows) > self.per_page
+            rows = rows[:self.per_page]
+            if self.reverse:
+                rows.reverse()
+            self._rows = rows
+        return self._rows
+
+    def has_more(self):
+        self._fetch()
+        return self._has_more
+
+    def __len__(self):
+        return len(self._fetch())
+
+    def __iter__(self):
+        return iter(self._fetch())
+
+    def __getitem__(self, index):
+        return self._fetch()[index]
+
+
+class CursorPaginator(Paginator):
+    """Пагинатор по ключу (created, id).
+
+    Не делает COUNT(*) и не сканирует OFFSET: следующая страница
+    выбирается условием «старше последней записи текущей страницы».
+    Возвращает обычный Page, поэтому шаблоны работают с page_obj
+    как раньше; ссылки строятся по page_obj.next_cursor и
+    page_obj.previous_cursor.
+    """
+
+    def __init__(self, object_list, per_page, keys=('created', 'id')):
+        super().__init__(object_list, per_page)
+        self.keys = keys
+        self.number = 1
+        self.window = CursorWindow(self.object_list.none(), per_page)
+        self.has_older = self.window.has_more
+
+    @property
+    def num_pages(self):
+        # Page считает has_next/has_previous по num_pages, поэтому
+        # вместо честного подсчёта страниц отдаём «номер + 1»,
+        # если старше текущей страницы ещё есть записи.
+        return self.number + 1 if self.has_older() else self.number
+
+    def encode_cursor(self, obj):
+        date_key, id_key = self.keys
+        value = f'{getattr(obj, date_key).isoformat()}|{getattr(obj, id_key)}'
+        return base64.urlsafe_b64encode(value.encode()).decode()
+
+    @staticmethod
+    def decode_cursor(cursor):
+        if not cursor:
+            return None
+        try:
+            value = base64.urlsafe_b64decode(cursor.encode()).decode()
+            date, pk = value.rsplit('|', 1)
+            date = parse_datetime(date)
+            pk = int(pk)
+        except (binascii.Error, UnicodeError, ValueError):
+            return None
+        if date is None:
+            return None
+        return date, pk
+
+    def next_cursor(self):
+        """Курсор на записи старше текущей страницы."""
+        if not self.has_older() or not len(self.window):
+            return ''
+        return self.encode_cursor(self.window[-1])
+
+    def previous_cursor(self):
+        """Курсор на записи новее текущей страницы."""
+        if self.number == 1 or not len(self.window):
+            return ''
+        return self.encode_cursor(self.window[0])
+
+    def _older(self, cursor):
+        return seek(self.object_list, self.keys, cursor)
+
+    def _newer(self, cursor):
+        return seek(self.object_list, self.keys, cursor, newer=True)
+
+    def _first(self, number):
+        offset = (number - 1) * self.per_page
+        return seek(self.object_list, self.keys)[offset:]
+
+    def get_cursor_page(self, query, lazy=True):
+        """Страница по параметрам запроса after/before.
+
+        Старый параметр page поддерживается, чтобы не ломать ссылки,
+        но дальше навигация идёт уже по курсору. С lazy=False записи
+        страницы берутся из того же запроса, что и навигация: выходит
+        один запрос вместо двух, но страница читается сразу.
+        """
+        after = self.decode_cursor(query.get('after'))
+        before = self.decode_cursor(query.get('before'))
+        if before:
+            # Страницу «новее» приходится читать сразу: от результата
+            # зависит, первая это страница или нет.
+            self.window = CursorWindow(
+                self._newer(before), self.per_page, reverse=True
+            )
+            if not len(self.window):
+                return self.get_cursor_page({})
+            self.number = 2 if self.window.has_more() else 1
+            self.has_older = lambda: True
+            object_list = list(self.window)
+        else:
+            if after:
+                queryset = self._older(after)
+                self.number = 2
+            else:
+                try:
+                    number = max(int(query.get('page', 1)), 1)
+                except (TypeError, ValueError):
+                    number = 1
+                queryset = self._first(number)
+                self.number = min(number, 2)
+            self.window = CursorWindow(queryset, self.per_page)
+            self.has_older = self.window.has_more
+            if lazy:
+                object_list = queryset[:self.per_page]
+            else:
+                object_list = list(self.window)
+        page = Page(object_list, self.number, self)
+        page.next_cursor = self.next_cursor
+        page.previous_cursor = self.previous_cursor
+        return page
@@ -0,0 +1,143 @@
+import sys
+import threading
+import time
+from collections import Counter, deque
+
+from django.conf import settings
+
+
+class Sampler:
+    """Статистический профайлер потоков, обрабатывающих запросы.
+
+    Один фоновый поток раз в PROFILER_INTERVAL секунд снимает стеки
+    зарегистрированных потоков. Потоки без регистрации не трогает,
+    поэтому запросы вне выборки ничего не платят.
+    """
+
+    def __init__(self):
+        self.active = {}
+        self.stop_codes = set()
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def register(self, thread_id, stop_code):
+        with self.lock:
+            self.active[thread_id] = (stop_code, Counter())
+            if self.thread is None:
+                self.thread = threading.Thread(
+                    target=self.run, name='profiler', daemon=True
+                )
+                self.thread.start()
+
+    def unregister(self, thread_id):
+        with self.lock:
+            return self.active.pop(thread_id, (None, Counter()))[1]
+
+    def run(self):
+        while True:
+            time.sleep(settings.PROFILER_INTERVAL)
+            with self.lock:
+                if not self.active:
+                    continue
+                targets = list(self.active.items())
+            frames = sys._current_frames()
+            for thread_id, (stop_code, samples) in targets:
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    samples[self.stack(frame, stop_code)] += 1
+
+    @staticmethod
+    def stack(frame, stop_code):
+        """Стек от middleware профайлера до текущей функции."""
+        stack = []
+        while frame is not None and frame.f_code is not stop_code:
+            code = frame.f_code
+            stack.append(
+                f'{code.co_name} ({code.co_filename}:{code.co_firstlineno})'
+            )
+            frame = frame.f_back
+        stack.reverse()
+        return tuple(stack[-settings.PROFILER_MAX_DEPTH:])
+
+
+sampler = Sampler()
+
+# Последние профили запросов; старые вытесняются новыми
+profiles = deque(maxlen=settings.PROFILER_BUFFER_SIZE)
+
+
+def record(view, path, duration, samples):
+    profiles.append({
+        'view': view,
+        'path': path,
+        'duration': duration,
+        'samples': samples,
+    })
+
+
+def _tree(samples, total, min_share):
+    root = {'children': {}}
+    for stack, count in samples.items():
+        node = root
+        for name in stack:
+            node = node['children'].setdefault(
+                name, {'name': name, 'count': 0, 'children': {}}
+            )
+            node['count'] += count
+
+    def prune(node):
+        children = [
+            child for child in node['children'].values()
+            if child['count'] >= total * min_share
+        ]
+        children.sort(key=lambda child: child['count'], reverse=True)
+        for child in children:
+            child['percent'] = round(100 * child['count'] / total, 1)
+            prune(child)
+        node['children'] = children
+
+    prune(root)
+    return root['children']
+
+
+def report(top=20, min_share=0.01):
+    """Сводка по view: горячие функции и дерево вызовов."""
+    views = {}
+    for profile in list(profiles):
+        view = views.setdefault(profile['view'], {
+            'view': profile['view'],
+            'requests': 0,
+            'duration': 0.0,
+            'samples': Counter(),
+        })
+        view['requests'] += 1
+        view['duration'] += profile['duration']
+        view['samples'].update(profile['samples'])
+    result = []
+    for view in views.values():
+        samples = view.pop('samples')
+        total = sum(samples.values())
+        if not total:
+            continue
+        own, inclusive = Counter(), Counter()
+        for stack, count in samples.items():
+            if stack:
+                own[stack[-1]] += count
+            for name in set(stack):
+                inclusive[name] += count
+        view.update({
+            'samples': total,
+            'average_ms': round(1000 * view['duration'] / view['requests']),
+            'functions': [
+                {
+                    'name': name,
+                    'own': round(100 * count / total, 1),
+                    'total': round(100 * inclusive[name] / total, 1),
+                }
+                for name, count in own.most_common(top)
+            ],
+            'tree': _tree(samples, total, min_share),
+        })
+        result.append(view)
+    result.sort(key=lambda view: view['samples'], reverse=True)
+    return result
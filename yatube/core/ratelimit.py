@@ -0,0 +1,161 @@
+"""Ограничение частоты запросов счётчиками в фиксированных окнах.
+
+Лимит rate с всплеском burst пропускает burst запросов за окно длиной
+burst / rate секунд, сверх того ответ 429 с Retry-After до конца окна.
+Лимит действует и на пользователя, и на IP: вошедший пользователь
+тратит оба счётчика, аноним - только счётчик своего IP.
+
+Счётчики лежат в базе, а не в кэше: кэш вытесняет записи под
+нагрузкой, а файловый кэш не умеет атомарно прибавлять. Запрос
+засчитывается одним условным UPDATE, поэтому параллельные запросы
+не проскакивают лимит, а все процессы видят одни и те же счётчики.
+
+Лимит view задаётся декоратором rate_limit, а view без декоратора,
+например из django.contrib.auth, ограничивает RateLimitMiddleware по
+имени URL. RATE_LIMITS в настройках переопределяет и то, и другое.
+"""
+import logging
+import math
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.shortcuts import render
+
+from core.db_router import primary
+from core.models import RateLimitRejection, RateLimitWindow
+
+logger = logging.getLogger(__name__)
+
+PERIODS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 60 * 60 * 24}
+
+# Лимиты декораторов rate_limit по областям
+registry = {}
+
+
+def _hit(key, expires, burst):
+    """Засчитывает запрос, если в окне осталось место."""
+    window = RateLimitWindow.objects.filter(key=key, expires=expires)
+    if window.filter(hits__lt=burst).update(hits=F('hits') + 1):
+        return True
+    with primary():
+        exists = window.exists()
+    if not exists:
+        try:
+            with transaction.atomic():
+                RateLimitWindow.objects.create(
+                    key=key, expires=expires, hits=1
+                )
+        except IntegrityError:
+            pass
+        else:
+            RateLimitWindow.objects.filter(
+                expires__lt=time.time()
+            ).delete()
+            return True
+    # Окно мог завести параллельный запрос уже после UPDATE
+    return bool(window.filter(hits__lt=burst).update(hits=F('hits') + 1))
+
+
+class Limit:
+    """Лимит вида '10/m': 10 запросов в минуту, всплеск до burst."""
+
+    def __init__(self, rate, burst=None, methods=None):
+        count, period = rate.split('/')
+        per_second = int(count) / PERIODS[period]
+        self.burst = burst or int(count)
+        self.window = self.burst / per_second
+        self.methods = methods
+        self.description = rate
+
+    def applies(self, request):
+        return self.methods is None or request.method in self.methods
+
+    def take(self, key):
+        """Считает запрос; возвращает, сколько секунд ждать, или 0."""
+        now = time.time()
+        ends = (int(now // self.window) + 1) * self.window
+        if _hit(key, math.ceil(ends), self.burst):
+            return 0
+        return ends - now
+
+
+def get_limit(scope):
+    """Лимит области из RATE_LIMITS или заданный декоратором."""
+    options = settings.RATE_LIMITS.get(scope)
+    if options is not None:
+        return Limit(**options)
+    return registry.get(scope)
+
+
+def client_keys(request):
+    """Счётчики клиента: пользователь, если он вошёл, и его IP."""
+    keys = [f'ip:{request.META.get("REMOTE_ADDR")}']
+    if request.user.is_authenticated:
+        keys.insert(0, f'user:{request.user.pk}')
+    return keys
+
+
+def _count_rejection(scope):
+    rejections = RateLimitRejection.objects.filter(scope=scope)
+    if rejections.update(rejected=F('rejected') + 1):
+        return
+    try:
+        with transaction.atomic():
+            RateLimitRejection.objects.create(scope=scope, rejected=1)
+    except IntegrityError:
+        rejections.update(rejected=F('rejected') + 1)
+
+
+def check(request, scope, limit):
+    """Ответ 429, если клиент исчерпал лимит области, иначе None."""
+    if not settings.RATE_LIMIT_ENABLED or not limit.applies(request):
+        return None
+    keys = client_keys(request)
+    wait = max([limit.take(f'{scope}:{key}') for key in keys])
+    if not wait:
+        return None
+    _count_rejection(scope)
+    logger.info('%s: лимит %s исчерпан для %s', scope, limit.description,
+                ', '.join(keys))
+    retry_after = math.ceil(wait)
+    response = render(
+        request, 'core/429.html', {'retry_after': retry_after}, status=429
+    )
+    response['Retry-After'] = str(retry_after)
+    return response
+
+
+def rate_limit(scope, rate, burst=None, methods=None):
+    """Ограничивает view лимитом rate ('10/m') на пользователя или IP."""
+    registry[scope] = Limit(rate, burst, methods)
+
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            rejected = check(request, scope, get_limit(scope))
+            if rejected is not None:
+                return rejected
+            return view_func(request, *args, **kwargs)
+        wrapper.rate_limit_scope = scope
+        return wrapper
+    return decorator
+
+
+def report():
+    """Области с отказами для страницы в админке."""
+    known = sorted(set(registry) | set(settings.RATE_LIMITS))
+    rejected = dict(RateLimitRejection.objects.filter(
+        scope__in=known, rejected__gt=0
+    ).values_list('scope', 'rejected'))
+    return [
+        {
+            'scope': scope,
+            'limit': get_limit(scope).description,
+            'rejected': rejected[scope],
+        }
+        for scope in known
+        if scope in rejected
+    ]
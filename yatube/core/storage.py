@@ -0,0 +1,33 @@
+import hashlib
+import os
+
+from django.core.files.storage import FileSystemStorage
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Файлы лежат под путём из SHA-256 содержимого.
+
+    Одинаковые загрузки получают одно имя, и второй раз файл не
+    пишется. От исходного имени остаются каталог upload_to и
+    расширение. Удалять такие файлы можно, только когда на них
+    никто больше не ссылается.
+    """
+
+    @staticmethod
+    def content_name(name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        digest = digest.hexdigest()
+        directory = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        return os.path.join(
+            directory, digest[:2], digest[2:4], f'{digest}{extension}'
+        )
+
+    def _save(self, name, content):
+        name = self.content_name(name, content)
+        if self.exists(name):
+            return name
+        return super()._save(name, content)
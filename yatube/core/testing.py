@@ -0,0 +1,68 @@
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test.runner import DiscoverRunner
+from django.test.utils import CaptureQueriesContext, override_settings
+from PIL import Image
+
+
+def image_upload(name, size=(50, 50), mode='RGB', image_format='PNG',
+                 exif=None):
+    """Красная картинка как загруженный файл для форм и полей моделей."""
+    buffer = BytesIO()
+    options = {'exif': exif} if exif else {}
+    Image.new(mode, size, (255, 0, 0, 0)[:len(mode)]).save(
+        buffer, image_format, **options
+    )
+    return SimpleUploadedFile(
+        name, buffer.getvalue(), f'image/{image_format.lower()}'
+    )
+
+
+class QueryBudgetMixin:
+    """Проверки числа запросов для TestCase."""
+
+    @contextmanager
+    def assertMaxQueries(self, number):
+        with CaptureQueriesContext(connection) as context:
+            yield context
+        queries = '\n'.join(
+            query['sql'] for query in context.captured_queries
+        )
+        self.assertLessEqual(
+            len(context), number,
+            f'{len(context)} запросов при бюджете {number}:\n{queries}'
+        )
+
+
+class TestRunner(DiscoverRunner):
+    """Тесты с файловым кэшем во временном каталоге, а не в рабочем.
+
+    Превышение бюджета запросов в тестах - ошибка, а не запись в лог.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.cache_dir = tempfile.mkdtemp()
+        self.test_settings = override_settings(
+            CACHES={
+                alias: {
+                    **options,
+                    'LOCATION': os.path.join(self.cache_dir, alias),
+                }
+                for alias, options in settings.CACHES.items()
+            },
+            QUERY_BUDGET_RAISE=True,
+        )
+        self.test_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.test_settings.disable()
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
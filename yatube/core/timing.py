@@ -0,0 +1,184 @@
+"""Разбивка времени запроса для заголовка Server-Timing.
+
+Замеры копятся в объекте текущего потока, пока его открыл
+ServerTimingMiddleware. Вне запроса measure ничего не делает, поэтому
+фоновые задачи и команды за замеры не платят. Вложенный замер той же
+метрики не считается повторно: get_or_set кэша внутри вызывает get
+и add, а шаблон рендерит другие шаблоны.
+"""
+import random
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from django.core.cache.backends import filebased, locmem
+from django.template import TemplateDoesNotExist
+from django.template.backends import django as django_backend
+
+_local = threading.local()
+
+# Метрики в порядке вывода в заголовке
+METRICS = ('db', 'cache-get', 'cache-set', 'template', 'thumbnail')
+
+
+class Timings:
+    def __init__(self):
+        self.metrics = {}
+        self.running = set()
+
+    def add(self, name, duration, count=1):
+        total, number = self.metrics.get(name, (0.0, 0))
+        self.metrics[name] = (total + duration, number + count)
+
+    def header(self, total):
+        """Значение заголовка Server-Timing, длительности в мс."""
+        names = sorted(
+            self.metrics,
+            key=lambda name: (
+                METRICS.index(name) if name in METRICS else len(METRICS)
+            ),
+        )
+        entries = []
+        for name in names:
+            duration, count = self.metrics[name]
+            entries.append(
+                f'{name};dur={duration * 1000:.1f};desc="{count}"'
+            )
+        entries.append(f'total;dur={total * 1000:.1f}')
+        return ', '.join(entries)
+
+
+def current():
+    return getattr(_local, 'timings', None)
+
+
+@contextmanager
+def collect():
+    """Копит замеры текущего потока до выхода из блока."""
+    _local.timings = timings = Timings()
+    try:
+        yield timings
+    finally:
+        del _local.timings
+
+
+@contextmanager
+def measure(name):
+    timings = current()
+    if timings is None or name in timings.running:
+        yield
+        return
+    timings.running.add(name)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.running.discard(name)
+        timings.add(name, time.perf_counter() - started)
+
+
+def timed(name):
+    """Декоратор: замеряет каждый вызов функции метрикой name."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with measure(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class QueryTimer:
+    """Обёртка connection.execute_wrapper для метрики db."""
+
+    def __call__(self, execute, sql, params, many, context):
+        with measure('db'):
+            return execute(sql, params, many, context)
+
+
+class TimedCacheMixin:
+    """Замеры чтения и записи для любого бэкенда кэша.
+
+    Бэкенд получается наследованием:
+    class RedisCache(TimedCacheMixin, RedisCache).
+    """
+
+    def get(self, *args, **kwargs):
+        with measure('cache-get'):
+            return super().get(*args, **kwargs)
+
+    def get_many(self, *args, **kwargs):
+        with measure('cache-get'):
+            return super().get_many(*args, **kwargs)
+
+    def has_key(self, *args, **kwargs):
+        with measure('cache-get'):
+            return super().has_key(*args, **kwargs)
+
+    def set(self, *args, **kwargs):
+        with measure('cache-set'):
+            return super().set(*args, **kwargs)
+
+    def set_many(self, *args, **kwargs):
+        with measure('cache-set'):
+            return super().set_many(*args, **kwargs)
+
+    def add(self, *args, **kwargs):
+        with measure('cache-set'):
+            return super().add(*args, **kwargs)
+
+    def incr(self, *args, **kwargs):
+        with measure('cache-set'):
+            return super().incr(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with measure('cache-set'):
+            return super().delete(*args, **kwargs)
+
+    def delete_many(self, *args, **kwargs):
+        with measure('cache-set'):
+            return super().delete_many(*args, **kwargs)
+
+
+class LocMemCache(TimedCacheMixin, locmem.LocMemCache):
+    pass
+
+
+class FileBasedCache(TimedCacheMixin, filebased.FileBasedCache):
+    """Файловый кэш, общий для веб-процессов, обработчиков и команд.
+
+    Django пересчитывает файлы каталога при каждой записи, чтобы
+    вытеснить лишние, а на десятках тысяч записей это десятки
+    миллисекунд. Здесь каталог проверяется в среднем раз в cull_every
+    записей: кэш может ненадолго вырасти на столько сверх MAX_ENTRIES.
+    """
+
+    cull_every = 100
+
+    def _cull(self):
+        if random.randrange(self.cull_every) == 0:
+            super()._cull()
+
+
+class Template(django_backend.Template):
+    def render(self, context=None, request=None):
+        with measure('template'):
+            return super().render(context, request)
+
+
+class DjangoTemplates(django_backend.DjangoTemplates):
+    """Шаблоны Django с замером render.
+
+    Сигнал template_rendered Django шлёт только в тестах, поэтому
+    время рендера меряем в самом бэкенде.
+    """
+
+    def from_string(self, template_code):
+        return Template(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return Template(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            django_backend.reraise(exc, self)
@@ -1,5 +1,8 @@
+from django.contrib import admin
 from django.shortcuts import render
 
+from core import profiler, ratelimit
+
 
 def page_not_found(request, exception):
     return render(request, 'core/404.html', {'path': request.path}, status=404)
@@ -11,3 +14,21 @@ def csrf_failure(request, reason=''):
 
 def handler500(request, *args, **argv):
     return render(request, 'core/500.html')
+
+
+def profiler_report(request):
+    context = {
+        **admin.site.each_context(request),
+        'title': 'Профилирование запросов',
+        'views': profiler.report(),
+    }
+    return render(request, 'core/profiler.html', context)
+
+
+def ratelimit_report(request):
+    context = {
+        **admin.site.each_context(request),
+        'title': 'Ограничение частоты запросов',
+        'scopes': ratelimit.report(),
+    }
+    return render(request, 'core/ratelimit.html', context)
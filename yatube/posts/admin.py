@@ -2,14 +2,32 @@ from django.contrib import admin
 
 from yatube.settings import EMPTY_VALUE_DISPLAY
 
+from . import search
 from .models import Comment, Follow, Group, Post
 
 
+class FullTextSearchMixin:
+    """Поиск в админке по индексу FTS5 вместо LIKE по search_fields."""
+    search_index = None
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search.fts_available():
+            return super().get_search_results(
+                request, queryset, search_term
+            )
+        if not search.match_expression(search_term):
+            return queryset, False
+        return queryset.filter(
+            id__in=search.matching_ids(self.search_index, search_term)
+        ), False
+
+
 @admin.register(Post)
-class PostAdmin(admin.ModelAdmin):
+class PostAdmin(FullTextSearchMixin, admin.ModelAdmin):
     list_display = ('pk', 'text', 'created', 'author', 'group')
     list_editable = ('group',)
     search_fields = ('text',)
+    search_index = search.POST_INDEX
     list_filter = ('created',)
     empty_value_display = EMPTY_VALUE_DISPLAY
 
@@ -22,9 +40,10 @@ class GroupAdmin(admin.ModelAdmin):
 
 
 @admin.register(Comment)
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(FullTextSearchMixin, admin.ModelAdmin):
     list_display = ('post', 'author', 'text', 'created')
     search_fields = ('text',)
+    search_index = search.COMMENT_INDEX
     list_filter = ('created',)
     empty_value_display = EMPTY_VALUE_DISPLAY
 
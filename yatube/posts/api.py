@@ -0,0 +1,194 @@
+"""JSON API лент, поста и комментариев только для чтения.
+
+Ответы собираются словарями без шаблонов. Параметр fields выбирает
+поля записей: ?fields=id,text,thumbnail. Листание по курсорам
+after/before, как на HTML-страницах. ETag для лент и поста берётся
+из тех же валидаторов, что у страниц, с поправкой на fields; ленте
+подписок дешёвого валидатора нет, её ETag считается по телу ответа.
+Счётчик комментариев отдаётся только у отдельного поста.
+"""
+import hashlib
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.http import JsonResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+
+from core.middleware.query_budget import query_budget
+from core.paginator import CursorPaginator
+
+from .conditional import (conditional, group_validators, index_validators,
+                          post_validators, profile_validators)
+from .models import Comment, Group, Post
+from .thumbnails import feed_thumbnail
+from .timeline import TimelinePaginator
+
+User = get_user_model()
+
+COUNT_POST = settings.COUNT_POST
+COUNT_COMMENT = settings.COUNT_COMMENT
+
+
+def _thumbnail_url(post):
+    thumbnail = feed_thumbnail(post.image)
+    return thumbnail.url if thumbnail else None
+
+
+FEED_FIELDS = {
+    'id': lambda post: post.id,
+    'url': lambda post: reverse('posts:post_detail', args=(post.id,)),
+    'text': lambda post: post.text,
+    'created': lambda post: post.created,
+    'updated': lambda post: post.updated,
+    'author': lambda post: post.author.username,
+    'group': lambda post: post.group.slug if post.group_id else None,
+    'image': lambda post: post.image.url if post.image else None,
+    # Пока миниатюра строится в фоне, здесь None
+    'thumbnail': _thumbnail_url,
+}
+
+# Комментарии не меняют поколение лент, и по ETag ленты новый
+# счётчик не виден; поэтому он есть только у отдельного поста
+POST_FIELDS = {
+    **FEED_FIELDS,
+    'comments_count': lambda post: post.comments_count,
+}
+
+COMMENT_FIELDS = {
+    'id': lambda comment: comment.id,
+    'author': lambda comment: comment.author.username,
+    'text': lambda comment: comment.text,
+    'created': lambda comment: comment.created,
+}
+
+
+class FieldsError(ValueError):
+    """Клиент запросил поле, которого нет."""
+
+
+def _fields(request, available):
+    names = request.GET.get('fields')
+    if not names:
+        return available
+    fields = {}
+    for name in names.split(','):
+        name = name.strip()
+        if name not in available:
+            raise FieldsError(
+                f'Неизвестное поле {name}, доступны: {", ".join(available)}'
+            )
+        fields[name] = available[name]
+    return fields
+
+
+def _error(message, status):
+    return JsonResponse({'error': message}, status=status)
+
+
+def _serialize(objects, fields):
+    return [
+        {name: value(obj) for name, value in fields.items()}
+        for obj in objects
+    ]
+
+
+def _page(request, object_list, per_page, fields,
+          paginator_class=CursorPaginator):
+    try:
+        fields = _fields(request, fields)
+    except FieldsError as error:
+        return _error(str(error), 400)
+    paginator = paginator_class(object_list, per_page)
+    page = paginator.get_cursor_page(request.GET, lazy=False)
+    return JsonResponse({
+        'results': _serialize(page, fields),
+        'next_cursor': page.next_cursor(),
+        'previous_cursor': page.previous_cursor(),
+    })
+
+
+def _api_validators(validators):
+    # Ответ зависит ещё и от набора полей
+    def wrapper(request, *args, **kwargs):
+        result = validators(request, *args, **kwargs)
+        if result is None:
+            return None
+        etag, modified = result
+        etag = hashlib.md5(
+            f'api:{etag}:{request.GET.get("fields")}'.encode()
+        ).hexdigest()
+        return etag, modified
+    return wrapper
+
+
+def _posts(post_list):
+    return post_list.select_related('author', 'group')
+
+
+@query_budget(5)
+@conditional(_api_validators(index_validators))
+def index(request):
+    return _page(request, _posts(Post.objects.all()), COUNT_POST, FEED_FIELDS)
+
+
+@query_budget(5)
+@conditional(_api_validators(group_validators))
+def group_posts(request, slug):
+    group = Group.objects.filter(slug=slug).first()
+    if group is None:
+        return _error('Группа не найдена', 404)
+    return _page(request, _posts(group.posts.all()), COUNT_POST, FEED_FIELDS)
+
+
+@query_budget(6)
+@conditional(_api_validators(profile_validators))
+def profile(request, username):
+    author = User.objects.filter(username=username).first()
+    if author is None:
+        return _error('Пользователь не найден', 404)
+    return _page(
+        request,
+        _posts(Post.objects.filter(author=author)),
+        COUNT_POST,
+        FEED_FIELDS,
+    )
+
+
+@query_budget(6)
+def follow_index(request):
+    if not request.user.is_authenticated:
+        return _error('Нужна авторизация', 401)
+    response = _page(
+        request, request.user, COUNT_POST, FEED_FIELDS, TimelinePaginator
+    )
+    if response.status_code != 200:
+        return response
+    etag = quote_etag(hashlib.md5(response.content).hexdigest())
+    response['ETag'] = etag
+    return get_conditional_response(request, etag=etag, response=response)
+
+
+@query_budget(4)
+@conditional(_api_validators(post_validators))
+def post_detail(request, post_id):
+    try:
+        fields = _fields(request, POST_FIELDS)
+    except FieldsError as error:
+        return _error(str(error), 400)
+    post = _posts(Post.objects.filter(id=post_id)).first()
+    if post is None:
+        return _error('Пост не найден', 404)
+    return JsonResponse(_serialize([post], fields)[0])
+
+
+@query_budget(5)
+@conditional(_api_validators(post_validators))
+def post_comments(request, post_id):
+    if not Post.objects.filter(id=post_id).exists():
+        return _error('Пост не найден', 404)
+    comment_list = Comment.objects.filter(
+        post_id=post_id
+    ).select_related('author')
+    return _page(request, comment_list, COUNT_COMMENT, COMMENT_FIELDS)
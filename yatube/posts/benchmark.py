@@ -0,0 +1,276 @@
+"""Нагрузочное тестирование страниц постов.
+
+Наполняет базу тестовыми данными и гоняет сценарии параллельными
+клиентами на requests. Число запросов к БД сервер сообщает
+заголовком X-Query-Count при включённой настройке QUERY_COUNT_HEADER.
+"""
+import json
+import math
+import random
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.servers.basehttp import (ThreadedWSGIServer,
+                                          WSGIRequestHandler)
+
+from .models import Group, Post
+from .transfer import Importer
+
+User = get_user_model()
+
+USER_PREFIX = 'bench-user-'
+GROUP_PREFIX = 'bench-group-'
+PASSWORD = 'bench-password'
+WORDS = (
+    'лента', 'пост', 'группа', 'автор', 'подписка', 'комментарий',
+    'картинка', 'новость', 'город', 'погода', 'книга', 'музыка',
+)
+
+QUERY_COUNT_HEADER = 'X-Query-Count'
+
+
+def _text(rnd, words):
+    return ' '.join(rnd.choice(WORDS) for _ in range(words))
+
+
+def seed_records(users, groups, posts, comments, follows, seed=0):
+    """Записи тестового набора в формате выгрузки export_jsonl."""
+    rnd = random.Random(seed)
+    created = '2021-01-01T00:00:00+00:00'
+    usernames = [f'{USER_PREFIX}{number}' for number in range(users)]
+    for number in range(groups):
+        yield {'model': 'posts.group', 'pk': number + 1, 'fields': {
+            'title': f'Группа {number}',
+            'slug': f'{GROUP_PREFIX}{number}',
+            'description': _text(rnd, 10),
+        }}
+    for number in range(posts):
+        yield {'model': 'posts.post', 'pk': number + 1, 'fields': {
+            'text': _text(rnd, 30),
+            'created': created,
+            'author': rnd.choice(usernames),
+            'group': rnd.randint(1, groups) if groups else None,
+            'image': '',
+        }}
+    for number in range(comments):
+        yield {'model': 'posts.comment', 'pk': number + 1, 'fields': {
+            'post': rnd.randint(1, posts),
+            'author': rnd.choice(usernames),
+            'text': _text(rnd, 8),
+            'created': created,
+        }}
+    for username in usernames:
+        for author in rnd.sample(usernames, min(follows, users)):
+            if author != username:
+                yield {'model': 'posts.follow', 'pk': None, 'fields': {
+                    'user': username, 'author': author,
+                }}
+
+
+def seed(write, **sizes):
+    """Загружает тестовый набор и задаёт пароль его пользователям."""
+    Importer(5000, write).run(
+        json.dumps(record, ensure_ascii=False)
+        for record in seed_records(**sizes)
+    )
+    User.objects.filter(username__startswith=USER_PREFIX).update(
+        password=make_password(PASSWORD)
+    )
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class LocalServer:
+    """Сервер Django в отдельном потоке на свободном порту."""
+
+    def __init__(self):
+        self.server = ThreadedWSGIServer(
+            ('127.0.0.1', 0), QuietRequestHandler, allow_reuse_address=False
+        )
+        self.server.set_app(WSGIHandler())
+        self.url = f'http://127.0.0.1:{self.server.server_port}'
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def login(base_url, username):
+    """Сессия вошедшего пользователя.
+
+    Удачный вход отвечает редиректом. Без этой проверки клиент, которому
+    отказал лимит частоты входа, гонял бы сценарии анонимом.
+    """
+    session = requests.Session()
+    login_url = f'{base_url}/auth/login/'
+    session.get(login_url)
+    response = session.post(login_url, data={
+        'username': username,
+        'password': PASSWORD,
+        'csrfmiddlewaretoken': session.cookies['csrftoken'],
+    }, headers={'Referer': login_url}, allow_redirects=False)
+    if response.status_code != 302:
+        raise ValueError(
+            f'Не удалось войти как {username}: ответ '
+            f'{response.status_code}. Если это 429, отключите на сервере '
+            f'RATE_LIMIT_ENABLED или уменьшите --clients'
+        )
+    return session
+
+
+class Target:
+    """Адреса страниц из тестового набора."""
+
+    def __init__(self, base_url, sample=1000):
+        self.base_url = base_url
+        self.usernames = list(User.objects.filter(
+            username__startswith=USER_PREFIX
+        ).values_list('username', flat=True)[:sample])
+        self.slugs = list(Group.objects.filter(
+            slug__startswith=GROUP_PREFIX
+        ).values_list('slug', flat=True)[:sample])
+        self.post_ids = list(Post.objects.filter(
+            author__username__startswith=USER_PREFIX
+        ).order_by('-id').values_list('id', flat=True)[:sample])
+        if not (self.usernames and self.slugs and self.post_ids):
+            raise ValueError('Тестовый набор не загружен, запустите --seed')
+
+    def request(self, scenario, session, rnd):
+        # Запись меряем без перехода по редиректу на страницу
+        url = self.base_url
+        csrf = {'csrfmiddlewaretoken': session.cookies.get('csrftoken')}
+        if scenario == 'index':
+            return session.get(f'{url}/')
+        if scenario == 'group':
+            return session.get(f'{url}/group/{rnd.choice(self.slugs)}/')
+        if scenario == 'profile':
+            return session.get(
+                f'{url}/profile/{rnd.choice(self.usernames)}/'
+            )
+        if scenario == 'post_detail':
+            return session.get(f'{url}/posts/{rnd.choice(self.post_ids)}/')
+        if scenario == 'follow':
+            return session.get(f'{url}/follow/')
+        if scenario == 'create':
+            return session.post(
+                f'{url}/create/',
+                data={**csrf, 'text': _text(rnd, 20)},
+                allow_redirects=False,
+            )
+        if scenario == 'comment':
+            post_id = rnd.choice(self.post_ids)
+            return session.post(
+                f'{url}/posts/{post_id}/comment/',
+                data={**csrf, 'text': _text(rnd, 8)},
+                allow_redirects=False,
+            )
+        raise ValueError(f'Неизвестный сценарий {scenario}')
+
+
+SCENARIOS = (
+    'index', 'group', 'profile', 'post_detail', 'follow', 'create',
+    'comment',
+)
+
+
+def percentile(values, percent):
+    """Перцентиль по ближайшему рангу."""
+    if not values:
+        return None
+    values = sorted(values)
+    rank = max(math.ceil(percent * len(values) / 100), 1)
+    return values[rank - 1]
+
+
+def summarize(latencies, queries, errors, elapsed):
+    def ms(value):
+        return None if value is None else round(value * 1000, 2)
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'p50_ms': ms(percentile(latencies, 50)),
+        'p95_ms': ms(percentile(latencies, 95)),
+        'p99_ms': ms(percentile(latencies, 99)),
+        'throughput_rps': round(len(latencies) / elapsed, 2),
+        'queries_per_request': (
+            round(sum(queries) / len(queries), 2) if queries else None
+        ),
+    }
+
+
+def run_scenario(target, sessions, scenario, requests_count):
+    """Прогоняет сценарий всеми клиентами, возвращает сводку."""
+    latencies, queries = [], []
+    errors = 0
+    lock = threading.Lock()
+
+    def client(number, session):
+        nonlocal errors
+        rnd = random.Random(number)
+        for _ in range(number, requests_count, len(sessions)):
+            started = time.perf_counter()
+            try:
+                response = target.request(scenario, session, rnd)
+                failed = response.status_code >= 400
+            except requests.RequestException:
+                response, failed = None, True
+            latency = time.perf_counter() - started
+            with lock:
+                latencies.append(latency)
+                errors += failed
+                if response is not None:
+                    count = response.headers.get(QUERY_COUNT_HEADER)
+                    if count is not None:
+                        queries.append(int(count))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(sessions)) as executor:
+        futures = [
+            executor.submit(client, number, session)
+            for number, session in enumerate(sessions)
+        ]
+        for future in futures:
+            future.result()
+    return summarize(latencies, queries, errors, time.perf_counter() - started)
+
+
+def current_commit():
+    try:
+        return subprocess.run(
+            ('git', 'rev-parse', 'HEAD'),
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(base_url, scenarios, clients, requests_count):
+    """Результаты всех сценариев в виде словаря для JSON."""
+    target = Target(base_url)
+    sessions = [
+        login(base_url, target.usernames[number % len(target.usernames)])
+        for number in range(clients)
+    ]
+    return {
+        'commit': current_commit(),
+        'started': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'url': base_url,
+        'clients': clients,
+        'scenarios': {
+            scenario: run_scenario(target, sessions, scenario, requests_count)
+            for scenario in scenarios
+        },
+    }
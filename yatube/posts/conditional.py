@@ -0,0 +1,152 @@
+"""Валидаторы условных GET для лент и страницы поста.
+
+Считаются без рендера и без запроса страницы постов: для лент
+по поколению и времени изменения из feed_cache, для поста по его
+updated, счётчикам и версии миниатюры. Совпавший запрос получает
+304 от condition. RSS и Atom одни для всех, их ETag не зависит
+от пользователя.
+"""
+import hashlib
+
+from django.contrib.auth import get_user_model
+from django.db.models import Max, OuterRef, Subquery
+from django.middleware.csrf import get_token
+from django.views.decorators.http import condition
+
+from . import (feed_cache, follow_graph, recommendations, thumbnails,
+               trending)
+from .models import Comment, Group, Post
+
+User = get_user_model()
+
+
+def _hash(*parts):
+    return hashlib.md5(
+        ':'.join(str(part) for part in parts).encode()
+    ).hexdigest()
+
+
+def _etag(request, *parts):
+    # Шапка страницы и кнопки зависят от пользователя, а формы
+    # вошедшего - ещё и от CSRF-токена: после нового входа токен
+    # другой, и форма из старой страницы получила бы 403
+    if request.user.is_authenticated:
+        get_token(request)
+        parts = (request.META['CSRF_COOKIE'], *parts)
+    return _hash(request.user.pk, *parts)
+
+
+def conditional(validators):
+    """Как condition, но ETag и Last-Modified считаются одним вызовом.
+
+    validators(request, *args, **kwargs) возвращает пару
+    (etag, last_modified) или None, если объекта нет.
+    """
+    def get(request, *args, **kwargs):
+        if not hasattr(request, 'validators'):
+            request.validators = (
+                validators(request, *args, **kwargs) or (None, None)
+            )
+        return request.validators
+
+    return condition(
+        etag_func=lambda *args, **kwargs: get(*args, **kwargs)[0],
+        last_modified_func=lambda *args, **kwargs: get(*args, **kwargs)[1],
+    )
+
+
+def _feed_validators(request, feed, *parts):
+    modified = feed_cache.last_modified(feed)
+    if modified is None:
+        # Кэш ничего не хранит: по поколению ленты её не сравнить
+        return None
+    etag = _etag(request, feed_cache.fragment_key(request, feed), *parts)
+    return etag, modified
+
+
+def index_validators(request):
+    # На главной ещё блоки популярного и рекомендаций
+    return _feed_validators(
+        request,
+        feed_cache.INDEX_FEED,
+        trending.version(),
+        recommendations.version(),
+    )
+
+
+def group_validators(request, slug):
+    group = Group.objects.filter(slug=slug).values_list(
+        'id', 'title', 'description'
+    ).first()
+    if group is None:
+        return None
+    return _feed_validators(request, feed_cache.group_feed(group[0]), *group)
+
+
+def profile_validators(request, username):
+    # Подписки меняют счётчики, но не время ленты автора,
+    # поэтому профилю хватает ETag
+    author = User.objects.filter(username=username).values_list(
+        'id',
+        'counters__posts_count',
+        'counters__followers_count',
+        'counters__following_count',
+    ).first()
+    if author is None:
+        return None
+    following = request.user.is_authenticated and follow_graph.follows(
+        request.user.pk, author[0]
+    )
+    validators = _feed_validators(
+        request, feed_cache.author_feed(author[0]), *author, following
+    )
+    return validators and (validators[0], None)
+
+
+def post_validators(request, post_id):
+    # Комментарии не меняют updated: новые видны по последнему id,
+    # удалённые по счётчику
+    post = Post.objects.filter(id=post_id).values_list(
+        'updated', 'comments_count', 'author__counters__posts_count'
+    ).annotate(
+        last_comment=Subquery(
+            Comment.objects.filter(post=OuterRef('pk')).order_by().values(
+                'post'
+            ).annotate(last=Max('id')).values('last')
+        )
+    ).order_by().first()
+    if post is None:
+        return None
+    page = [request.GET.get(param) for param in feed_cache.PAGE_PARAMS]
+    return _etag(
+        request, *post, thumbnails.version(post_id), *page
+    ), None
+
+
+def _syndication_validators(feed, *parts):
+    modified = feed_cache.last_modified(feed)
+    if modified is None:
+        return None
+    return _hash(feed_cache.get_generation(feed), *parts), modified
+
+
+def index_syndication_validators(request):
+    return _syndication_validators(feed_cache.INDEX_FEED)
+
+
+def group_syndication_validators(request, slug):
+    group = Group.objects.filter(slug=slug).values_list(
+        'id', 'title', 'description'
+    ).first()
+    if group is None:
+        return None
+    return _syndication_validators(feed_cache.group_feed(group[0]), *group)
+
+
+def author_syndication_validators(request, username):
+    author_id = User.objects.filter(username=username).values_list(
+        'id', flat=True
+    ).first()
+    if author_id is None:
+        return None
+    return _syndication_validators(feed_cache.author_feed(author_id))
@@ -0,0 +1,56 @@
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Group, Post, UserCounter
+
+
+def _change(queryset, field, delta):
+    if delta < 0:
+        # Счётчик не уходит ниже нуля, даже если успел разойтись
+        queryset = queryset.filter(**{f'{field}__gt': 0})
+    return queryset.update(**{field: F(field) + delta})
+
+
+def change_user_counter(user_id, field, delta):
+    """Атомарно меняет счётчик пользователя на delta."""
+    counters = UserCounter.objects.filter(user_id=user_id)
+    if _change(counters, field, delta) or delta < 0:
+        return
+    counter, created = UserCounter.objects.get_or_create(
+        user_id=user_id,
+        defaults={field: delta},
+    )
+    if not created:
+        _change(counters, field, delta)
+
+
+def change_group_counter(group_id, delta):
+    if group_id is not None:
+        _change(Group.objects.filter(pk=group_id), 'posts_count', delta)
+
+
+def change_comments_counter(post_id, delta):
+    _change(Post.objects.filter(pk=post_id), 'comments_count', delta)
+
+
+def user_counters(user):
+    """Счётчики пользователя; нулевые, если он ещё ничего не делал."""
+    try:
+        return user.counters
+    except UserCounter.DoesNotExist:
+        return UserCounter(user=user)
+
+
+def count_of(model, field):
+    """Подзапрос COUNT(*) по внешнему ключу field для OuterRef('pk')."""
+    return Coalesce(
+        Subquery(
+            model.objects.filter(
+                **{field: OuterRef('pk')}
+            ).order_by().values(field).annotate(
+                total=Count('*')
+            ).values('total'),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
@@ -0,0 +1,116 @@
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from . import follow_graph
+
+INDEX_FEED = 'index'
+
+# Параметры запроса, от которых зависит содержимое страницы ленты
+PAGE_PARAMS = ('after', 'before', 'page')
+
+
+def group_feed(group_id):
+    return f'group:{group_id}'
+
+
+def author_feed(author_id):
+    return f'author:{author_id}'
+
+
+def _generation_key(feed):
+    return f'feed_generation:{feed}'
+
+
+def _settling_key(feed):
+    return f'feed_settling:{feed}'
+
+
+def _modified_key(feed):
+    return f'feed_modified:{feed}'
+
+
+def get_generation(feed):
+    """Текущее поколение ленты.
+
+    Начальное значение берётся из времени, чтобы после вытеснения
+    ключа из кэша поколение не совпало ни с одним из прежних.
+    """
+    key = _generation_key(feed)
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, int(time.time() * 1000), None)
+        generation = cache.get(key)
+    return generation
+
+
+def last_modified(feed):
+    """Время последнего изменения ленты.
+
+    Как и поколение, после вытеснения из кэша начинается с текущего
+    времени: клиенту придётся один раз скачать ленту заново.
+    """
+    key = _modified_key(feed)
+    modified = cache.get(key)
+    if modified is None:
+        cache.add(key, int(time.time()), None)
+        modified = cache.get(key)
+    if modified is None:
+        return None
+    return datetime.fromtimestamp(modified, timezone.utc)
+
+
+def bump(*feeds):
+    """Сдвигает поколение лент: их старые фрагменты больше не читаются."""
+    for feed in feeds:
+        key = _generation_key(feed)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, int(time.time() * 1000), None)
+    cache.set_many(
+        {_modified_key(feed): int(time.time()) for feed in feeds}, None
+    )
+    if settings.DATABASE_REPLICAS:
+        # Пока реплики догоняют запись, фрагмент мог быть собран
+        # из устаревших данных: такие фрагменты живут не дольше секунды
+        cache.set_many(
+            {_settling_key(feed): True for feed in feeds},
+            settings.REPLICA_PIN_SECONDS,
+        )
+
+
+def bump_for_post(post, *group_ids):
+    """Инвалидирует ленты, в которые попадает пост."""
+    feeds = {INDEX_FEED, author_feed(post.author_id)}
+    feeds.update(
+        group_feed(group_id)
+        for group_id in (post.group_id, *group_ids)
+        if group_id is not None
+    )
+    bump(*feeds)
+    # Повторно после коммита: иначе параллельный запрос успеет закэшировать
+    # под новым поколением ещё не закоммиченное состояние
+    transaction.on_commit(lambda: bump(*feeds))
+
+
+def fragment_key(request, feed):
+    """Ключ фрагмента страницы ленты: поколение плюс курсор страницы.
+
+    У вошедшего пользователя в ключ входит ещё версия его подписок:
+    от них зависят кнопки подписки на карточках постов.
+    """
+    page = '&'.join(
+        f'{param}={request.GET[param]}'
+        for param in PAGE_PARAMS
+        if param in request.GET
+    )
+    generation = get_generation(feed)
+    if settings.DATABASE_REPLICAS and cache.get(_settling_key(feed)):
+        generation = f'{generation}.{int(time.time())}'
+    if request.user.is_authenticated:
+        page = f'{page}:{follow_graph.version(request.user.pk)}'
+    return f'{generation}:{page}'
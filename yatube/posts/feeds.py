@@ -0,0 +1,177 @@
+"""RSS и Atom последних постов сайта, группы и автора.
+
+Посты берутся теми же запросами, что и в HTML-лентах. Читалки
+опрашивают ленты часто, поэтому ответы отдаются с Cache-Control,
+на повторный запрос с ETag или If-Modified-Since приходит 304,
+а анониму готовая лента достаётся из кэша страниц. Запись поста
+сбрасывает кэш и валидаторы так же, как у страниц лент.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.syndication.views import Feed
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.feedgenerator import Atom1Feed
+from django.utils.text import Truncator
+from django.views.decorators.cache import cache_control
+
+from core.middleware.query_budget import query_budget
+
+from . import page_cache
+from .conditional import (author_syndication_validators, conditional,
+                          group_syndication_validators,
+                          index_syndication_validators)
+from .models import Group, Post
+from .page_cache import anonymous_page_cache
+
+User = get_user_model()
+
+SYNDICATION_COUNT = settings.SYNDICATION_COUNT
+
+
+class PostsFeed(Feed):
+    """Последние посты в RSS 2.0."""
+
+    def __call__(self, request, *args, **kwargs):
+        response = super().__call__(request, *args, **kwargs)
+        # Feed ставит время последнего поста, а сравнивать
+        # If-Modified-Since нужно со временем изменения ленты из
+        # валидаторов: его conditional подставит сам
+        del response['Last-Modified']
+        return response
+
+    def post_list(self, obj):
+        raise NotImplementedError
+
+    def items(self, obj):
+        return self.post_list(obj).select_related(
+            'author', 'group'
+        )[:SYNDICATION_COUNT]
+
+    def item_title(self, post):
+        return Truncator(post.text).chars(50)
+
+    def item_description(self, post):
+        return post.text
+
+    def item_link(self, post):
+        return reverse('posts:post_detail', args=(post.id,))
+
+    def item_pubdate(self, post):
+        return post.created
+
+    def item_updateddate(self, post):
+        return post.updated
+
+    def item_author_name(self, post):
+        return post.author.get_full_name() or post.author.username
+
+    def item_author_link(self, post):
+        return reverse('posts:profile', args=(post.author.username,))
+
+    def item_categories(self, post):
+        return (post.group.title,) if post.group_id else ()
+
+
+class IndexFeed(PostsFeed):
+    title = 'Последние обновления на сайте'
+    description = 'Новые записи всех авторов'
+
+    def link(self):
+        return reverse('posts:index')
+
+    def post_list(self, obj):
+        return Post.objects.all()
+
+
+class GroupFeed(PostsFeed):
+    def get_object(self, request, slug):
+        return get_object_or_404(Group, slug=slug)
+
+    def title(self, group):
+        return f'Записи сообщества {group.title}'
+
+    def description(self, group):
+        return group.description
+
+    def link(self, group):
+        return reverse('posts:group_list', args=(group.slug,))
+
+    def post_list(self, group):
+        return group.posts.all()
+
+
+class AuthorFeed(PostsFeed):
+    def get_object(self, request, username):
+        return get_object_or_404(User, username=username)
+
+    def title(self, author):
+        return f'Записи {author.get_full_name() or author.username}'
+
+    def description(self, author):
+        return f'Новые записи автора {author.username}'
+
+    def link(self, author):
+        return reverse('posts:profile', args=(author.username,))
+
+    def post_list(self, author):
+        return Post.objects.filter(author=author)
+
+
+class AtomMixin:
+    feed_type = Atom1Feed
+
+    def subtitle(self, obj):
+        return self._get_dynamic_attr('description', obj)
+
+
+class IndexAtomFeed(AtomMixin, IndexFeed):
+    pass
+
+
+class GroupAtomFeed(AtomMixin, GroupFeed):
+    pass
+
+
+class AuthorAtomFeed(AtomMixin, AuthorFeed):
+    pass
+
+
+def feed_view(feed, validators, tag, budget):
+    """View ленты со всеми слоями кэша: браузер, 304, кэш страниц."""
+    view = anonymous_page_cache(tag)(feed)
+    view = conditional(validators)(view)
+    view = cache_control(max_age=settings.SYNDICATION_MAX_AGE)(view)
+    return query_budget(budget)(view)
+
+
+index_rss = feed_view(
+    IndexFeed(), index_syndication_validators, page_cache.INDEX, 3
+)
+index_atom = feed_view(
+    IndexAtomFeed(), index_syndication_validators, page_cache.INDEX, 3
+)
+group_rss = feed_view(
+    GroupFeed(),
+    group_syndication_validators,
+    page_cache.group_tag('{slug}'),
+    5,
+)
+group_atom = feed_view(
+    GroupAtomFeed(),
+    group_syndication_validators,
+    page_cache.group_tag('{slug}'),
+    5,
+)
+author_rss = feed_view(
+    AuthorFeed(),
+    author_syndication_validators,
+    page_cache.author_tag('{username}'),
+    5,
+)
+author_atom = feed_view(
+    AuthorAtomFeed(),
+    author_syndication_validators,
+    page_cache.author_tag('{username}'),
+    5,
+)
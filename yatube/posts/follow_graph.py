@@ -0,0 +1,62 @@
+"""Граф подписок: множество авторов каждого читателя в кэше.
+
+Множество строится одним запросом и хранится вместе с версией - временем
+сборки. Подписка и отписка удаляют запись читателя, следующее обращение
+соберёт её заново с новой версией. По версии меняются ключи фрагментов
+лент, где у каждого поста есть кнопка подписки.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Follow
+
+
+def _key(user_id):
+    return f'followees:{user_id}'
+
+
+def _entry(user_id):
+    key = _key(user_id)
+    entry = cache.get(key)
+    if entry is None:
+        entry = (
+            int(time.time() * 1000),
+            frozenset(
+                Follow.objects.filter(user_id=user_id).values_list(
+                    'author_id', flat=True
+                )
+            ),
+        )
+        cache.set(key, entry, settings.FOLLOW_GRAPH_TIMEOUT)
+    return entry
+
+
+def followees(user_id):
+    """id авторов, на которых подписан пользователь."""
+    return _entry(user_id)[1]
+
+
+def version(user_id):
+    """Меняется при каждой подписке и отписке пользователя."""
+    return _entry(user_id)[0]
+
+
+def follows(user_id, author_id):
+    return author_id in followees(user_id)
+
+
+def follows_many(user_id, author_ids):
+    """Те из author_ids, на кого подписан пользователь."""
+    return followees(user_id).intersection(author_ids)
+
+
+def forget(user_id):
+    """Сбрасывает множество после подписки или отписки."""
+    key = _key(user_id)
+    cache.delete(key)
+    # Повторно после коммита: параллельный запрос мог собрать
+    # множество из ещё не закоммиченного состояния
+    transaction.on_commit(lambda: cache.delete(key))
@@ -1,5 +1,7 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
 
+from . import images
 from .models import Comment, Post
 
 
@@ -14,6 +16,13 @@ class PostForm(forms.ModelForm):
             raise forms.ValidationError('Ну что за пост без текста?')
         return data
 
+    def clean_image(self):
+        image = self.cleaned_data['image']
+        # При правке без новой загрузки здесь уже сохранённый файл
+        if not isinstance(image, UploadedFile):
+            return image
+        return images.process_upload(image)
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,53 @@
+"""Ссылки постов на общие файлы картинок.
+
+Хранилище складывает одинаковые загрузки в один файл, поэтому при
+удалении поста или смене картинки файл удаляется только вместе
+с последней ссылкой на него, а с ним и его миниатюры.
+"""
+import logging
+
+from django.db import transaction
+from django.db.models import F
+from sorl.thumbnail import delete
+
+from .models import Post, StoredImage
+
+logger = logging.getLogger(__name__)
+
+
+def acquire(name, count=1):
+    """Добавляет ссылки на файл."""
+    if not name:
+        return
+    if StoredImage.objects.filter(name=name).update(
+        references=F('references') + count
+    ):
+        return
+    image, created = StoredImage.objects.get_or_create(
+        name=name, defaults={'references': count}
+    )
+    if not created:
+        StoredImage.objects.filter(name=name).update(
+            references=F('references') + count
+        )
+
+
+def release(name):
+    """Снимает ссылку; последняя удаляет файл после коммита."""
+    if not name:
+        return
+    StoredImage.objects.filter(name=name, references__gt=0).update(
+        references=F('references') - 1
+    )
+    if StoredImage.objects.filter(name=name, references=0).delete()[0]:
+        transaction.on_commit(lambda: delete_unreferenced(name))
+
+
+def delete_unreferenced(name):
+    # Пока ждали коммита, тот же файл мог загрузить кто-то ещё
+    if StoredImage.objects.filter(name=name).exists():
+        return
+    try:
+        delete(Post(image=name).image)
+    except Exception:
+        logger.exception('Не удалось удалить картинку %s', name)
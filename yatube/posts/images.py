@@ -0,0 +1,139 @@
+"""Приём картинок постов: уменьшение, пережатие, очистка метаданных.
+
+Pillow читает из файла только заголовок, поэтому размер проверяется
+до распаковки пикселей: так отсекаются «бомбы» с огромными
+размерами. JPEG распаковывается сразу в уменьшенном масштабе
+(Image.draft). Результат пишется во временный файл на диске, и
+хранилище переносит его на место без копирования в память.
+"""
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from PIL import Image, ImageOps
+
+EXTENSIONS = {'JPEG': '.jpg', 'WEBP': '.webp', 'PNG': '.png'}
+SAVE_OPTIONS = {
+    'JPEG': {'optimize': True, 'progressive': True},
+    'WEBP': {'method': 4},
+    'PNG': {'optimize': True},
+}
+# Форматы, в которых сохраняется прозрачность
+ALPHA_FORMATS = ('WEBP', 'PNG')
+
+
+class ProcessedImage(File):
+    """Пережатая картинка во временном файле.
+
+    FileSystemStorage переносит такой файл на место по пути из
+    temporary_file_path; если файл остался, close его удаляет.
+    """
+
+    def __init__(self, name, content_type):
+        super().__init__(tempfile.NamedTemporaryFile(
+            suffix=os.path.splitext(name)[1],
+            dir=settings.FILE_UPLOAD_TEMP_DIR,
+            delete=False,
+        ), name)
+        self.content_type = content_type
+
+    def temporary_file_path(self):
+        return self.file.name
+
+    def close(self):
+        self.file.close()
+        try:
+            os.remove(self.file.name)
+        except FileNotFoundError:
+            pass
+
+    def __del__(self):
+        self.close()
+
+
+def open_image(file):
+    """Открывает картинку, не распаковывая её, и проверяет размер."""
+    try:
+        image = Image.open(file)
+    except (OSError, Image.DecompressionBombError) as error:
+        raise ValidationError('Не удалось прочитать картинку') from error
+    width, height = image.size
+    if width * height > settings.IMAGE_MAX_PIXELS:
+        raise ValidationError(
+            f'Слишком большая картинка: {width}x{height} точек'
+        )
+    return image
+
+
+def needs_processing(image):
+    """Картинку надо пережать: другой формат, размер или есть EXIF."""
+    max_width, max_height = settings.IMAGE_MAX_SIZE
+    return (
+        image.format != settings.IMAGE_FORMAT
+        or image.width > max_width
+        or image.height > max_height
+        or 'exif' in image.info
+    )
+
+
+def _has_alpha(image):
+    return image.mode in ('RGBA', 'LA') or (
+        image.mode == 'P' and 'transparency' in image.info
+    )
+
+
+def _convert(image, image_format):
+    if _has_alpha(image):
+        image = image.convert('RGBA')
+        if image_format in ALPHA_FORMATS:
+            return image
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image if image.mode == 'RGB' else image.convert('RGB')
+
+
+def process(file, name):
+    """Пережатая копия картинки во временном файле.
+
+    Метаданные не переносятся, кроме цветового профиля; поворот
+    из EXIF применяется к самим пикселям. У анимации остаётся
+    первый кадр.
+    """
+    image_format = settings.IMAGE_FORMAT
+    image = open_image(file)
+    icc_profile = image.info.get('icc_profile')
+    image.draft(image.mode, settings.IMAGE_MAX_SIZE)
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail(
+        settings.IMAGE_MAX_SIZE, Image.LANCZOS, reducing_gap=3.0
+    )
+    image = _convert(image, image_format)
+    stem = os.path.splitext(os.path.basename(name))[0]
+    result = ProcessedImage(
+        f'{stem}{EXTENSIONS[image_format]}', Image.MIME[image_format]
+    )
+    options = dict(SAVE_OPTIONS[image_format])
+    if image_format != 'PNG':
+        options['quality'] = settings.IMAGE_QUALITY
+    if icc_profile:
+        options['icc_profile'] = icc_profile
+    image.save(result.file, image_format, **options)
+    result.file.flush()
+    result.seek(0)
+    return result
+
+
+def process_upload(upload):
+    """Проверяет загруженный файл и возвращает пережатую картинку."""
+    if upload.size > settings.IMAGE_MAX_UPLOAD_SIZE:
+        limit = settings.IMAGE_MAX_UPLOAD_SIZE // (1024 * 1024)
+        raise ValidationError(f'Файл больше {limit} МБ')
+    upload.seek(0)
+    # Большие загрузки Django уже сложил во временный файл:
+    # Pillow читает его с диска по мере надобности
+    if hasattr(upload, 'temporary_file_path'):
+        return process(upload.temporary_file_path(), upload.name)
+    return process(upload, upload.name)
@@ -0,0 +1,94 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+from posts import benchmark
+
+
+class Command(BaseCommand):
+    help = 'Нагрузочное тестирование страниц постов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--seed', action='store_true',
+            help='Сначала загрузить тестовый набор данных',
+        )
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--comments', type=int, default=20000)
+        parser.add_argument(
+            '--follows', type=int, default=20,
+            help='На сколько авторов подписан каждый пользователь',
+        )
+        parser.add_argument(
+            '--url',
+            help='Адрес запущенного сервера; по умолчанию сервер '
+                 'поднимается в этом процессе',
+        )
+        parser.add_argument('--clients', type=int, default=8)
+        parser.add_argument(
+            '--requests', type=int, default=200,
+            help='Сколько запросов делать в каждом сценарии',
+        )
+        parser.add_argument(
+            '--scenario', action='append', choices=benchmark.SCENARIOS,
+            help='Сценарий, можно указать несколько; по умолчанию все',
+        )
+        parser.add_argument(
+            '--output', help='Файл для результатов в JSON',
+        )
+        parser.add_argument(
+            '--baseline', help='Результаты прошлого прогона для сравнения',
+        )
+
+    def handle(self, *args, **options):
+        if options['seed']:
+            benchmark.seed(
+                self.stderr.write,
+                users=options['users'],
+                groups=options['groups'],
+                posts=options['posts'],
+                comments=options['comments'],
+                follows=options['follows'],
+            )
+        scenarios = options['scenario'] or benchmark.SCENARIOS
+        if options['url']:
+            results = self.run(options['url'], scenarios, options)
+        else:
+            # Сценарии create и comment упирались бы в лимиты частоты
+            # и считали ответы 429 ошибками
+            with override_settings(
+                QUERY_COUNT_HEADER=True, RATE_LIMIT_ENABLED=False
+            ):
+                with benchmark.LocalServer() as server:
+                    results = self.run(server.url, scenarios, options)
+        output = json.dumps(results, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(output)
+        self.stdout.write(output)
+        if options['baseline']:
+            self.compare(results, options['baseline'])
+
+    def run(self, url, scenarios, options):
+        try:
+            return benchmark.run(
+                url, scenarios, options['clients'], options['requests']
+            )
+        except ValueError as error:
+            raise CommandError(error)
+
+    def compare(self, results, path):
+        with open(path, encoding='utf-8') as file:
+            baseline = json.load(file)['scenarios']
+        for name, current in results['scenarios'].items():
+            previous = baseline.get(name)
+            if previous is None:
+                continue
+            self.stderr.write(
+                f'{name}: p95 {previous["p95_ms"]} -> {current["p95_ms"]} '
+                f'мс, запросов к БД {previous["queries_per_request"]} -> '
+                f'{current["queries_per_request"]}'
+            )
@@ -0,0 +1,60 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from posts.thumbnails import (feed_thumbnail, generate,
+                              generate_in_worker)
+
+PROGRESS_EVERY = 100
+
+
+class Command(BaseCommand):
+    help = 'Строит недостающие миниатюры картинок постов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=settings.THUMBNAIL_WORKERS,
+            help='Сколько миниатюр строить параллельно, 1 - по очереди',
+        )
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').exclude(
+            image__isnull=True
+        ).values_list('pk', 'image')
+        pending = [
+            pk for pk, image in posts.iterator()
+            if feed_thumbnail(Post(image=image).image) is None
+        ]
+        self.stdout.write(f'Миниатюр к построению: {len(pending)}')
+        if options['workers'] > 1:
+            built = self.build_parallel(pending, options['workers'])
+        else:
+            built = 0
+            for done, pk in enumerate(pending, 1):
+                built += generate(pk)
+                self.progress(done)
+        failed = len(pending) - built
+        message = f'Готово, построено: {built}, не построено: {failed}'
+        self.stdout.write(
+            self.style.WARNING(f'{message}, ошибки в логе') if failed
+            else self.style.SUCCESS(message)
+        )
+
+    def progress(self, done):
+        if done % PROGRESS_EVERY == 0:
+            self.stdout.write(f'Обработано: {done}')
+
+    def build_parallel(self, pending, workers):
+        built = 0
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(generate_in_worker, pk) for pk in pending
+            ]
+            for done, future in enumerate(as_completed(futures), 1):
+                built += future.result()
+                self.progress(done)
+        return built
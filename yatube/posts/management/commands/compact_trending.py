@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from posts.trending import compact
+
+
+class Command(BaseCommand):
+    help = (
+        'Применяет затухание к оценкам популярного и удаляет угасшие; '
+        'запускать периодически, например раз в час'
+    )
+
+    def handle(self, *args, **options):
+        removed = compact()
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово, удалено угасших оценок: {removed}'
+        ))
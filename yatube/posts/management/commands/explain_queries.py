@@ -0,0 +1,141 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import RequestFactory, override_settings
+from django.urls import resolve, reverse
+
+from core.paginator import CursorPaginator
+from posts.models import Post
+
+User = get_user_model()
+
+# Без кэша, иначе фрагменты лент скроют запросы
+NO_CACHE = {
+    'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}
+}
+
+
+def sqlite_problems(sql, params):
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+        details = [row[-1] for row in cursor.fetchall()]
+    problems = []
+    for detail in details:
+        if detail.startswith('SCAN') and not any(
+            marker in detail
+            for marker in ('USING', 'VIRTUAL TABLE', 'CONSTANT ROW')
+        ):
+            problems.append(f'полный скан: {detail}')
+        if 'USE TEMP B-TREE' in detail:
+            problems.append(f'сортировка: {detail}')
+    return problems
+
+
+def postgresql_problems(sql, params):
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN {sql}', params)
+        details = [row[0].strip() for row in cursor.fetchall()]
+    problems = []
+    for detail in details:
+        if 'Seq Scan' in detail:
+            problems.append(f'полный скан: {detail}')
+        if detail.lstrip('-> ').startswith('Sort'):
+            problems.append(f'сортировка: {detail}')
+    return problems
+
+
+EXPLAINERS = {
+    'sqlite': sqlite_problems,
+    'postgresql': postgresql_problems,
+}
+
+
+class QueryRecorder:
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        if not many and sql.lstrip().upper().startswith('SELECT'):
+            self.queries.append((sql, params))
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = (
+        'Выполняет EXPLAIN для запросов страниц постов и отмечает '
+        'полные сканы таблиц и сортировки без индекса'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--username',
+            help='Чью ленту подписок проверять; по умолчанию того, '
+                 'у кого больше всего подписок',
+        )
+        parser.add_argument(
+            '--fail', action='store_true',
+            help='Завершиться с ошибкой, если есть проблемные запросы',
+        )
+
+    def handle(self, *args, **options):
+        explain = EXPLAINERS.get(connection.vendor)
+        if explain is None:
+            raise CommandError(f'EXPLAIN для {connection.vendor} не разобран')
+        post = Post.objects.filter(group__isnull=False).first()
+        post = post or Post.objects.first()
+        if post is None:
+            raise CommandError('Нет постов, проверять нечего')
+        user = self.get_user(options['username'])
+        found = 0
+        with override_settings(CACHES=NO_CACHE):
+            for url in self.urls(post):
+                self.stdout.write(url)
+                for sql, params in self.capture(url, user):
+                    problems = explain(sql, params)
+                    found += bool(problems)
+                    mark = '!!' if problems else 'ok'
+                    self.stdout.write(f'  {mark} {sql[:120]}')
+                    for problem in problems:
+                        self.stdout.write(f'     {problem}')
+        message = f'Проблемных запросов: {found}'
+        if found and options['fail']:
+            raise CommandError(message)
+        self.stdout.write(
+            self.style.WARNING(message) if found
+            else self.style.SUCCESS(message)
+        )
+
+    def get_user(self, username):
+        if username:
+            return User.objects.get(username=username)
+        return User.objects.annotate(
+            total=Count('follower')
+        ).order_by('-total').first()
+
+    def urls(self, post):
+        cursor = CursorPaginator(Post.objects.all(), 1).encode_cursor(post)
+        word = post.text.split()[0] if post.text.split() else 'пост'
+        urls = [
+            reverse('posts:index'),
+            f'{reverse("posts:index")}?after={cursor}',
+            reverse('posts:profile', args=(post.author.username,)),
+            reverse('posts:post_detail', args=(post.id,)),
+            reverse('posts:post_comments', args=(post.id,)),
+            reverse('posts:follow_index'),
+            f'{reverse("posts:search")}?q={word}',
+        ]
+        if post.group:
+            urls.insert(
+                2, reverse('posts:group_list', args=(post.group.slug,))
+            )
+        return urls
+
+    def capture(self, url, user):
+        request = RequestFactory().get(url)
+        request.user = user
+        match = resolve(request.path)
+        recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            match.func(request, *match.args, **match.kwargs)
+        return recorder.queries
@@ -0,0 +1,42 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from posts.transfer import Progress, dump_record, export_records
+
+PROGRESS_EVERY = 100000
+
+
+class Command(BaseCommand):
+    help = 'Выгружает группы, посты, комментарии и подписки в JSONL'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?', default='-',
+            help='Файл для выгрузки, по умолчанию stdout',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=2000,
+            help='Сколько строк читать из БД за раз',
+        )
+
+    def handle(self, *args, **options):
+        # Прогресс пишем в stderr, чтобы не смешивать его с выгрузкой
+        progress = Progress(self.stderr.write)
+        if options['path'] == '-':
+            self.export(sys.stdout, options['chunk_size'], progress)
+        else:
+            with open(options['path'], 'w', encoding='utf-8') as output:
+                self.export(output, options['chunk_size'], progress)
+
+    def export(self, output, chunk_size, progress):
+        label, count = None, 0
+        for record_label, record in export_records(chunk_size):
+            if record_label != label or count == PROGRESS_EVERY:
+                if count:
+                    progress.add(label, count)
+                label, count = record_label, 0
+            output.write(dump_record(record) + '\n')
+            count += 1
+        if count:
+            progress.add(label, count)
@@ -0,0 +1,30 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from posts.transfer import Importer
+
+
+class Command(BaseCommand):
+    help = 'Загружает группы, посты, комментарии и подписки из JSONL'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?', default='-',
+            help='Файл выгрузки, по умолчанию stdin',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help='Сколько записей сохранять в одной транзакции',
+        )
+
+    def handle(self, *args, **options):
+        importer = Importer(options['batch_size'], self.stdout.write)
+        if options['path'] == '-':
+            importer.run(sys.stdin)
+        else:
+            with open(options['path'], encoding='utf-8') as lines:
+                importer.run(lines)
+        self.stdout.write(self.style.SUCCESS(
+            'Загрузка завершена. Миниатюры картинок строит build_thumbnails'
+        ))
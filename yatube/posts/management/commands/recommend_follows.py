@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.recommendations import rebuild
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает рекомендации «на кого подписаться» '
+        'по графу подписок'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=500,
+            help='Сколько читателей сохранять в одной транзакции',
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        # rebuild меняет версию рекомендаций: у главной сменится ETag
+        total = rebuild(options['chunk_size'], self.stdout.write)
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово за {time.monotonic() - started:.1f} с, '
+            f'рекомендаций: {total}'
+        ))
@@ -0,0 +1,97 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+
+from posts.counters import count_of
+from posts.models import Comment, Follow, Group, Post, UserCounter
+
+User = get_user_model()
+
+BATCH_SIZE = 500
+
+USER_FIELDS = {
+    'posts_count': 'posts_total',
+    'followers_count': 'followers_total',
+    'following_count': 'following_total',
+}
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики постов, комментариев и подписок'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать расхождения, ничего не исправлять',
+        )
+
+    def handle(self, *args, **options):
+        self.dry_run = options['dry_run']
+        drift = 0
+        with transaction.atomic():
+            drift += self.recount_model(
+                Group, 'posts_count', count_of(Post, 'group')
+            )
+            drift += self.recount_model(
+                Post, 'comments_count', count_of(Comment, 'post')
+            )
+            drift += self.recount_users()
+        verb = 'найдено' if self.dry_run else 'исправлено'
+        self.stdout.write(
+            self.style.SUCCESS(f'Расхождений {verb}: {drift}')
+        )
+
+    def report(self, name, pk, field, stored, actual):
+        self.stdout.write(
+            f'{name} {pk}: {field} {stored} -> {actual}'
+        )
+
+    def recount_model(self, model, field, actual):
+        drifted = model.objects.annotate(actual=actual).exclude(
+            **{field: F('actual')}
+        ).only('pk', field)
+        changed = []
+        for obj in drifted.iterator():
+            self.report(
+                model.__name__, obj.pk, field, getattr(obj, field), obj.actual
+            )
+            setattr(obj, field, obj.actual)
+            changed.append(obj)
+        if not self.dry_run:
+            model.objects.bulk_update(changed, [field], batch_size=BATCH_SIZE)
+        return len(changed)
+
+    def recount_users(self):
+        users = User.objects.annotate(
+            posts_total=count_of(Post, 'author'),
+            followers_total=count_of(Follow, 'author'),
+            following_total=count_of(Follow, 'user'),
+        ).select_related('counters').only('pk', 'counters')
+        changed, created = [], []
+        for user in users.iterator():
+            try:
+                counter = user.counters
+            except UserCounter.DoesNotExist:
+                counter = None
+            if counter is None:
+                counter = UserCounter(user_id=user.pk)
+                target = created
+            else:
+                target = changed
+            drifted = False
+            for field, total in USER_FIELDS.items():
+                stored, actual = getattr(counter, field), getattr(user, total)
+                if stored != actual:
+                    self.report('User', user.pk, field, stored, actual)
+                    setattr(counter, field, actual)
+                    drifted = True
+            if drifted:
+                target.append(counter)
+        if not self.dry_run:
+            UserCounter.objects.bulk_create(created, batch_size=BATCH_SIZE)
+            UserCounter.objects.bulk_update(
+                changed, list(USER_FIELDS), batch_size=BATCH_SIZE
+            )
+        return len(changed) + len(created)
@@ -0,0 +1,60 @@
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand
+
+from posts import images
+from posts.models import Post
+
+PROGRESS_EVERY = 100
+
+
+class Command(BaseCommand):
+    help = (
+        'Пережимает загруженные раньше картинки постов по текущим '
+        'настройкам IMAGE_*'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только посчитать, какие картинки надо пережать',
+        )
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').exclude(
+            image__isnull=True
+        ).values_list('pk', 'image')
+        done = skipped = failed = 0
+        for pk, name in posts.iterator():
+            field = Post(image=name).image
+            try:
+                with field.open('rb') as file:
+                    if not images.needs_processing(images.open_image(file)):
+                        skipped += 1
+                        continue
+                    if options['dry_run']:
+                        done += 1
+                        continue
+                    file.seek(0)
+                    processed = images.process(file, name)
+            except (OSError, ValidationError) as error:
+                failed += 1
+                self.stderr.write(f'{name}: {error}')
+                continue
+            # Исходный файл удалится вместе с последней ссылкой на него
+            self.replace(pk, processed)
+            done += 1
+            if done % PROGRESS_EVERY == 0:
+                self.stdout.write(f'Пережато: {done}')
+        verb = 'к пережатию' if options['dry_run'] else 'пережато'
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово, {verb}: {done}, без изменений: {skipped}, '
+            f'с ошибкой: {failed}'
+        ))
+
+    @staticmethod
+    def replace(pk, processed):
+        # Через save, чтобы сигналы сбросили ленты и построили миниатюру
+        post = Post.objects.get(pk=pk)
+        post.image.save(processed.name, processed, save=False)
+        post.save(update_fields=('image', 'updated'))
+        processed.close()
@@ -0,0 +1,72 @@
+from django.db import migrations
+
+# Бесконтентные таблицы FTS5: в индекс пишется текст с «ё» -> «е»,
+# потому что unicode61 не считает их одной буквой
+INDEXES = (
+    ('posts_post_fts', 'posts_post'),
+    ('posts_comment_fts', 'posts_comment'),
+)
+
+
+def normalized(column):
+    return f"replace(replace({column}, 'ё', 'е'), 'Ё', 'Е')"
+
+
+def create_triggers(schema_editor, index, table, if_not_exists=''):
+    """Триггеры, которые держат индекс в согласии с таблицей."""
+    insert = (
+        f'INSERT INTO {index}(rowid, text) '
+        f'VALUES (new.id, {normalized("new.text")});'
+    )
+    delete = (
+        f"INSERT INTO {index}({index}, rowid, text) "
+        f"VALUES ('delete', old.id, {normalized('old.text')});"
+    )
+    schema_editor.execute(
+        f'CREATE TRIGGER {if_not_exists} {index}_insert '
+        f'AFTER INSERT ON {table} BEGIN {insert} END'
+    )
+    schema_editor.execute(
+        f'CREATE TRIGGER {if_not_exists} {index}_delete '
+        f'AFTER DELETE ON {table} BEGIN {delete} END'
+    )
+    schema_editor.execute(
+        f'CREATE TRIGGER {if_not_exists} {index}_update '
+        f'AFTER UPDATE OF text ON {table} BEGIN {delete} {insert} END'
+    )
+
+
+def create_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for index, table in INDEXES:
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {index} USING fts5("
+            f"text, content='', "
+            f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+        )
+        create_triggers(schema_editor, index, table)
+        schema_editor.execute(
+            f'INSERT INTO {index}(rowid, text) '
+            f'SELECT id, {normalized("text")} FROM {table}'
+        )
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for index, table in INDEXES:
+        for trigger in ('insert', 'delete', 'update'):
+            schema_editor.execute(f'DROP TRIGGER IF EXISTS {index}_{trigger}')
+        schema_editor.execute(f'DROP TABLE IF EXISTS {index}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0018_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
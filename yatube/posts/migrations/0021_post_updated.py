@@ -0,0 +1,47 @@
+from importlib import import_module
+
+from django.db import migrations, models
+from django.db.models import F
+from django.utils import timezone
+
+# Имя модуля начинается с цифры, обычный import его не возьмёт
+fulltext = import_module('posts.migrations.0019_fulltext_search')
+
+
+def fill_updated(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    Post.objects.update(updated=F('created'))
+
+
+def restore_triggers(apps, schema_editor):
+    # SQLite добавляет колонку пересозданием таблицы, а вместе со старой
+    # таблицей удаляются и триггеры полнотекстового индекса
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for index, table in fulltext.INDEXES:
+        fulltext.create_triggers(
+            schema_editor, index, table, if_not_exists='IF NOT EXISTS'
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0020_feed_indexes'),
+    ]
+
+    operations = [
+        # При откате триггеры нужны уже после удаления колонки
+        migrations.RunPython(migrations.RunPython.noop, restore_triggers),
+        migrations.AddField(
+            model_name='post',
+            name='updated',
+            field=models.DateTimeField(
+                auto_now=True, default=timezone.now,
+                verbose_name='Дата изменения',
+            ),
+            preserve_default=False,
+        ),
+        migrations.RunPython(fill_updated, migrations.RunPython.noop),
+        migrations.RunPython(restore_triggers, migrations.RunPython.noop),
+    ]
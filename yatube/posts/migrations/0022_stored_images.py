@@ -0,0 +1,38 @@
+# Generated by Django 2.2.16 on 2026-10-18 18:39
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def count_references(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    StoredImage = apps.get_model('posts', 'StoredImage')
+    images = Post.objects.exclude(image='').order_by().values(
+        'image'
+    ).annotate(total=Count('id'))
+    StoredImage.objects.bulk_create(
+        StoredImage(name=row['image'], references=row['total'])
+        for row in images.iterator()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0021_post_updated'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoredImage',
+            fields=[
+                ('name', models.CharField(max_length=100, primary_key=True, serialize=False, verbose_name='Файл')),
+                ('references', models.PositiveIntegerField(default=0, verbose_name='Число ссылок')),
+            ],
+            options={
+                'verbose_name': 'Файл картинки',
+                'verbose_name_plural': 'Файлы картинок',
+            },
+        ),
+        migrations.RunPython(count_references, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 2.2.16 on 2026-10-18 18:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0023_recommendations'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingEpoch',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('started', models.DateTimeField(verbose_name='Начало эпохи')),
+            ],
+            options={
+                'verbose_name': 'Эпоха популярности',
+                'verbose_name_plural': 'Эпохи популярности',
+            },
+        ),
+        migrations.CreateModel(
+            name='TrendingScore',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('post', 'Пост'), ('group', 'Группа')], max_length=5, verbose_name='Тип')),
+                ('object_id', models.PositiveIntegerField(verbose_name='id объекта')),
+                ('score', models.FloatField(default=0, verbose_name='Оценка')),
+            ],
+            options={
+                'verbose_name': 'Оценка популярности',
+                'verbose_name_plural': 'Оценки популярности',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='trendingscore',
+            index=models.Index(fields=['kind', '-score'], name='posts_trend_kind_831cee_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='trendingscore',
+            unique_together={('kind', 'object_id')},
+        ),
+    ]
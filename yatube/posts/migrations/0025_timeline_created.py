@@ -0,0 +1,37 @@
+# Generated by Django 2.2.16 on 2026-10-18 19:09
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def copy_post_dates(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    TimelineEntry = apps.get_model('posts', 'TimelineEntry')
+    TimelineEntry.objects.update(created=Subquery(
+        Post.objects.filter(pk=OuterRef('post_id')).values('created')
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0024_trending'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='timelineentry',
+            name='created',
+            field=models.DateTimeField(null=True, verbose_name='Дата поста'),
+        ),
+        migrations.RunPython(copy_post_dates, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='timelineentry',
+            name='created',
+            field=models.DateTimeField(verbose_name='Дата поста'),
+        ),
+        migrations.AddIndex(
+            model_name='timelineentry',
+            index=models.Index(fields=['user', '-created'], name='posts_timel_user_id_a18e09_idx'),
+        ),
+    ]
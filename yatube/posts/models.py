@@ -10,6 +10,11 @@ class Group(models.Model):
     title = models.CharField('Заголовок', max_length=200)
     slug = models.SlugField(unique=True)
     description = models.TextField('Описание')
+    posts_count = models.PositiveIntegerField(
+        'Число постов',
+        default=0,
+        editable=False
+    )
 
     class Meta:
         verbose_name = 'Group'
@@ -43,11 +48,27 @@ class Post(CreatedModel):
         upload_to='posts/',
         blank=True
     )
+    comments_count = models.PositiveIntegerField(
+        'Число комментариев',
+        default=0,
+        editable=False
+    )
+    updated = models.DateTimeField(
+        'Дата изменения',
+        auto_now=True
+    )
 
     class Meta:
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
         ordering = ('-created',)
+        # Ленты листаются по ключу (created, id): главная целиком,
+        # остальные в пределах автора или группы
+        indexes = [
+            models.Index(fields=('created', 'id')),
+            models.Index(fields=('author', 'created', 'id')),
+            models.Index(fields=('group', 'created', 'id')),
+        ]
 
     def __str__(self):
         return f'{self.text[:15]}'
@@ -75,6 +96,7 @@ class Comment(CreatedModel):
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
         ordering = ('-created',)
+        indexes = [models.Index(fields=('post', 'created', 'id'))]
 
     def __str__(self):
         return f'{self.text[:15]}'
@@ -92,5 +114,165 @@ class Follow(models.Model):
         related_name='following',
     )
 
+    class Meta:
+        unique_together = ('user', 'author')
+
     def __str__(self):
         return f'Подписчик: {self.user.username}, автор {self.author.username}'
+
+
+class UserCounter(models.Model):
+    """Счётчики пользователя: посты, подписчики и подписки.
+
+    Обновляются при записи, чтобы страницы не считали COUNT(*).
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='counters',
+        verbose_name='Пользователь'
+    )
+    posts_count = models.PositiveIntegerField('Число постов', default=0)
+    followers_count = models.PositiveIntegerField(
+        'Число подписчиков',
+        default=0
+    )
+    following_count = models.PositiveIntegerField(
+        'Число подписок',
+        default=0
+    )
+
+    class Meta:
+        verbose_name = 'Счётчики пользователя'
+        verbose_name_plural = 'Счётчики пользователей'
+
+    def __str__(self):
+        return f'Счётчики {self.user_id}'
+
+
+class StoredImage(models.Model):
+    """Сколько постов ссылается на файл картинки.
+
+    Файлы одинаковых картинок общие, поэтому удалять файл и его
+    миниатюры можно только после последней ссылки.
+    """
+    name = models.CharField('Файл', max_length=100, primary_key=True)
+    references = models.PositiveIntegerField('Число ссылок', default=0)
+
+    class Meta:
+        verbose_name = 'Файл картинки'
+        verbose_name_plural = 'Файлы картинок'
+
+    def __str__(self):
+        return self.name
+
+
+class TimelineEntry(models.Model):
+    """Запись домашней ленты подписчика.
+
+    Заполняется при публикации поста (fan-out on write), поэтому
+    лента подписок читается по индексу пользователя без JOIN по
+    подпискам.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Подписчик'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Пост'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор'
+    )
+    # Копия даты поста: лента читает последние записи по индексу
+    created = models.DateTimeField('Дата поста')
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        unique_together = ('user', 'post')
+        indexes = [
+            models.Index(fields=('user', 'author')),
+            models.Index(fields=('user', '-created', '-post')),
+        ]
+
+    def __str__(self):
+        return f'Лента {self.user_id}: пост {self.post_id}'
+
+
+class Recommendation(models.Model):
+    """Автор, на которого стоит подписаться читателю.
+
+    Таблицу целиком пересчитывает команда recommend_follows;
+    блок рекомендаций читает её одним запросом по индексу.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='recommendations',
+        verbose_name='Читатель'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор'
+    )
+    score = models.FloatField('Оценка')
+    computed = models.DateTimeField('Дата расчёта')
+
+    class Meta:
+        verbose_name = 'Рекомендация'
+        verbose_name_plural = 'Рекомендации'
+        unique_together = ('user', 'author')
+        indexes = [models.Index(fields=('user', '-score'))]
+
+    def __str__(self):
+        return f'Рекомендация {self.user_id}: автор {self.author_id}'
+
+
+class TrendingScore(models.Model):
+    """Затухающая оценка активности поста или группы.
+
+    Вклад события хранится умноженным на 2 ** (время от начала эпохи
+    / TRENDING_HALF_LIFE): новые события весят больше старых, и при
+    записи остаётся только прибавить. compact_trending переносит
+    начало эпохи и удаляет угасшие оценки.
+    """
+    POST = 'post'
+    GROUP = 'group'
+    KINDS = ((POST, 'Пост'), (GROUP, 'Группа'))
+
+    kind = models.CharField('Тип', max_length=5, choices=KINDS)
+    object_id = models.PositiveIntegerField('id объекта')
+    score = models.FloatField('Оценка', default=0)
+
+    class Meta:
+        verbose_name = 'Оценка популярности'
+        verbose_name_plural = 'Оценки популярности'
+        unique_together = ('kind', 'object_id')
+        indexes = [models.Index(fields=('kind', '-score'))]
+
+    def __str__(self):
+        return f'{self.kind} {self.object_id}: {self.score:.2f}'
+
+
+class TrendingEpoch(models.Model):
+    """Начало эпохи, от которой отсчитываются оценки популярности."""
+    started = models.DateTimeField('Начало эпохи')
+
+    class Meta:
+        verbose_name = 'Эпоха популярности'
+        verbose_name_plural = 'Эпохи популярности'
+
+    def __str__(self):
+        return f'Эпоха с {self.started}'
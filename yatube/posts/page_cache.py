@@ -0,0 +1,147 @@
+"""Кэш целых страниц для анонимных посетителей.
+
+Страница кэшируется по пути и параметрам листания PAGE_PARAMS,
+остальные параметры запроса в ключ не входят. Страница зависит от
+меток вида group:<slug>, author:<username> или post:<id> и хранится
+вместе с поколениями своих меток. Запись поста, комментария или
+подписки сдвигает поколения своих меток, и страницы со старыми
+поколениями больше не отдаются. Списков страниц по меткам нет,
+поэтому сброс стоит одинаково при любом числе страниц.
+"""
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .feed_cache import PAGE_PARAMS
+from .models import Group
+
+INDEX = 'index'
+
+
+def group_tag(slug):
+    return f'group:{slug}'
+
+
+def author_tag(username):
+    return f'author:{username}'
+
+
+def post_tag(post_id):
+    return f'post:{post_id}'
+
+
+def _page_key(request):
+    page = '&'.join(
+        f'{param}={request.GET[param]}'
+        for param in PAGE_PARAMS
+        if param in request.GET
+    )
+    path = f'{request.path}?{page}'
+    return f'page:{hashlib.md5(path.encode()).hexdigest()}'
+
+
+def _generation_key(tag):
+    return f'page_generation:{tag}'
+
+
+def _generations(tags):
+    """Текущие поколения меток.
+
+    Как и у поколений лент, начальное значение берётся из времени:
+    после вытеснения ключа поколение не совпадёт с прежним.
+    """
+    keys = {tag: _generation_key(tag) for tag in tags}
+    stored = cache.get_many(keys.values())
+    for key in keys.values():
+        if key not in stored:
+            cache.add(key, int(time.time() * 1000), None)
+            stored[key] = cache.get(key)
+    return {tag: stored[key] for tag, key in keys.items()}
+
+
+def depends_on(request, *tags):
+    """Добавляет метки, которые view узнал только из базы."""
+    request.page_dependencies = (
+        *getattr(request, 'page_dependencies', ()), *tags
+    )
+
+
+def _cacheable(request):
+    return (
+        settings.PAGE_CACHE_TIMEOUT
+        and request.method in ('GET', 'HEAD')
+        and not request.user.is_authenticated
+    )
+
+
+def anonymous_page_cache(*tags):
+    """Отдаёт анониму готовую страницу или кэширует новую.
+
+    tags - шаблоны меток, в них подставляются аргументы view:
+    anonymous_page_cache('group:{slug}').
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if not _cacheable(request):
+                return view_func(request, *args, **kwargs)
+            key = _page_key(request)
+            cached = cache.get(key)
+            if cached is not None:
+                generations, response = cached
+                if _generations(generations) == generations:
+                    return response
+            # Поколения читаются до рендера: сброс во время рендера
+            # не даст сохранить устаревшую страницу под новыми
+            generations = _generations(
+                tag.format(**kwargs) for tag in tags
+            )
+            response = view_func(request, *args, **kwargs)
+            # Страницу с CSRF-токеном или cookie нельзя отдавать другим
+            if (
+                response.status_code == 200
+                and not response.cookies
+                and not request.META.get('CSRF_COOKIE_USED')
+            ):
+                generations.update(_generations(
+                    getattr(request, 'page_dependencies', ())
+                ))
+                cache.set(
+                    key, (generations, response), settings.PAGE_CACHE_TIMEOUT
+                )
+            return response
+        return wrapper
+    return decorator
+
+
+def purge(*tags):
+    """Сдвигает поколения меток: зависящие страницы больше не отдаются."""
+    for tag in tags:
+        key = _generation_key(tag)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, int(time.time() * 1000), None)
+
+
+def purge_for_post(post, *group_ids):
+    """Страницы, на которых виден пост: ленты, профиль и сам пост."""
+    group_ids = {
+        group_id
+        for group_id in (post.group_id, *group_ids)
+        if group_id is not None
+    }
+    tags = {INDEX, author_tag(post.author.username), post_tag(post.pk)}
+    tags.update(
+        group_tag(slug)
+        for slug in Group.objects.filter(
+            id__in=group_ids
+        ).values_list('slug', flat=True)
+    )
+    purge(*tags)
+    # Повторно после коммита, как и сброс поколений лент
+    transaction.on_commit(lambda: purge(*tags))
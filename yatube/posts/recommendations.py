@@ -0,0 +1,206 @@
+"""Рекомендации «на кого подписаться» по графу подписок.
+
+Граф читается из Follow двумя проходами: по читателям и по авторам.
+Соседи каждой вершины лежат подряд в массивах array, как строки
+разреженной матрицы, поэтому миллионы рёбер занимают десятки мегабайт.
+
+Оценка автора для читателя складывается из двух частей:
+- друзья друзей: на автора подписаны авторы читателя;
+- совместные подписки: автор похож на авторов читателя, то есть на
+  него подписана заметная доля их читателей.
+У популярных вершин берётся равномерная выборка из RECOMMEND_FANOUT
+соседей, так что работа на одного читателя ограничена сверху.
+Результат пишется в Recommendation пачками читателей.
+"""
+import heapq
+import time
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from functools import lru_cache
+from operator import itemgetter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from . import follow_graph
+from .models import Follow, Recommendation
+
+# Сколько строк подписок читать из базы за раз
+READ_CHUNK_SIZE = 10000
+# Сколько авторов помнить вместе с их похожими авторами
+SIMILAR_CACHE_SIZE = 50000
+
+VERSION_KEY = 'recommendations_version'
+
+
+class Adjacency:
+    """Соседи вершин графа в сжатых массивах.
+
+    Пары (вершина, сосед) должны приходить отсортированными
+    по вершине.
+    """
+
+    def __init__(self, pairs):
+        self.nodes = array('q')
+        self.starts = array('q')
+        self.neighbours = array('q')
+        for node, neighbour in pairs:
+            if not self.nodes or self.nodes[-1] != node:
+                self.nodes.append(node)
+                self.starts.append(len(self.neighbours))
+            self.neighbours.append(neighbour)
+        self.starts.append(len(self.neighbours))
+
+    def __getitem__(self, node):
+        index = bisect_left(self.nodes, node)
+        if index == len(self.nodes) or self.nodes[index] != node:
+            return self.neighbours[:0]
+        return self.neighbours[self.starts[index]:self.starts[index + 1]]
+
+    def __iter__(self):
+        return iter(self.nodes)
+
+    def __len__(self):
+        return len(self.nodes)
+
+
+def sample(neighbours, limit):
+    """Не больше limit соседей, равномерно по всему списку."""
+    if len(neighbours) <= limit:
+        return neighbours
+    return neighbours[::-(-len(neighbours) // limit)]
+
+
+def load_graph():
+    """Подписки читателей и читатели авторов."""
+    edges = Follow.objects.values_list('user_id', 'author_id')
+    followees = Adjacency(
+        edges.order_by('user_id', 'author_id').iterator(READ_CHUNK_SIZE)
+    )
+    followers = Adjacency(
+        (author, user)
+        for user, author in edges.order_by(
+            'author_id', 'user_id'
+        ).iterator(READ_CHUNK_SIZE)
+    )
+    return followees, followers
+
+
+class Recommender:
+    def __init__(self, followees, followers, fanout, count):
+        self.followees = followees
+        self.followers = followers
+        self.fanout = fanout
+        self.count = count
+        self.similar = lru_cache(SIMILAR_CACHE_SIZE)(self._similar)
+
+    def _similar(self, author):
+        # Доля выборки читателей автора, подписанных и на другого
+        readers = sample(self.followers[author], self.fanout)
+        hits = Counter()
+        for reader in readers:
+            hits.update(sample(self.followees[reader], self.fanout))
+        del hits[author]
+        return {
+            other: total / len(readers)
+            for other, total in hits.most_common(self.count)
+        }
+
+    def recommend(self, user):
+        """Лучшие авторы для читателя: пары (id автора, оценка)."""
+        followed = self.followees[user]
+        scores = Counter()
+        for author in sample(followed, self.fanout):
+            scores.update(sample(self.followees[author], self.fanout))
+            scores.update(self.similar(author))
+        for author in (*followed, user):
+            scores.pop(author, None)
+        return heapq.nlargest(self.count, scores.items(), key=itemgetter(1))
+
+
+def _save(chunk, computed):
+    with transaction.atomic():
+        Recommendation.objects.filter(user_id__in=list(chunk)).delete()
+        Recommendation.objects.bulk_create(
+            Recommendation(
+                user_id=user, author_id=author, score=score,
+                computed=computed,
+            )
+            for user, authors in chunk.items()
+            for author, score in authors
+        )
+
+
+def rebuild(chunk_size, write=lambda message: None):
+    """Пересчитывает таблицу рекомендаций и возвращает число строк."""
+    computed = timezone.now()
+    followees, followers = load_graph()
+    write(
+        f'Граф: {len(followees)} читателей, {len(followers)} авторов, '
+        f'{len(followees.neighbours)} подписок'
+    )
+    recommender = Recommender(
+        followees,
+        followers,
+        settings.RECOMMEND_FANOUT,
+        settings.RECOMMEND_COUNT,
+    )
+    total = 0
+    chunk = {}
+    for number, user in enumerate(followees, 1):
+        chunk[user] = recommender.recommend(user)
+        if len(chunk) == chunk_size:
+            _save(chunk, computed)
+            total += sum(map(len, chunk.values()))
+            write(f'Читателей обработано: {number}')
+            chunk = {}
+    _save(chunk, computed)
+    total += sum(map(len, chunk.values()))
+    # Читатели, которые отписались ото всех
+    Recommendation.objects.filter(computed__lt=computed).delete()
+    _changed()
+    return total
+
+
+def version():
+    """Меняется после каждого пересчёта рекомендаций.
+
+    Пересчёт идёт в процессе команды recommend_follows, поэтому
+    версия живёт в общем для процессов кэше.
+    """
+    current = cache.get(VERSION_KEY)
+    if current is None:
+        cache.add(VERSION_KEY, int(time.time() * 1000), None)
+        current = cache.get(VERSION_KEY)
+    return current
+
+
+def _changed():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, int(time.time() * 1000), None)
+
+
+def fragment_key(user):
+    """Ключ блока рекомендаций: читатель, пересчёт и его подписки."""
+    if not user.is_authenticated:
+        return 'anonymous'
+    return f'{user.pk}:{version()}:{follow_graph.version(user.pk)}'
+
+
+def recommended_authors(user, count):
+    """Рекомендованные авторы без тех, на кого читатель уже подписан."""
+    followed = follow_graph.followees(user.pk)
+    # С запасом: после расчёта читатель мог на кого-то подписаться
+    recommendations = Recommendation.objects.filter(
+        user=user
+    ).select_related('author').order_by('-score')[:count * 2]
+    return [
+        recommendation.author
+        for recommendation in recommendations
+        if recommendation.author_id not in followed
+    ][:count]
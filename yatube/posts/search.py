@@ -0,0 +1,119 @@
+import base64
+import binascii
+import re
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+
+from .models import Post
+
+POST_INDEX = 'posts_post_fts'
+COMMENT_INDEX = 'posts_comment_fts'
+
+# Окончания, которые отрезаются от слов запроса: вместо стемминга
+# ищем по префиксу основы («постами» -> «пост*»)
+ENDINGS = sorted((
+    'иями', 'ями', 'ами', 'ого', 'его', 'ому', 'ему', 'ыми', 'ими',
+    'ая', 'яя', 'ое', 'ее', 'ой', 'ей', 'ий', 'ый', 'ые', 'ие', 'ам',
+    'ям', 'ах', 'ях', 'ом', 'ем', 'ов', 'ев', 'ую', 'юю', 'ть', 'ся',
+    'а', 'я', 'о', 'е', 'ы', 'и', 'у', 'ю', 'ь',
+), key=len, reverse=True)
+MIN_STEM = 3
+
+
+def fts_available():
+    """Полнотекстовые индексы FTS5 есть только у SQLite."""
+    return connection.vendor == 'sqlite'
+
+
+def normalize(text):
+    return text.replace('ё', 'е').replace('Ё', 'Е')
+
+
+def stem(word):
+    for ending in ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= MIN_STEM:
+            return word[:-len(ending)]
+    return word
+
+
+def match_expression(query):
+    """Запрос пользователя в синтаксисе MATCH: все слова по префиксу."""
+    words = re.findall(r'\w+', normalize(query).lower())
+    return ' '.join(f'"{stem(word)}"*' for word in words)
+
+
+def matching_ids(index, query):
+    """Подзапрос id записей, найденных в индексе, для filter(id__in=)."""
+    return RawSQL(
+        f'SELECT rowid FROM {index} WHERE {index} MATCH %s',
+        (match_expression(query),)
+    )
+
+
+def encode_cursor(score, pk):
+    value = f'{score!r}|{pk}'
+    return base64.urlsafe_b64encode(value.encode()).decode()
+
+
+def decode_cursor(cursor):
+    if not cursor:
+        return None
+    try:
+        value = base64.urlsafe_b64decode(cursor.encode()).decode()
+        score, pk = value.split('|')
+        return float(score), int(pk)
+    except (binascii.Error, UnicodeError, ValueError):
+        return None
+
+
+def _ranked_ids(match, cursor, limit):
+    # По скрытому столбцу rank (тот же bm25) FTS5 сортирует сам,
+    # и в плане нет временного B-дерева. Равные оценки идут
+    # по возрастанию rowid, как в ключе курсора
+    sql = (
+        f'SELECT rowid, rank FROM {POST_INDEX} '
+        f'WHERE {POST_INDEX} MATCH %s'
+    )
+    params = [match]
+    if cursor:
+        sql += ' AND (rank > %s OR (rank = %s AND rowid > %s))'
+        score, pk = cursor
+        params += [score, score, pk]
+    sql += ' ORDER BY rank LIMIT %s'
+    params.append(limit)
+    with connection.cursor() as db_cursor:
+        db_cursor.execute(sql, params)
+        return db_cursor.fetchall()
+
+
+def _plain_ids(query, cursor, limit):
+    posts = Post.objects.filter(text__icontains=query).order_by('id')
+    if cursor:
+        posts = posts.filter(id__gt=cursor[1])
+    return [(pk, 0.0) for pk in posts.values_list('id', flat=True)[:limit]]
+
+
+def search_posts(query, cursor=None, limit=10):
+    """Посты по запросу, самые релевантные первыми.
+
+    Возвращает список постов и курсор следующей страницы. Курсор
+    хранит (оценку bm25, id) последнего поста, поэтому листание
+    не пересчитывает уже показанные результаты через OFFSET.
+    """
+    match = match_expression(query)
+    if not match:
+        return [], ''
+    cursor = decode_cursor(cursor)
+    if fts_available():
+        rows = _ranked_ids(match, cursor, limit + 1)
+    else:
+        rows = _plain_ids(query, cursor, limit + 1)
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    posts = Post.objects.select_related('author', 'group').in_bulk(
+        [pk for pk, score in rows]
+    )
+    found = [posts[pk] for pk, score in rows if pk in posts]
+    next_cursor = encode_cursor(*reversed(rows[-1])) if has_more else ''
+    return found, next_cursor
@@ -0,0 +1,133 @@
+import threading
+
+from django.conf import settings
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+
+from . import (counters, feed_cache, follow_graph, image_refs, page_cache,
+               thumbnails, timeline, trending)
+from .models import Comment, Follow, Group, Post, TrendingScore
+
+# id постов, которые сейчас удаляются вместе с комментариями
+_deleting = threading.local()
+
+
+def _deleting_posts():
+    if not hasattr(_deleting, 'posts'):
+        _deleting.posts = set()
+    return _deleting.posts
+
+
+@receiver(pre_save, sender=Post)
+def post_changing(sender, instance, **kwargs):
+    # Запоминаем прежние группу и картинку, чтобы перенести счётчик
+    # и перестроить миниатюру при правке
+    if not instance._state.adding:
+        instance._saved_group_id, instance._saved_image = (
+            Post.objects.filter(pk=instance.pk).values_list(
+                'group_id', 'image'
+            ).first() or (None, None)
+        )
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    if created:
+        counters.change_user_counter(instance.author_id, 'posts_count', 1)
+        counters.change_group_counter(instance.group_id, 1)
+        timeline.fan_out(instance)
+        feed_cache.bump_for_post(instance)
+        page_cache.purge_for_post(instance)
+        trending.record(instance, settings.TRENDING_POST_WEIGHT)
+        if instance.image:
+            image_refs.acquire(instance.image.name)
+            thumbnails.schedule(instance)
+        return
+    saved_group_id = getattr(instance, '_saved_group_id', None)
+    if saved_group_id != instance.group_id:
+        counters.change_group_counter(saved_group_id, -1)
+        counters.change_group_counter(instance.group_id, 1)
+    instance._saved_group_id = instance.group_id
+    feed_cache.bump_for_post(instance, saved_group_id)
+    page_cache.purge_for_post(instance, saved_group_id)
+    saved_image = getattr(instance, '_saved_image', None)
+    if (instance.image.name or '') != (saved_image or ''):
+        image_refs.acquire(instance.image.name)
+        image_refs.release(saved_image)
+        if instance.image:
+            thumbnails.schedule(instance)
+    instance._saved_image = instance.image.name
+
+
+@receiver(pre_delete, sender=Post)
+def post_deleting(sender, instance, **kwargs):
+    # pre_delete приходит до удаления каскадом: комментариям поста
+    # незачем править его счётчик и сбрасывать его страницу по одному
+    _deleting_posts().add(instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    _deleting_posts().discard(instance.pk)
+    counters.change_user_counter(instance.author_id, 'posts_count', -1)
+    counters.change_group_counter(instance.group_id, -1)
+    feed_cache.bump_for_post(instance)
+    page_cache.purge_for_post(instance)
+    image_refs.release(instance.image.name)
+    trending.forget(TrendingScore.POST, instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    if created:
+        counters.change_comments_counter(instance.post_id, 1)
+        page_cache.purge(page_cache.post_tag(instance.post_id))
+        trending.record(instance.post, settings.TRENDING_COMMENT_WEIGHT)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    if instance.post_id in _deleting_posts():
+        return
+    counters.change_comments_counter(instance.post_id, -1)
+    page_cache.purge(page_cache.post_tag(instance.post_id))
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, **kwargs):
+    if created:
+        counters.change_user_counter(instance.user_id, 'following_count', 1)
+        counters.change_user_counter(
+            instance.author_id, 'followers_count', 1
+        )
+        timeline.backfill(instance.user, instance.author)
+        follow_graph.forget(instance.user_id)
+        _purge_follow_pages(instance)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    counters.change_user_counter(instance.user_id, 'following_count', -1)
+    counters.change_user_counter(instance.author_id, 'followers_count', -1)
+    timeline.purge(instance.user, instance.author)
+    follow_graph.forget(instance.user_id)
+    _purge_follow_pages(instance)
+
+
+def _purge_follow_pages(follow):
+    # Счётчики подписок видны в обоих профилях
+    page_cache.purge(
+        page_cache.author_tag(follow.user.username),
+        page_cache.author_tag(follow.author.username),
+    )
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, **kwargs):
+    page_cache.purge(page_cache.group_tag(instance.slug))
+
+
+@receiver(post_delete, sender=Group)
+def group_deleted(sender, instance, **kwargs):
+    trending.forget(TrendingScore.GROUP, instance.pk)
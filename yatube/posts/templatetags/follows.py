@@ -0,0 +1,31 @@
+from django import template
+from django.conf import settings
+
+from posts import follow_graph
+from posts.recommendations import recommended_authors
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def followed_authors(context, posts):
+    """Авторы постов страницы, на которых подписан пользователь."""
+    user = context['user']
+    if not user.is_authenticated:
+        return frozenset()
+    return follow_graph.follows_many(
+        user.pk, {post.author_id for post in posts}
+    )
+
+
+@register.inclusion_tag(
+    'posts/includes/who_to_follow.html', takes_context=True
+)
+def who_to_follow(context):
+    """Блок рекомендованных авторов из заранее посчитанной таблицы."""
+    user = context['user']
+    if not user.is_authenticated:
+        return {'authors': ()}
+    return {
+        'authors': recommended_authors(user, settings.RECOMMEND_SHOW)
+    }
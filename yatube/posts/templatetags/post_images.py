@@ -0,0 +1,13 @@
+from django import template
+
+from posts.thumbnails import feed_thumbnail
+
+register = template.Library()
+
+
+@register.simple_tag
+def feed_image(image):
+    """Миниатюра для ленты, а пока она строится — исходная картинка."""
+    if not image:
+        return None
+    return feed_thumbnail(image) or image
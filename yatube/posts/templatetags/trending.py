@@ -0,0 +1,17 @@
+from django import template
+from django.conf import settings
+
+from posts import trending
+
+register = template.Library()
+
+
+@register.simple_tag
+def trending_posts():
+    """Первые места популярных постов для блока на главной."""
+    return trending.trending_posts(settings.TRENDING_SHOW)
+
+
+@register.simple_tag
+def trending_groups():
+    return trending.trending_groups(settings.TRENDING_SHOW)
@@ -0,0 +1,181 @@
+import shutil
+import tempfile
+from http import HTTPStatus
+from io import StringIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts import thumbnails
+from posts.models import Comment, Follow, Group, Post, User
+
+COUNT_POST = settings.COUNT_POST
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ApiTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='reader')
+        cls.author = User.objects.create(username='author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        for number in range(COUNT_POST + 2):
+            Post.objects.create(
+                text=f'Пост {number}', author=cls.author, group=cls.group
+            )
+        cls.post = Post.objects.create(
+            text='С картинкой',
+            author=cls.author,
+            image=SimpleUploadedFile(
+                name='small.gif', content=SMALL_GIF, content_type='image/gif'
+            ),
+        )
+        Comment.objects.create(
+            post=cls.post, author=cls.user, text='Комментарий'
+        )
+        Follow.objects.create(user=cls.user, author=cls.author)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_feeds_by_cursor(self):
+        """Ленты отдаются страницами по курсору"""
+        urls = (
+            reverse('posts:api_index'),
+            reverse('posts:api_group', args=(self.group.slug,)),
+            reverse('posts:api_profile', args=(self.author.username,)),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                first = self.guest_client.get(url).json()
+                self.assertEqual(len(first['results']), COUNT_POST)
+                second = self.guest_client.get(
+                    url, {'after': first['next_cursor']}
+                ).json()
+                self.assertEqual(second['next_cursor'], '')
+                ids = {post['id'] for post in first['results']}
+                self.assertFalse(
+                    ids & {post['id'] for post in second['results']}
+                )
+
+    def test_sparse_fields(self):
+        response = self.guest_client.get(
+            reverse('posts:api_index'), {'fields': 'id,text'}
+        )
+        self.assertEqual(
+            set(response.json()['results'][0]), {'id', 'text'}
+        )
+        response = self.guest_client.get(
+            reverse('posts:api_index'), {'fields': 'id,password'}
+        )
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+    def test_thumbnail_url(self):
+        """Миниатюра появляется в ответе, когда построена"""
+        url = reverse('posts:api_post', args=(self.post.id,))
+        response = self.guest_client.get(url)
+        post = response.json()
+        self.assertEqual(post['image'], self.post.image.url)
+        self.assertIsNone(post['thumbnail'])
+        call_command('build_thumbnails', workers=1, stdout=StringIO())
+        built = self.guest_client.get(
+            url, HTTP_IF_NONE_MATCH=response['ETag']
+        ).json()
+        self.assertEqual(
+            built['thumbnail'],
+            thumbnails.feed_thumbnail(self.post.image).url,
+        )
+        # Сам пост не менялся, и время изменения прежнее
+        self.assertEqual(built['updated'], post['updated'])
+
+    def test_etag(self):
+        """Повторный запрос с ETag получает 304, другие поля - 200"""
+        urls = (
+            reverse('posts:api_index'),
+            reverse('posts:api_group', args=(self.group.slug,)),
+            reverse('posts:api_profile', args=(self.author.username,)),
+            reverse('posts:api_follow'),
+            reverse('posts:api_post', args=(self.post.id,)),
+            reverse('posts:api_comments', args=(self.post.id,)),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                etag = self.authorized_client.get(url)['ETag']
+                response = self.authorized_client.get(
+                    url, HTTP_IF_NONE_MATCH=etag
+                )
+                self.assertEqual(
+                    response.status_code, HTTPStatus.NOT_MODIFIED
+                )
+                response = self.authorized_client.get(
+                    url, {'fields': 'id'}, HTTP_IF_NONE_MATCH=etag
+                )
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_comments_count_only_on_post(self):
+        """Счётчик комментариев есть у поста, и новый комментарий меняет
+        его ETag; в лентах счётчика нет"""
+        feed = self.guest_client.get(reverse('posts:api_index'))
+        self.assertNotIn('comments_count', feed.json()['results'][0])
+        url = reverse('posts:api_post', args=(self.post.id,))
+        response = self.guest_client.get(url)
+        self.assertEqual(response.json()['comments_count'], 1)
+        Comment.objects.create(post=self.post, author=self.user, text='Ещё')
+        response = self.guest_client.get(
+            url, HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response.json()['comments_count'], 2)
+
+    def test_follow_feed(self):
+        url = reverse('posts:api_follow')
+        self.assertEqual(
+            self.guest_client.get(url).status_code, HTTPStatus.UNAUTHORIZED
+        )
+        results = self.authorized_client.get(url).json()['results']
+        self.assertEqual(results[0]['id'], self.post.id)
+
+    def test_comments(self):
+        response = self.guest_client.get(
+            reverse('posts:api_comments', args=(self.post.id,))
+        )
+        self.assertEqual(
+            response.json()['results'][0]['text'], 'Комментарий'
+        )
+
+    def test_missing_objects(self):
+        urls = (
+            reverse('posts:api_post', args=(0,)),
+            reverse('posts:api_comments', args=(0,)),
+            reverse('posts:api_group', args=('missing',)),
+            reverse('posts:api_profile', args=('missing',)),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+                self.assertIn('error', response.json())
@@ -0,0 +1,84 @@
+from io import StringIO
+from unittest.mock import patch
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import SimpleTestCase
+
+from posts.benchmark import login, percentile, summarize
+
+
+class LocalServerStub:
+    url = 'http://testserver'
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+class BenchmarkCommandTest(SimpleTestCase):
+    def test_local_server_runs_without_rate_limits(self):
+        """Сценарии записи не упираются в лимиты частоты"""
+        seen = {}
+
+        def run(base_url, scenarios, clients, requests_count):
+            seen['rate_limit'] = settings.RATE_LIMIT_ENABLED
+            seen['query_count'] = settings.QUERY_COUNT_HEADER
+            return {'scenarios': {}}
+
+        with patch('posts.benchmark.LocalServer', LocalServerStub):
+            with patch('posts.benchmark.run', run):
+                call_command(
+                    'benchmark',
+                    scenario=['create', 'comment'],
+                    stdout=StringIO(),
+                )
+        self.assertEqual(seen, {'rate_limit': False, 'query_count': True})
+
+
+class StatisticsTest(SimpleTestCase):
+    def test_percentile_nearest_rank(self):
+        self.assertEqual(percentile([5, 1, 4, 2, 3], 50), 3)
+        self.assertEqual(percentile(list(range(1, 151)), 99), 149)
+        self.assertEqual(percentile(list(range(1, 101)), 7), 7)
+        self.assertEqual(percentile([1, 2], 1), 1)
+        self.assertEqual(percentile([1, 2], 100), 2)
+        self.assertIsNone(percentile([], 50))
+
+    def test_summarize(self):
+        latencies = [0.001 * number for number in range(1, 101)]
+        self.assertEqual(summarize(latencies, [2, 4], 1, 2), {
+            'requests': 100,
+            'errors': 1,
+            'p50_ms': 50.0,
+            'p95_ms': 95.0,
+            'p99_ms': 99.0,
+            'throughput_rps': 50.0,
+            'queries_per_request': 3.0,
+        })
+        summary = summarize([], [], 0, 1)
+        self.assertIsNone(summary['p50_ms'])
+        self.assertIsNone(summary['queries_per_request'])
+
+
+class LoginTest(SimpleTestCase):
+    def session(self, status_code):
+        session = patch('posts.benchmark.requests.Session').start()
+        self.addCleanup(patch.stopall)
+        session.return_value.cookies = {'csrftoken': 'token'}
+        session.return_value.post.return_value.status_code = status_code
+        return session.return_value
+
+    def test_redirect_means_logged_in(self):
+        session = self.session(302)
+        self.assertIs(login('http://testserver', 'reader'), session)
+
+    def test_rejected_login_raises(self):
+        """Отказ по лимиту не превращает клиента в анонима"""
+        for status_code in (200, 429):
+            with self.subTest(status_code=status_code):
+                self.session(status_code)
+                with self.assertRaisesMessage(ValueError, str(status_code)):
+                    login('http://testserver', 'reader')
@@ -0,0 +1,114 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Group, Post, User, UserCounter
+
+TEST_USERNAME = 'HasNoName'
+TEST_TEXT = 'Тестовый текст'
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username=TEST_USERNAME)
+        cls.author = User.objects.create(username='author')
+        cls.group = Group.objects.create(
+            title='group', slug='group', description='group'
+        )
+        cls.other_group = Group.objects.create(
+            title='other', slug='other', description='other'
+        )
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_post_and_comment_counters(self):
+        """Пост и комментарий обновляют счётчики"""
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            {'text': TEST_TEXT, 'group': self.group.id},
+        )
+        post = Post.objects.get(author=self.user)
+        self.authorized_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': post.id}),
+            {'text': TEST_TEXT},
+        )
+        self.assertEqual(
+            UserCounter.objects.get(user=self.user).posts_count, 1
+        )
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 1)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+
+    def test_post_delete_skips_comment_counters(self):
+        """Удаление поста не правит счётчик на каждый его комментарий"""
+        queries = []
+        for comments in (1, 20):
+            post = Post.objects.create(text=TEST_TEXT, author=self.user)
+            Comment.objects.bulk_create(
+                Comment(post=post, author=self.user, text=TEST_TEXT)
+                for _ in range(comments)
+            )
+            with CaptureQueriesContext(connection) as context:
+                post.delete()
+            queries.append(len(context))
+        self.assertEqual(queries[0], queries[1])
+        comment = Comment.objects.create(
+            post=Post.objects.create(text=TEST_TEXT, author=self.user),
+            author=self.user,
+            text=TEST_TEXT,
+        )
+        comment.delete()
+        comment.post.refresh_from_db()
+        self.assertEqual(comment.post.comments_count, 0)
+
+    def test_post_edit_moves_group_counter(self):
+        """Смена группы поста переносит счётчик"""
+        post = Post.objects.create(
+            text=TEST_TEXT, author=self.user, group=self.group
+        )
+        self.authorized_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': post.id}),
+            {'text': TEST_TEXT, 'group': self.other_group.id},
+        )
+        self.group.refresh_from_db()
+        self.other_group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 0)
+        self.assertEqual(self.other_group.posts_count, 1)
+
+    def test_follow_counters(self):
+        """Подписка и отписка обновляют счётчики"""
+        follow = reverse('posts:profile_follow', args=(self.author.username,))
+        unfollow = reverse(
+            'posts:profile_unfollow', args=(self.author.username,)
+        )
+        self.authorized_client.get(follow)
+        self.assertEqual(
+            UserCounter.objects.get(user=self.user).following_count, 1
+        )
+        self.assertEqual(
+            UserCounter.objects.get(user=self.author).followers_count, 1
+        )
+        self.authorized_client.get(unfollow)
+        self.assertEqual(
+            UserCounter.objects.get(user=self.author).followers_count, 0
+        )
+
+    def test_recount_fixes_drift(self):
+        """Команда recount_counters находит и исправляет расхождения"""
+        Post.objects.create(text=TEST_TEXT, author=self.user)
+        UserCounter.objects.filter(user=self.user).update(posts_count=5)
+        out = StringIO()
+        call_command('recount_counters', stdout=out)
+        self.assertIn('posts_count 5 -> 1', out.getvalue())
+        self.assertEqual(
+            UserCounter.objects.get(user=self.user).posts_count, 1
+        )
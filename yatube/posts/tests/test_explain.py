@@ -0,0 +1,47 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from posts.models import Follow, Post, User
+
+
+class ExplainQueriesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='reader')
+        cls.author = User.objects.create(username='User_2')
+        cls.post = Post.objects.create(
+            text='Тестовый текст', author=cls.author
+        )
+        Follow.objects.create(user=cls.user, author=cls.author)
+
+    def explain(self):
+        out = StringIO()
+        call_command(
+            'explain_queries', username=self.user.username, stdout=out
+        )
+        return out.getvalue(), {
+            section.split('\n')[0]: section
+            for section in out.getvalue().split('\n/')
+        }
+
+    def test_feeds_use_indexes(self):
+        """EXPLAIN запросов страниц: все идут по индексам"""
+        output, sections = self.explain()
+        urls = (
+            '/', 'profile/User_2/', f'posts/{self.post.id}/',
+            f'posts/{self.post.id}/comments/', 'follow/',
+            'search/?q=Тестовый',
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertNotIn('!!', sections[url])
+        self.assertIn('Проблемных запросов: 0', output)
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_pulled_authors_use_indexes(self):
+        """Посты популярных авторов лента подписок читает по индексу"""
+        sections = self.explain()[1]
+        self.assertNotIn('!!', sections['follow/'])
@@ -0,0 +1,109 @@
+from http import HTTPStatus
+
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Group, Post, User
+
+
+@override_settings(SYNDICATION_COUNT=20)
+class SyndicationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='reader')
+        cls.author = User.objects.create(username='author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        Post.objects.create(
+            text='Пост в группе', author=cls.author, group=cls.group
+        )
+        Post.objects.create(text='Пост без группы', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def urls(self):
+        for kind in ('rss', 'atom'):
+            yield reverse(f'posts:index_{kind}')
+            yield reverse(f'posts:group_{kind}', args=(self.group.slug,))
+            yield reverse(
+                f'posts:author_{kind}', args=(self.author.username,)
+            )
+
+    def test_feeds(self):
+        """Ленты отдают посты в своём формате"""
+        for url in self.urls():
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                content_type = (
+                    'application/atom+xml' if 'atom' in url
+                    else 'application/rss+xml'
+                )
+                self.assertTrue(
+                    response['Content-Type'].startswith(content_type)
+                )
+                self.assertContains(response, 'Пост в группе')
+                self.assertIn('max-age=60', response['Cache-Control'])
+
+    def test_feed_filters_posts(self):
+        response = self.guest_client.get(
+            reverse('posts:group_rss', args=(self.group.slug,))
+        )
+        self.assertNotContains(response, 'Пост без группы')
+        self.assertContains(response, 'Записи сообщества Группа')
+        response = self.guest_client.get(reverse('posts:index_atom'))
+        self.assertContains(response, 'Пост без группы')
+
+    def test_unknown_object(self):
+        urls = (
+            reverse('posts:group_rss', args=('missing',)),
+            reverse('posts:author_atom', args=('missing',)),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_not_modified(self):
+        """Повторный опрос получает 304 по ETag и по времени"""
+        for url in self.urls():
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                etag = self.guest_client.get(
+                    url, HTTP_IF_NONE_MATCH=response['ETag']
+                )
+                self.assertEqual(etag.status_code, HTTPStatus.NOT_MODIFIED)
+                modified = self.guest_client.get(
+                    url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+                )
+                self.assertEqual(
+                    modified.status_code, HTTPStatus.NOT_MODIFIED
+                )
+
+    def test_etag_same_for_everyone(self):
+        url = reverse('posts:index_rss')
+        self.assertEqual(
+            self.guest_client.get(url)['ETag'],
+            self.authorized_client.get(url)['ETag'],
+        )
+
+    def test_new_post_invalidates(self):
+        """Новый пост сбрасывает кэш страниц и ETag ленты"""
+        url = reverse('posts:group_atom', args=(self.group.slug,))
+        etag = self.guest_client.get(url)['ETag']
+        # Из базы только валидаторы, лента из кэша страниц
+        with self.assertNumQueries(1):
+            self.guest_client.get(url)
+        Post.objects.create(
+            text='Свежий пост', author=self.author, group=self.group
+        )
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertContains(response, 'Свежий пост')
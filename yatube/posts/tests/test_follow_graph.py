@@ -0,0 +1,79 @@
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import follow_graph
+from posts.models import Follow, Post, User
+
+
+class FollowGraphTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create(username='reader')
+        cls.other = User.objects.create(username='other')
+        cls.author = User.objects.create(username='author')
+        cls.second = User.objects.create(username='second')
+        Post.objects.create(text='Пост автора', author=cls.author)
+        Follow.objects.create(user=cls.other, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def test_batched_checks_from_cache(self):
+        """Подписки многих авторов проверяются без запросов"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        follow_graph.followees(self.reader.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                follow_graph.follows_many(
+                    self.reader.pk, (self.author.pk, self.second.pk)
+                ),
+                {self.author.pk},
+            )
+            self.assertFalse(
+                follow_graph.follows(self.reader.pk, self.second.pk)
+            )
+
+    def test_follow_and_unfollow_update_set(self):
+        version = follow_graph.version(self.reader.pk)
+        self.client.get(
+            reverse('posts:profile_follow', args=(self.second.username,))
+        )
+        self.assertTrue(follow_graph.follows(self.reader.pk, self.second.pk))
+        self.assertNotEqual(follow_graph.version(self.reader.pk), version)
+        self.client.get(
+            reverse('posts:profile_unfollow', args=(self.second.username,))
+        )
+        self.assertFalse(
+            follow_graph.follows(self.reader.pk, self.second.pk)
+        )
+
+    def test_profile_following_is_about_viewer(self):
+        """На автора подписан другой читатель, а не текущий"""
+        response = self.client.get(
+            reverse('posts:profile', args=(self.author.username,))
+        )
+        self.assertFalse(response.context['following'])
+        Follow.objects.create(user=self.reader, author=self.author)
+        response = self.client.get(
+            reverse('posts:profile', args=(self.author.username,))
+        )
+        self.assertTrue(response.context['following'])
+
+    def test_feed_cards_have_follow_buttons(self):
+        """Кнопки на карточках ленты меняются после подписки"""
+        follow = reverse('posts:profile_follow', args=(self.author.username,))
+        unfollow = reverse(
+            'posts:profile_unfollow', args=(self.author.username,)
+        )
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, follow)
+        self.client.get(follow)
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, unfollow)
+        self.assertNotContains(response, follow)
+        guest = Client().get(reverse('posts:index'))
+        self.assertNotContains(guest, follow)
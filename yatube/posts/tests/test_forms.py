@@ -1,13 +1,21 @@
+import os
 import shutil
 import tempfile
 from http import HTTPStatus
+from io import StringIO
+from unittest.mock import patch
 
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase, override_settings
+from django.core.management import call_command
+from django.test import (Client, TestCase, TransactionTestCase,
+                         override_settings)
 from django.urls import reverse
+from PIL import Image
 
-from posts.models import Comment, Post, User
+from core.testing import image_upload
+from posts import thumbnails
+from posts.models import Comment, Post, StoredImage, User
 
 TEST_USERNAME = 'HasNoName'
 TEST_TITLE = 'test title'
@@ -82,7 +90,8 @@ class PostCreateFormTests(TestCase):
         self.assertTrue(
             Post.objects.filter(
                 text='Тестовый текст 2',
-                image='posts/small.gif'
+                image__startswith='posts/',
+                image__endswith='.jpg',
             ).exists()
         )
 
@@ -153,3 +162,129 @@ class CommentCreateFormTests(TestCase):
                 text='Тестовый текст 2',
             ).exists()
         )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, IMAGE_MAX_SIZE=(100, 100))
+class ImageIngestTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username=TEST_USERNAME)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def create(self, upload):
+        return self.authorized_client.post(
+            CREATE, data={'text': TEST_TEXT, 'image': upload}
+        )
+
+    def test_downscaled_and_stripped(self):
+        """Картинка уменьшается, пережимается в JPEG и теряет EXIF"""
+        exif = Image.Exif()
+        exif[0x010F] = 'Camera'
+        self.create(image_upload(
+            'photo.jpg', (400, 200), image_format='JPEG', exif=exif
+        ))
+        post = Post.objects.get()
+        self.assertRegex(post.image.name, r'^posts/[0-9a-f/]{70}\.jpg$')
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.format, 'JPEG')
+            self.assertEqual(image.size, (100, 50))
+            self.assertNotIn('exif', image.info)
+
+    def test_transparency_flattened(self):
+        self.create(image_upload('logo.png', (10, 10), mode='RGBA'))
+        with Image.open(Post.objects.get().image.path) as image:
+            self.assertEqual(image.mode, 'RGB')
+            red, green, blue = image.getpixel((5, 5))
+            self.assertGreater(min(red, green, blue), 240)
+
+    @override_settings(IMAGE_MAX_PIXELS=100)
+    def test_too_many_pixels(self):
+        """Картинку с огромным числом точек не распаковываем"""
+        response = self.create(image_upload('bomb.png', (20, 20)))
+        self.assertFormError(
+            response, 'form', 'image', 'Слишком большая картинка: 20x20 точек'
+        )
+        self.assertFalse(Post.objects.exists())
+
+    @override_settings(IMAGE_MAX_UPLOAD_SIZE=10)
+    def test_upload_size_limit(self):
+        self.create(image_upload('big.png', (20, 20)))
+        self.assertFalse(Post.objects.exists())
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, IMAGE_MAX_SIZE=(100, 100))
+class ImageStorageTests(TransactionTestCase):
+    """Файлы по хэшу содержимого; удаляются после коммита"""
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.user = User.objects.create(username=TEST_USERNAME)
+        # Коммиты здесь настоящие: задачи миниатюр оставались бы
+        # в очереди, они этим тестам не нужны
+        schedule = patch('posts.thumbnails.schedule')
+        schedule.start()
+        self.addCleanup(schedule.stop)
+
+    def create(self, name, size=(50, 50)):
+        post = Post.objects.create(text=TEST_TEXT, author=self.user)
+        post.image.save(name, image_upload(name, size))
+        return post
+
+    def references(self, post):
+        return StoredImage.objects.get(name=post.image.name).references
+
+    def test_duplicates_share_file(self):
+        first = self.create('first.png')
+        second = self.create('second.png')
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(self.references(first), 2)
+        self.assertNotEqual(
+            self.create('other.png', (60, 60)).image.name, first.image.name
+        )
+
+    def test_duplicates_share_thumbnail(self):
+        first = self.create('first.png')
+        second = self.create('second.png')
+        thumbnails.generate(first.id)
+        self.assertIsNotNone(thumbnails.feed_thumbnail(second.image))
+
+    def test_file_deleted_with_last_reference(self):
+        first = self.create('first.png')
+        second = self.create('second.png')
+        path = first.image.path
+        first.delete()
+        self.assertTrue(os.path.exists(path))
+        self.assertEqual(self.references(second), 1)
+        second.delete()
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(StoredImage.objects.exists())
+
+    def test_edit_releases_old_file(self):
+        post = self.create('first.png')
+        path = post.image.path
+        post.image.save('other.png', image_upload('other.png', (60, 60)))
+        self.assertFalse(os.path.exists(path))
+        self.assertEqual(self.references(post), 1)
+
+    def test_reprocess_command(self):
+        """Команда пережимает старые картинки и удаляет исходники"""
+        post = Post.objects.create(text=TEST_TEXT, author=self.user)
+        post.image.save('old.png', image_upload('old.png', (300, 300)))
+        original = post.image.path
+        out = StringIO()
+        call_command('reprocess_images', stdout=out)
+        post.refresh_from_db()
+        self.assertTrue(post.image.name.endswith('.jpg'))
+        self.assertFalse(os.path.exists(original))
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.size, (100, 100))
+        call_command('reprocess_images', stdout=out)
+        self.assertIn('пережато: 0, без изменений: 1', out.getvalue())
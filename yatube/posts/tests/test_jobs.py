@@ -0,0 +1,179 @@
+import multiprocessing
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+from django.conf import settings
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import (Client, SimpleTestCase, TestCase,
+                         TransactionTestCase, override_settings)
+from django.urls import reverse
+from django.utils import timezone
+
+from core import jobs
+from core.models import Job
+from core.testing import image_upload
+from posts import feed_cache, page_cache, thumbnails
+from posts.models import Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+calls = []
+
+
+@jobs.task('tests.record')
+def record(value, suffix=''):
+    calls.append(f'{value}{suffix}')
+
+
+@jobs.task('tests.broken', max_attempts=2)
+def broken():
+    raise ValueError('сломано')
+
+
+@override_settings(JOB_RETRY_DELAY=10, JOB_RETRY_MAX_DELAY=30)
+class JobQueueTest(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_runs_by_priority_and_deletes_done(self):
+        record.enqueue(['low'])
+        record.enqueue(['high'], {'suffix': '!'}, priority=5)
+        self.assertEqual(jobs.work('test', once=True), 2)
+        self.assertEqual(calls, ['high!', 'low'])
+        self.assertFalse(Job.objects.exists())
+
+    def test_dedup_key_while_pending(self):
+        self.assertIsNotNone(record.enqueue(['a'], dedup_key='same'))
+        self.assertIsNone(record.enqueue(['b'], dedup_key='same'))
+        jobs.work('test', once=True)
+        self.assertEqual(calls, ['a'])
+        self.assertIsNotNone(record.enqueue(['c'], dedup_key='same'))
+
+    def test_delayed_job_waits(self):
+        record.enqueue(
+            ['later'], run_after=timezone.now() + timedelta(minutes=1)
+        )
+        self.assertEqual(jobs.work('test', once=True), 0)
+        self.assertEqual(calls, [])
+
+    def test_retry_with_backoff_then_failed(self):
+        job = broken.enqueue()
+        jobs.work('test', once=True)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.PENDING)
+        self.assertEqual(job.attempts, 1)
+        self.assertIn('сломано', job.last_error)
+        self.assertGreaterEqual(
+            job.run_after, timezone.now() + timedelta(seconds=9)
+        )
+        Job.objects.update(run_after=timezone.now())
+        jobs.work('test', once=True)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(job.attempts, 2)
+        # Упавшую задачу обработчик больше не берёт
+        self.assertIsNone(jobs.claim('test'))
+
+    def test_backoff_doubles_up_to_limit(self):
+        self.assertLessEqual(jobs.backoff(1).total_seconds(), 12.5)
+        self.assertGreaterEqual(jobs.backoff(2).total_seconds(), 20)
+        self.assertLessEqual(jobs.backoff(5).total_seconds(), 30 * 1.25)
+
+    @override_settings(JOB_TIMEOUT=60)
+    def test_stale_running_job_counts_as_attempt(self):
+        """Задача умершего обработчика - упавшая попытка, не вечный повтор"""
+        job = record.enqueue(['lost'])
+        Job.objects.update(max_attempts=2)
+        self.assertIsNotNone(jobs.claim('dead'))
+        self.assertIsNone(jobs.claim('alive'))
+        Job.objects.update(started=timezone.now() - timedelta(minutes=2))
+        self.assertIsNone(jobs.claim('alive'))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.PENDING)
+        self.assertEqual(job.attempts, 1)
+        self.assertIn('dead', job.last_error)
+        Job.objects.update(run_after=timezone.now())
+        self.assertIsNotNone(jobs.claim('dead'))
+        Job.objects.update(started=timezone.now() - timedelta(minutes=2))
+        self.assertIsNone(jobs.claim('alive'))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(calls, [])
+
+    def test_command_once(self):
+        record.enqueue(['cli'])
+        out = StringIO()
+        call_command('run_jobs', processes=1, once=True, stdout=out)
+        self.assertEqual(calls, ['cli'])
+        self.assertIn('1', out.getvalue())
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class EnqueueOnCommitTest(TransactionTestCase):
+    """Задачи ставятся после коммита, поэтому коммиты настоящие"""
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(
+            username='writer', email='writer@example.com'
+        )
+        self.user.set_password('secret-password')
+        self.user.save()
+
+    def test_password_reset_mail_sent_by_worker(self):
+        response = Client().post(
+            reverse('users:password_reset_form'),
+            {'email': 'writer@example.com'},
+        )
+        self.assertRedirects(response, reverse('users:password_reset_done'))
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(Job.objects.get().name, 'users.send_email')
+        jobs.work('test', once=True)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['writer@example.com'])
+        link = mail.outbox[0].body.split('http://testserver')[1].split()[0]
+        self.assertEqual(Client().get(link).status_code, 302)
+
+    def test_thumbnail_built_by_worker(self):
+        post = Post.objects.create(text='Картинка', author=self.user)
+        post.image.save('red.png', image_upload('red.png'))
+        job = Job.objects.get()
+        self.assertEqual(job.dedup_key, f'thumbnail:{post.pk}')
+        self.assertIsNone(thumbnails.feed_thumbnail(post.image))
+        jobs.work('test', once=True)
+        self.assertIsNotNone(thumbnails.feed_thumbnail(post.image))
+        self.assertFalse(Job.objects.exists())
+
+
+def purge_index():
+    feed_cache.bump(feed_cache.INDEX_FEED)
+    page_cache.purge(page_cache.INDEX)
+
+
+class SharedCacheTest(SimpleTestCase):
+    """Сбросы из процесса обработчика видны веб-процессу"""
+
+    def test_purge_from_other_process(self):
+        pages = page_cache._generations((page_cache.INDEX,))
+        generation = feed_cache.get_generation(feed_cache.INDEX_FEED)
+        worker = multiprocessing.get_context('fork').Process(
+            target=purge_index
+        )
+        worker.start()
+        worker.join()
+        self.assertEqual(worker.exitcode, 0)
+        self.assertNotEqual(
+            page_cache._generations((page_cache.INDEX,)), pages
+        )
+        self.assertNotEqual(
+            feed_cache.get_generation(feed_cache.INDEX_FEED), generation
+        )
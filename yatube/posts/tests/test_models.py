@@ -1,3 +1,4 @@
+from django.db import IntegrityError, transaction
 from django.test import TestCase
 
 from ..models import Comment, Follow, Group, Post, User
@@ -71,3 +72,8 @@ class FollowModelTest(TestCase):
         self.assertEqual(
             expected_following_username, follow_model.author.username
         )
+
+    def test_follow_is_unique(self):
+        """Повторная подписка на того же автора запрещена"""
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Follow.objects.create(user=self.user, author=self.user2)
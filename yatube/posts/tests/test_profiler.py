@@ -0,0 +1,66 @@
+import time
+from http import HTTPStatus
+
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from core import profiler
+from core.middleware.profiler import ProfilerMiddleware
+from posts.models import User
+
+
+def slow_view(request):
+    time.sleep(0.05)
+    return HttpResponse()
+
+
+@override_settings(PROFILER_INTERVAL=0.001)
+class ProfilerTest(TestCase):
+    def setUp(self):
+        profiler.profiles.clear()
+        self.middleware = ProfilerMiddleware(slow_view)
+        self.request = RequestFactory().get('/slow/')
+
+    @override_settings(PROFILER_SAMPLE_RATE=1)
+    def test_sampled_request_recorded(self):
+        """Запрос из выборки попадает в отчёт со своим стеком"""
+        self.middleware(self.request)
+        view = profiler.report()[0]
+        self.assertEqual(view['view'], '/slow/')
+        self.assertEqual(view['requests'], 1)
+        self.assertIn('slow_view', view['tree'][0]['name'])
+        self.assertIn('slow_view', view['functions'][0]['name'])
+
+    @override_settings(PROFILER_SAMPLE_RATE=0, PROFILER_SLOW_MS=None)
+    def test_not_sampled_request_skipped(self):
+        """Запрос вне выборки не профилируется"""
+        self.middleware(self.request)
+        self.assertEqual(profiler.report(), [])
+        self.assertEqual(profiler.sampler.active, {})
+
+    @override_settings(PROFILER_SAMPLE_RATE=0, PROFILER_SLOW_MS=10)
+    def test_slow_request_recorded(self):
+        """Медленный запрос сохраняется и без выборки"""
+        self.middleware(self.request)
+        self.assertEqual(len(profiler.profiles), 1)
+
+    def test_buffer_is_bounded(self):
+        """Буфер хранит только последние профили"""
+        for _ in range(profiler.profiles.maxlen + 5):
+            profiler.record('view', '/', 0.1, {('f',): 1})
+        self.assertEqual(len(profiler.profiles), profiler.profiles.maxlen)
+
+    def test_report_for_staff_only(self):
+        """Отчёт открывается только персоналу"""
+        url = reverse('profiler_report')
+        user = User.objects.create_user(username='user')
+        client = Client()
+        client.force_login(user)
+        self.assertEqual(client.get(url).status_code, HTTPStatus.FOUND)
+        user.is_staff = True
+        user.save()
+        profiler.record('posts:index', '/', 0.1, {('index (v.py:1)',): 3})
+        response = client.get(url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertContains(response, 'posts:index')
@@ -0,0 +1,146 @@
+from http import HTTPStatus
+from unittest.mock import patch
+
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core import ratelimit
+from core.models import RateLimitWindow
+from posts.models import Post, User
+
+CREATE_LIMIT = {'post_create': {'rate': '2/m', 'methods': ('POST',)}}
+LOGIN_LIMIT = {'users:login': {'rate': '1/m', 'methods': ('POST',)}}
+# 20 секунд от начала минутного окна
+NOW = 60 * 1000000 + 20
+
+
+class RateLimitTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='writer')
+        cls.other = User.objects.create(username='other')
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def create(self, client=None):
+        return (client or self.client).post(
+            reverse('posts:post_create'), {'text': 'Спам'}
+        )
+
+    @override_settings(RATE_LIMITS=CREATE_LIMIT)
+    @patch('core.ratelimit.time.time', return_value=NOW)
+    def test_decorated_view_limited_per_user(self, now):
+        """Сверх лимита 429 с Retry-After, у другого свой счётчик"""
+        self.create()
+        self.create()
+        response = self.create()
+        self.assertEqual(response.status_code, HTTPStatus.TOO_MANY_REQUESTS)
+        self.assertEqual(response['Retry-After'], '40')
+        self.assertEqual(Post.objects.count(), 2)
+        # GET формы не считается
+        response = self.client.get(reverse('posts:post_create'))
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        other = Client(REMOTE_ADDR='10.0.0.2')
+        other.force_login(self.other)
+        self.assertEqual(self.create(other).status_code, HTTPStatus.FOUND)
+        # Тот же пользователь с другого IP упирается в свой счётчик
+        moved = Client(REMOTE_ADDR='10.0.0.3')
+        moved.force_login(self.user)
+        self.assertEqual(
+            self.create(moved).status_code, HTTPStatus.TOO_MANY_REQUESTS
+        )
+
+    @override_settings(RATE_LIMITS=CREATE_LIMIT)
+    @patch('core.ratelimit.time.time', return_value=NOW)
+    def test_users_behind_one_ip_share_its_limit(self, now):
+        self.create()
+        self.create()
+        other = Client()
+        other.force_login(self.other)
+        self.assertEqual(
+            self.create(other).status_code, HTTPStatus.TOO_MANY_REQUESTS
+        )
+
+    @override_settings(RATE_LIMITS=CREATE_LIMIT)
+    def test_next_window_resets(self):
+        with patch('core.ratelimit.time.time', return_value=NOW):
+            self.create()
+            self.create()
+        with patch('core.ratelimit.time.time', return_value=NOW + 40):
+            self.assertEqual(self.create().status_code, HTTPStatus.FOUND)
+            self.create()
+            self.assertEqual(
+                self.create().status_code, HTTPStatus.TOO_MANY_REQUESTS
+            )
+
+    @patch('core.ratelimit.time.time', return_value=NOW)
+    def test_counted_by_one_conditional_update(self, now):
+        """Запрос в открытом окне - один UPDATE с проверкой лимита
+
+        Проверка и прибавление в одном запросе: параллельные запросы
+        не прочитают одно и то же значение счётчика.
+        """
+        limit = ratelimit.Limit('2/m')
+        self.assertEqual(limit.take('parallel'), 0)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(limit.take('parallel'), 0)
+        self.assertEqual(len(queries), 1)
+        self.assertIn('"hits" < 2', queries[0]['sql'])
+        self.assertEqual(limit.take('parallel'), 40)
+        self.assertEqual(RateLimitWindow.objects.get().hits, 2)
+
+    def test_past_windows_deleted(self):
+        limit = ratelimit.Limit('2/m')
+        with patch('core.ratelimit.time.time', return_value=NOW):
+            limit.take('old')
+        with patch('core.ratelimit.time.time', return_value=NOW + 60):
+            limit.take('new')
+        self.assertQuerysetEqual(
+            RateLimitWindow.objects.all(), ['new'], lambda row: row.key
+        )
+
+    @override_settings(RATE_LIMITS=LOGIN_LIMIT)
+    def test_middleware_limits_login_per_ip(self):
+        url = reverse('users:login')
+        data = {'username': 'writer', 'password': 'wrong'}
+        guest = Client()
+        self.assertEqual(guest.post(url, data).status_code, HTTPStatus.OK)
+        self.assertEqual(
+            guest.post(url, data).status_code, HTTPStatus.TOO_MANY_REQUESTS
+        )
+        self.assertEqual(
+            guest.post(url, data, REMOTE_ADDR='10.0.0.2').status_code,
+            HTTPStatus.OK,
+        )
+
+    @override_settings(RATE_LIMITS=LOGIN_LIMIT)
+    def test_rejections_reported(self):
+        url = reverse('users:login')
+        guest = Client()
+        for _ in range(3):
+            guest.post(url, {'username': 'writer', 'password': 'wrong'})
+        self.assertEqual(
+            ratelimit.report(),
+            [{'scope': 'users:login', 'limit': '1/m', 'rejected': 2}],
+        )
+        admin = User.objects.create(username='admin', is_staff=True)
+        self.client.force_login(admin)
+        response = self.client.get(reverse('ratelimit_report'))
+        self.assertContains(response, 'users:login')
+
+    def test_report_shows_decorator_limits(self):
+        ratelimit._count_rejection('add_comment')
+        self.assertEqual(
+            ratelimit.report(),
+            [{'scope': 'add_comment', 'limit': '20/m', 'rejected': 1}],
+        )
+
+    @override_settings(RATE_LIMITS=CREATE_LIMIT, RATE_LIMIT_ENABLED=False)
+    def test_disabled(self):
+        for _ in range(3):
+            self.assertEqual(self.create().status_code, HTTPStatus.FOUND)
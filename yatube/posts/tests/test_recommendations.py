@@ -0,0 +1,110 @@
+import multiprocessing
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Follow, Recommendation, User
+from posts import recommendations
+from posts.recommendations import Adjacency, sample
+
+
+class AdjacencyTest(TestCase):
+    def test_neighbours(self):
+        graph = Adjacency([(1, 2), (1, 5), (4, 1)])
+        self.assertEqual(list(graph[1]), [2, 5])
+        self.assertEqual(list(graph[4]), [1])
+        self.assertEqual(list(graph[3]), [])
+        self.assertEqual(list(graph), [1, 4])
+
+    def test_sample_spread(self):
+        self.assertEqual(list(sample(list(range(10)), 4)), [0, 3, 6, 9])
+        self.assertEqual(sample([1, 2], 4), [1, 2])
+
+
+@override_settings(RECOMMEND_COUNT=10, RECOMMEND_SHOW=5)
+class RecommendationsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        names = ('reader', 'friend', 'friend_of_friend', 'cofollowed',
+                 'other', 'another')
+        for name in names:
+            setattr(cls, name, User.objects.create(username=name))
+        for user, author in (
+            (cls.reader, cls.friend),
+            (cls.friend, cls.friend_of_friend),
+            (cls.other, cls.friend),
+            (cls.other, cls.cofollowed),
+            (cls.another, cls.friend),
+            (cls.another, cls.cofollowed),
+        ):
+            Follow.objects.create(user=user, author=author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def rebuild(self):
+        call_command('recommend_follows', stdout=StringIO())
+
+    def recommended(self, user):
+        return list(
+            Recommendation.objects.filter(user=user).order_by(
+                '-score', 'author_id'
+            ).values_list('author__username', flat=True)
+        )
+
+    def test_friends_of_friends_and_cofollows(self):
+        self.rebuild()
+        recommended = self.recommended(self.reader)
+        # Уже подписанный автор и сам читатель не предлагаются
+        self.assertEqual(recommended, ['friend_of_friend', 'cofollowed'])
+
+    def test_rebuild_replaces_rows(self):
+        self.rebuild()
+        Follow.objects.filter(user=self.reader).delete()
+        self.rebuild()
+        self.assertEqual(self.recommended(self.reader), [])
+
+    def test_sidebar(self):
+        """Блок на главной: один запрос, без уже подписанных авторов"""
+        self.rebuild()
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'На кого подписаться')
+        self.assertContains(
+            response,
+            reverse('posts:profile_follow', args=('cofollowed',)),
+        )
+        Follow.objects.create(user=self.reader, author=self.cofollowed)
+        response = self.client.get(reverse('posts:index'))
+        self.assertNotContains(
+            response,
+            reverse('posts:profile_follow', args=('cofollowed',)),
+        )
+        guest = Client().get(reverse('posts:index'))
+        self.assertNotContains(guest, 'На кого подписаться')
+
+    def test_rebuild_refreshes_index(self):
+        """После пересчёта главная меняет ETag и показывает новый блок"""
+        url = reverse('posts:index')
+        response = self.client.get(url)
+        self.assertNotContains(response, 'На кого подписаться')
+        self.rebuild()
+        response = self.client.get(
+            url, HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertContains(response, 'На кого подписаться')
+
+    def test_version_shared_with_command_process(self):
+        """Пересчёт идёт в процессе команды, а версию видят веб-процессы"""
+        version = recommendations.version()
+        command = multiprocessing.get_context('fork').Process(
+            target=recommendations._changed
+        )
+        command.start()
+        command.join()
+        self.assertNotEqual(recommendations.version(), version)
@@ -0,0 +1,54 @@
+from django.db import transaction
+from django.http import HttpResponse
+from django.test import (RequestFactory, TransactionTestCase,
+                         override_settings)
+
+from core.db_router import ReplicaRouter, primary
+from core.middleware.replica import PIN_COOKIE, ReplicaPinMiddleware
+from posts.models import Post
+
+REPLICA = 'replica_1'
+
+
+@override_settings(DATABASE_REPLICAS=[REPLICA])
+class ReplicaRouterTest(TransactionTestCase):
+    # Без обёртки TestCase в транзакцию: в ней чтения идут в основную
+    def setUp(self):
+        self.router = ReplicaRouter()
+        self.factory = RequestFactory()
+
+    def middleware_call(self, request, write=False):
+        """Прогоняет запрос через middleware и запоминает базу чтения"""
+        def view(request):
+            self.read_from = self.router.db_for_read(Post)
+            if write:
+                self.router.db_for_write(Post)
+            return HttpResponse()
+        return ReplicaPinMiddleware(view)(request)
+
+    def test_reads_go_to_replica(self):
+        """Чтения идут в реплику, запись и транзакции - в основную"""
+        self.assertEqual(self.router.db_for_read(Post), REPLICA)
+        self.assertEqual(self.router.db_for_write(Post), 'default')
+        with primary():
+            self.assertEqual(self.router.db_for_read(Post), 'default')
+        with transaction.atomic():
+            self.assertEqual(self.router.db_for_read(Post), 'default')
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_without_replicas(self):
+        """Без реплик всё читается из основной базы"""
+        self.assertEqual(self.router.db_for_read(Post), 'default')
+
+    def test_write_pins_client_to_primary(self):
+        """После записи клиент какое-то время читает из основной базы"""
+        response = self.middleware_call(self.factory.get('/'))
+        self.assertEqual(self.read_from, REPLICA)
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+        response = self.middleware_call(self.factory.post('/'), write=True)
+        self.assertEqual(self.read_from, 'default')
+        self.assertIn(PIN_COOKIE, response.cookies)
+        request = self.factory.get('/')
+        request.COOKIES[PIN_COOKIE] = '1'
+        self.middleware_call(request)
+        self.assertEqual(self.read_from, 'default')
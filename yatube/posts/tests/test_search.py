@@ -0,0 +1,81 @@
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Post, User
+
+TEST_USERNAME = 'HasNoName'
+
+
+class SearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username=TEST_USERNAME)
+        cls.tree = Post.objects.create(
+            author=cls.user, text='Наряжаем ёлку к празднику'
+        )
+        cls.cats = Post.objects.create(
+            author=cls.user, text='Кошки и котики: всё о кошках'
+        )
+        cls.other = Post.objects.create(
+            author=cls.user, text='Прогулка по парку'
+        )
+
+    def setUp(self):
+        self.client = Client()
+
+    def search(self, query, **params):
+        response = self.client.get(
+            reverse('posts:search'), {'q': query, **params}
+        )
+        return response.context['posts'], response.context['next_cursor']
+
+    def test_search_word_forms(self):
+        """Поиск находит другие формы слова и не различает ё и е"""
+        self.assertEqual(self.search('кошка')[0], [self.cats])
+        self.assertEqual(self.search('елки')[0], [self.tree])
+        self.assertEqual(self.search('ПРАЗДНИКИ')[0], [self.tree])
+        self.assertEqual(self.search('')[0], [])
+        self.assertEqual(self.search('!!!')[0], [])
+
+    def test_search_follows_edits(self):
+        """Индекс обновляется при правке и удалении поста"""
+        self.other.text = 'Прогулка с кошкой'
+        self.other.save()
+        self.assertEqual(len(self.search('кошки')[0]), 2)
+        Post.objects.filter(pk=self.cats.pk).delete()
+        self.assertEqual(self.search('кошки')[0], [self.other])
+        self.assertEqual(self.search('парк')[0], [])
+
+    def test_search_cursor(self):
+        """Результаты листаются курсором без повторов"""
+        Post.objects.bulk_create(
+            Post(author=self.user, text=f'Снег {number}')
+            for number in range(15)
+        )
+        first, cursor = self.search('снег')
+        self.assertEqual(len(first), 10)
+        rest, last_cursor = self.search('снег', after=cursor)
+        self.assertEqual(len(rest), 5)
+        self.assertEqual(last_cursor, '')
+        self.assertFalse(set(first) & set(rest))
+
+    def test_admin_search(self):
+        """Админка ищет посты и комментарии по индексу"""
+        Comment.objects.create(
+            post=self.other, author=self.user, text='Чудесный парк'
+        )
+        admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+        self.client.force_login(admin)
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'кошкам'}
+        )
+        self.assertEqual(
+            list(response.context['cl'].result_list), [self.cats]
+        )
+        response = self.client.get(
+            reverse('admin:posts_comment_changelist'), {'q': 'парки'}
+        )
+        self.assertEqual(response.context['cl'].result_count, 1)
@@ -0,0 +1,61 @@
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core import timing
+from posts.models import Post, User
+
+
+def parse(header):
+    metrics = {}
+    for entry in header.split(', '):
+        name, *params = entry.split(';')
+        metrics[name] = dict(param.split('=', 1) for param in params)
+    return metrics
+
+
+class ServerTimingTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        Post.objects.create(author=cls.user, text='Тестовый пост')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_header_breakdown(self):
+        """Главная отдаёт время БД, кэша, шаблонов и общее"""
+        response = self.client.get(reverse('posts:index'))
+        metrics = parse(response['Server-Timing'])
+        for name in ('db', 'cache-get', 'cache-set', 'template', 'total'):
+            with self.subTest(name=name):
+                self.assertGreaterEqual(float(metrics[name]['dur']), 0)
+        self.assertGreater(int(metrics['db']['desc'].strip('"')), 0)
+
+    def test_cached_feed_skips_db(self):
+        """Повторный запрос анонима отдаётся из кэша без БД"""
+        url = reverse('posts:index')
+        first = parse(self.client.get(url)['Server-Timing'])
+        second = parse(self.client.get(url)['Server-Timing'])
+        self.assertIn('db', first)
+        self.assertNotIn('db', second)
+
+    @override_settings(SERVER_TIMING=False)
+    def test_disabled(self):
+        response = self.client.get(reverse('posts:index'))
+        self.assertNotIn('Server-Timing', response)
+
+    def test_nested_measure_counted_once(self):
+        """Вложенный замер той же метрики не удваивает время"""
+        with timing.collect() as timings:
+            with timing.measure('cache-get'):
+                with timing.measure('cache-get'):
+                    pass
+        self.assertEqual(timings.metrics['cache-get'][1], 1)
+
+    def test_measure_outside_request(self):
+        with timing.measure('db'):
+            pass
+        self.assertIsNone(timing.current())
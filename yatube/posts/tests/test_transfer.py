@@ -0,0 +1,132 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import follow_graph
+from posts.models import (Comment, Follow, Group, Post, TimelineEntry, User,
+                          UserCounter)
+
+TEST_USERNAME = 'HasNoName'
+TEST_TEXT = 'Тестовый текст'
+
+
+class TransferTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username=TEST_USERNAME)
+        cls.author = User.objects.create(username='author')
+        cls.group = Group.objects.create(
+            title='group', slug='group', description='group'
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, text=TEST_TEXT, group=cls.group
+        )
+        Comment.objects.create(
+            post=cls.post, author=cls.user, text='Комментарий'
+        )
+        Follow.objects.create(user=cls.user, author=cls.author)
+        cls.temp_dir = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        cls.path = os.path.join(cls.temp_dir, 'dump.jsonl')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(cls.temp_dir, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def export(self):
+        call_command('export_jsonl', self.path, stderr=StringIO())
+        with open(self.path, encoding='utf-8') as dump:
+            return dump.readlines()
+
+    def test_export(self):
+        """Выгрузка пишет по строке на запись, зависимости первыми"""
+        lines = self.export()
+        self.assertEqual(len(lines), 4)
+        self.assertIn('"posts.group"', lines[0])
+        self.assertIn('"author": "author"', lines[1])
+
+    def test_import_restores_data(self):
+        """Загрузка восстанавливает данные в пустой базе"""
+        self.export()
+        Post.objects.all().delete()
+        Group.objects.all().delete()
+        Follow.objects.all().delete()
+        User.objects.filter(username='author').delete()
+        call_command('import_jsonl', self.path, stdout=StringIO())
+        post = Post.objects.get()
+        self.assertEqual(post.text, TEST_TEXT)
+        self.assertEqual(post.created, self.post.created)
+        self.assertEqual(post.group.slug, 'group')
+        self.assertEqual(post.author.username, 'author')
+        self.assertFalse(post.author.has_usable_password())
+        self.assertEqual(post.comments.get().author, self.user)
+        self.assertTrue(
+            Follow.objects.filter(user=self.user, author=post.author).exists()
+        )
+        self.assertEqual(
+            UserCounter.objects.get(user=post.author).followers_count, 1
+        )
+        self.assertEqual(post.author.posts.count(), 1)
+
+    def test_import_remaps_ids(self):
+        """Повторная загрузка добавляет копии со ссылками на них"""
+        self.export()
+        call_command('import_jsonl', self.path, stdout=StringIO())
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertEqual(Group.objects.count(), 1)
+        self.assertEqual(Follow.objects.count(), 1)
+        copy = Post.objects.exclude(pk=self.post.pk).get()
+        self.assertEqual(copy.comments.count(), 1)
+        self.assertEqual(Group.objects.get().posts_count, 2)
+
+    def test_import_reaches_followers_timeline(self):
+        """Загруженные посты попадают в ленты бывших подписчиков"""
+        self.export()
+        call_command('import_jsonl', self.path, stdout=StringIO())
+        copy = Post.objects.exclude(pk=self.post.pk).get()
+        self.assertTrue(
+            TimelineEntry.objects.filter(user=self.user, post=copy).exists()
+        )
+        client = Client()
+        client.force_login(self.user)
+        response = client.get(reverse('posts:follow_index'))
+        self.assertIn(copy, response.context['page_obj'])
+
+    def test_import_purges_cached_pages(self):
+        """Загрузка сбрасывает кэш страниц лент для анонимов"""
+        self.export()
+        guest = Client()
+        pages = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': 'group'}),
+            reverse('posts:profile', kwargs={'username': 'author'}),
+        )
+        for url in pages:
+            guest.get(url)
+        call_command('import_jsonl', self.path, stdout=StringIO())
+        for url in pages:
+            with self.subTest(url=url):
+                response = guest.get(url)
+                self.assertEqual(len(response.context['page_obj']), 2)
+
+    def test_command_resets_followees_for_web_processes(self):
+        """Сброс подписок из процесса команды виден веб-процессам"""
+        follow_graph.followees(self.user.pk)
+        command = multiprocessing.get_context('fork').Process(
+            target=follow_graph.forget, args=(self.user.pk,)
+        )
+        command.start()
+        command.join()
+        self.assertIsNone(cache.get(follow_graph._key(self.user.pk)))
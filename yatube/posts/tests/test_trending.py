@@ -0,0 +1,140 @@
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from posts import trending
+from posts.models import (Comment, Group, Post, TrendingEpoch, TrendingScore,
+                          User)
+
+HALF_LIFE = 60 * 60
+
+
+@override_settings(
+    TRENDING_HALF_LIFE=HALF_LIFE,
+    TRENDING_POST_WEIGHT=1,
+    TRENDING_COMMENT_WEIGHT=2,
+    TRENDING_SHOW=5,
+)
+class TrendingTest(TransactionTestCase):
+    """Оценки правятся после коммита, поэтому коммиты настоящие"""
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create(username='author')
+        self.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        self.quiet = Group.objects.create(
+            title='Тихая', slug='quiet', description='Описание'
+        )
+        self.first = Post.objects.create(
+            text='Первый пост', author=self.author, group=self.quiet
+        )
+        self.second = Post.objects.create(
+            text='Обсуждаемый пост', author=self.author, group=self.group
+        )
+
+    def comment(self, post):
+        Comment.objects.create(post=post, author=self.author, text='Да')
+
+    def test_comments_raise_post_and_group(self):
+        self.comment(self.second)
+        self.assertEqual(
+            trending.trending_posts(5), [self.second, self.first]
+        )
+        self.assertEqual(
+            trending.trending_groups(5), [self.group, self.quiet]
+        )
+
+    def test_newer_events_weigh_more(self):
+        epoch = trending.get_epoch()
+        with patch('posts.trending.time.time', return_value=epoch):
+            self.assertEqual(trending.weight(1), 1)
+        with patch(
+            'posts.trending.time.time', return_value=epoch + HALF_LIFE
+        ):
+            self.assertEqual(trending.weight(1), 2)
+
+    def test_epoch_read_from_database(self):
+        """Эпоху переносит команда в своём процессе: вес её видит сразу"""
+        trending.get_epoch()
+        started = TrendingEpoch.objects.get().started - timedelta(hours=1)
+        TrendingEpoch.objects.update(started=started)
+        self.assertEqual(trending.get_epoch(), started.timestamp())
+
+    @override_settings(TRENDING_TOP_TIMEOUT=60)
+    def test_top_list_expires(self):
+        """Разошедшийся с базой список лучших живёт ограниченное время"""
+        self.assertEqual(trending.trending_posts(1), [self.second])
+        TrendingScore.objects.filter(
+            kind=TrendingScore.POST, object_id=self.first.pk
+        ).update(score=100)
+        version = trending.version()
+        self.assertEqual(trending.trending_posts(1), [self.second])
+        with patch('time.time', return_value=time.time() + 61):
+            self.assertEqual(trending.trending_posts(1), [self.first])
+            self.assertNotEqual(trending.version(), version)
+
+    def test_compact_rebases_and_drops_faded(self):
+        self.comment(self.second)
+        epoch = TrendingEpoch.objects.get()
+        epoch.started -= timedelta(seconds=HALF_LIFE * 10)
+        epoch.save()
+        TrendingScore.objects.filter(
+            kind=TrendingScore.POST, object_id=self.second.pk
+        ).update(score=2 ** 10)
+        call_command('compact_trending', stdout=StringIO())
+        score = TrendingScore.objects.get(
+            kind=TrendingScore.POST, object_id=self.second.pk
+        ).score
+        self.assertAlmostEqual(score, 1, places=2)
+        # Первый пост получил оценку 1 в начале эпохи: за десять
+        # полупериодов она угасла
+        self.assertFalse(
+            TrendingScore.objects.filter(
+                kind=TrendingScore.POST, object_id=self.first.pk
+            ).exists()
+        )
+        self.assertEqual(trending.trending_posts(5), [self.second])
+
+    def test_deleted_post_leaves_ranking(self):
+        self.comment(self.second)
+        self.second.delete()
+        self.assertEqual(trending.trending_posts(5), [self.first])
+
+    def test_sidebar_and_page(self):
+        self.comment(self.second)
+        client = Client()
+        response = client.get(reverse('posts:index'))
+        self.assertContains(response, reverse('posts:trending'))
+        self.assertEqual(
+            response.context['trending_version'], trending.version()
+        )
+        response = client.get(reverse('posts:trending'))
+        self.assertEqual(
+            list(response.context['posts']), [self.second, self.first]
+        )
+        self.assertContains(response, 'Тихая')
+
+    def test_stale_epoch_does_not_break_writes(self):
+        """Давно не сжатая эпоха не ломает публикацию комментария"""
+        epoch = trending.get_epoch()
+        later = epoch + HALF_LIFE * 2000
+        with patch('posts.trending.time.time', return_value=later):
+            self.assertEqual(
+                trending.weight(1), 2.0 ** trending.MAX_EXPONENT
+            )
+            self.comment(self.first)
+        self.assertEqual(trending.trending_posts(5)[0], self.first)
+
+    def test_recorder_errors_logged(self):
+        with patch('posts.trending._add', side_effect=OverflowError):
+            with self.assertLogs('posts.trending', 'ERROR'):
+                self.comment(self.second)
+        self.assertEqual(self.second.comments.count(), 1)
@@ -1,17 +1,29 @@
 import shutil
 import tempfile
+from io import StringIO
 from http import HTTPStatus
+from unittest.mock import patch
 
 from django import forms
 from django.conf import settings
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase, override_settings
+from django.core.management import call_command
+from django.db import connection, connections
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from posts.models import Comment, Follow, Group, Post, User
+from core.middleware.query_budget import (QueryBudgetExceeded,
+                                          QueryBudgetMiddleware, query_budget)
+from core.testing import QueryBudgetMixin
+from posts import thumbnails, views
+from posts.models import (Comment, Follow, Group, Post, TimelineEntry,
+                          User)
 
 COUNT_POST = settings.COUNT_POST
+COUNT_COMMENT = settings.COUNT_COMMENT
 
 TEST_USERNAME = 'HasNoName'
 TEST_TITLE = 'test title'
@@ -208,6 +220,35 @@ class PostsPagesTests(TestCase):
         else:
             self.assertFalse(self.post == post)
 
+    def test_thumbnail_built_in_background(self):
+        """Пока миниатюры нет, показывается исходная картинка"""
+        cache.clear()
+        response = self.guest_client.get(self.POST_DETAIL)
+        self.assertContains(response, f'src="{self.post.image.url}"')
+        call_command('build_thumbnails', workers=1, stdout=StringIO())
+        thumbnail = thumbnails.feed_thumbnail(self.post.image)
+        self.assertIsNotNone(thumbnail)
+        response = self.guest_client.get(self.POST_DETAIL)
+        self.assertContains(response, f'src="{thumbnail.url}"')
+        self.assertNotContains(response, f'src="{self.post.image.url}"')
+
+    def test_thumbnail_failures_counted(self):
+        """Команда сообщает, сколько миниатюр не удалось построить"""
+        for workers in (1, 2):
+            with self.subTest(workers=workers):
+                cache.clear()
+                out = StringIO()
+                with patch(
+                    'posts.thumbnails.get_thumbnail', side_effect=OSError
+                ), patch('posts.thumbnails.connections'):
+                    with self.assertLogs('posts.thumbnails', 'ERROR'):
+                        call_command(
+                            'build_thumbnails', workers=workers, stdout=out
+                        )
+                self.assertIn(
+                    'построено: 0, не построено: 1', out.getvalue()
+                )
+
 
 class PostsPaginatorTest(TestCase):
     @classmethod
@@ -235,6 +276,7 @@ class PostsPaginatorTest(TestCase):
             cls.posts.append(cls.post)
 
     def setUp(self):
+        cache.clear()
         self.guest_client = Client()
         self.user = User.objects.get(username=TEST_USERNAME)
         self.authorized_client = Client()
@@ -282,6 +324,82 @@ class PostsPaginatorTest(TestCase):
             with self.subTest(count_page=count_page):
                 self.assertEqual(count_page, 3)
 
+    def test_cursor_pages(self):
+        """Курсорные ссылки ведут на старшие и обратно на новые записи"""
+        first_page = self.client.get(MAIN).context['page_obj']
+        self.assertTrue(first_page.has_next())
+        self.assertFalse(first_page.has_previous())
+        older = self.client.get(
+            MAIN, {'after': first_page.next_cursor()}
+        ).context['page_obj']
+        self.assertEqual(len(older), 3)
+        self.assertFalse(older.has_next())
+        self.assertTrue(older.has_previous())
+        self.assertFalse(set(first_page) & set(older))
+        newer = self.client.get(
+            MAIN, {'before': older.previous_cursor()}
+        ).context['page_obj']
+        self.assertEqual(list(newer), list(first_page))
+
+    def test_cursor_page_without_count(self):
+        """Курсорная страница не делает COUNT(*)"""
+        page_obj = self.client.get(MAIN).context['page_obj']
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(MAIN, {'after': page_obj.next_cursor()})
+        for query in queries.captured_queries:
+            self.assertNotIn('COUNT(', query['sql'])
+
+
+class CommentsPaginatorTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username=TEST_USERNAME)
+        cls.post = Post.objects.create(text=TEST_TEXT, author=cls.user)
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=cls.user, text=f'Комментарий {i}')
+            for i in range(COUNT_COMMENT + 5)
+        )
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def test_post_detail_shows_first_page(self):
+        """На странице поста только первая страница комментариев"""
+        response = self.guest_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        )
+        comments = response.context['comments']
+        self.assertEqual(len(comments.object_list), COUNT_COMMENT)
+        self.assertTrue(comments.has_next())
+        self.assertContains(response, 'js-more-comments')
+
+    def test_next_comments_fragment(self):
+        """Следующие комментарии отдаются фрагментом и в JSON"""
+        url = reverse('posts:post_comments', kwargs={'post_id': self.post.id})
+        first = self.guest_client.get(url).context['comments']
+        response = self.guest_client.get(
+            url, {'after': first.next_cursor()}
+        )
+        self.assertTemplateUsed(response, 'posts/includes/comments.html')
+        rest = response.context['comments'].object_list
+        self.assertEqual(len(rest), 5)
+        self.assertFalse(set(first.object_list) & set(rest))
+        self.assertNotContains(response, 'js-more-comments')
+        data = self.guest_client.get(
+            url, {'after': first.next_cursor(), 'format': 'json'}
+        ).json()
+        self.assertEqual(len(data['comments']), 5)
+        self.assertEqual(data['comments'][0]['author'], TEST_USERNAME)
+        self.assertEqual(data['next_cursor'], '')
+
+    def test_comments_of_missing_post(self):
+        """Комментарии несуществующего поста - 404"""
+        response = self.guest_client.get(
+            reverse('posts:post_comments', kwargs={'post_id': 0})
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
 
 class CacheTest(TestCase):
     @classmethod
@@ -299,11 +417,238 @@ class CacheTest(TestCase):
         self.post = Post.objects.get(author=self.user)
 
     def test_cache_index_page(self):
+        """Лента отдаётся из кэша, пока посты не менялись"""
+        self.guest_client.get(MAIN)
+        # update() не вызывает сигналы, поэтому кэш не сбрасывается
+        Post.objects.filter(pk=self.post.pk).update(text='Изменённый')
         response = self.guest_client.get(MAIN)
-        Post.objects.all().delete()
-        self.assertContains(response, self.post)
+        self.assertContains(response, TEST_TEXT)
+        cache.clear()
+        response = self.guest_client.get(MAIN)
+        self.assertContains(response, 'Изменённый')
+
+    def test_cache_invalidated_on_write(self):
+        """Создание и удаление поста сразу видны в ленте"""
+        self.guest_client.get(MAIN)
+        new_post = Post.objects.create(text='Новый пост', author=self.user)
+        response = self.guest_client.get(MAIN)
+        self.assertContains(response, 'Новый пост')
+        new_post.delete()
+        response = self.guest_client.get(MAIN)
+        self.assertNotContains(response, 'Новый пост')
+
+    def test_cache_varies_by_page(self):
+        """Страницы ленты кэшируются отдельно"""
+        for number in range(COUNT_POST):
+            Post.objects.create(text=f'Пост {number}', author=self.user)
+        first_page = self.guest_client.get(MAIN)
+        second_page = self.guest_client.get(
+            MAIN, {'after': first_page.context['page_obj'].next_cursor()}
+        )
+        self.assertContains(first_page, f'Пост {COUNT_POST - 1}')
+        self.assertNotContains(second_page, f'Пост {COUNT_POST - 1}')
+        self.assertContains(second_page, TEST_TEXT)
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username=TEST_USERNAME)
+        cls.group = Group.objects.create(
+            title=TEST_TITLE,
+            slug=TEST_SLUG,
+            description=TEST_DESCRIPTION,
+        )
+        cls.post = Post.objects.create(
+            text=TEST_TEXT,
+            author=cls.user,
+            group=cls.group,
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def revalidate(self, url, response):
+        return self.authorized_client.get(
+            url, HTTP_IF_NONE_MATCH=response['ETag']
+        )
+
+    def test_not_modified_skips_page(self):
+        """Совпавший ETag получает 304 без запроса постов и рендера"""
+        urls = (
+            MAIN,
+            GROUP_LIST,
+            PROFILE,
+            f'/posts/{self.post.id}/',
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.authorized_client.get(url)
+                with CaptureQueriesContext(connection) as queries:
+                    again = self.revalidate(url, response)
+                self.assertEqual(again.status_code, HTTPStatus.NOT_MODIFIED)
+                self.assertEqual(again.templates, [])
+                self.assertFalse(any(
+                    'ORDER BY "posts_post"."created" DESC' in query['sql']
+                    for query in queries.captured_queries
+                ))
+
+    def test_feed_last_modified(self):
+        """Ленты отдают Last-Modified и отвечают 304 на него"""
+        response = self.authorized_client.get(MAIN)
+        again = self.authorized_client.get(
+            MAIN, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+        )
+        self.assertEqual(again.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_new_post_changes_feeds(self):
+        urls = (MAIN, GROUP_LIST, PROFILE)
+        responses = {url: self.authorized_client.get(url) for url in urls}
+        Post.objects.create(text='Новый пост', author=self.user,
+                            group=self.group)
+        for url in urls:
+            with self.subTest(url=url):
+                again = self.revalidate(url, responses[url])
+                self.assertContains(again, 'Новый пост')
+
+    def test_edit_and_comment_change_post(self):
+        """Правка поста и новый комментарий меняют ETag поста"""
+        url = f'/posts/{self.post.id}/'
+        response = self.authorized_client.get(url)
+        self.authorized_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': self.post.id}),
+            data={'text': 'Изменённый текст'},
+        )
+        edited = self.revalidate(url, response)
+        self.assertContains(edited, 'Изменённый текст')
+        Comment.objects.create(
+            post=self.post, author=self.user, text='Комментарий'
+        )
+        self.assertContains(self.revalidate(url, edited), 'Комментарий')
+
+    def test_etag_depends_on_user(self):
+        response = self.authorized_client.get(MAIN)
+        self.assertEqual(
+            Client().get(
+                MAIN, HTTP_IF_NONE_MATCH=response['ETag']
+            ).status_code,
+            HTTPStatus.OK,
+        )
+
+    def test_etag_depends_on_csrf_token(self):
+        """Форма комментария из чужой сессии не отдаётся по 304"""
+        url = f'/posts/{self.post.id}/'
+        response = self.authorized_client.get(url)
+        other = Client()
+        other.force_login(self.user)
+        other.cookies['csrftoken'] = 'a' * 64
+        self.assertEqual(
+            other.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code,
+            HTTPStatus.OK,
+        )
+
+    def test_follow_changes_profile(self):
+        author = User.objects.create(username='User_2')
+        url = f'/profile/{author.username}/'
+        response = self.authorized_client.get(url)
+        Follow.objects.create(user=self.user, author=author)
+        self.assertEqual(
+            self.revalidate(url, response).status_code, HTTPStatus.OK
+        )
+
+
+class PageCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username=TEST_USERNAME)
+        cls.group = Group.objects.create(
+            title=TEST_TITLE,
+            slug=TEST_SLUG,
+            description=TEST_DESCRIPTION,
+        )
+        cls.other_group = Group.objects.create(
+            title='other', slug='other', description=TEST_DESCRIPTION,
+        )
+        cls.post = Post.objects.create(
+            text=TEST_TEXT,
+            author=cls.user,
+            group=cls.group,
+        )
+        cls.other_post = Post.objects.create(
+            text=TEST_TEXT,
+            author=User.objects.create(username='User_2'),
+            group=cls.other_group,
+        )
+
+    def setUp(self):
         cache.clear()
-        self.assertNotIn(self.post, response.context['page_obj'])
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        self.post_detail = f'/posts/{self.post.id}/'
+        self.pages = (MAIN, GROUP_LIST, PROFILE, self.post_detail)
+        self.other_pages = ('/group/other/', '/profile/User_2/')
+        for url in (*self.pages, *self.other_pages):
+            self.guest_client.get(url)
+
+    def test_anonymous_served_from_cache(self):
+        """Аноним получает сохранённую страницу без рендера и ленты"""
+        # Запрос остаётся только у валидаторов условного GET
+        queries = {MAIN: 0, GROUP_LIST: 1, PROFILE: 1, self.post_detail: 1}
+        for url, number in queries.items():
+            with self.subTest(url=url):
+                with self.assertNumQueries(number):
+                    response = self.guest_client.get(url)
+                self.assertEqual(response.templates, [])
+                self.assertContains(response, TEST_TEXT)
+
+    def test_only_page_params_in_key(self):
+        """Посторонние параметры не плодят копии страницы"""
+        response = self.guest_client.get(MAIN, {'utm_source': 'mail'})
+        self.assertEqual(response.templates, [])
+        response = self.guest_client.get(MAIN, {'page': 2})
+        self.assertNotEqual(response.templates, [])
+
+    def test_authorized_bypass(self):
+        for url in self.pages:
+            with self.subTest(url=url):
+                response = self.authorized_client.get(url)
+                self.assertNotEqual(response.templates, [])
+
+    def test_post_purges_dependent_pages(self):
+        """Пост сбрасывает свои ленты, профиль и страницу поста"""
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Изменённый'
+        post.save()
+        for url in self.pages:
+            with self.subTest(url=url):
+                self.assertContains(self.guest_client.get(url), 'Изменённый')
+        for url in self.other_pages:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertEqual(response.templates, [])
+
+    def test_comment_purges_post_page(self):
+        Comment.objects.create(
+            post=self.post, author=self.user, text='Комментарий'
+        )
+        self.assertContains(
+            self.guest_client.get(self.post_detail), 'Комментарий'
+        )
+        self.assertEqual(self.guest_client.get(MAIN).templates, [])
+
+    def test_follow_purges_profiles(self):
+        Follow.objects.create(
+            user=self.user, author=User.objects.get(username='User_2')
+        )
+        self.assertContains(self.guest_client.get(PROFILE), 'подписок: 1')
+        self.assertContains(
+            self.guest_client.get('/profile/User_2/'), 'Подписчиков: 1'
+        )
 
 
 class FollowTest(TestCase):
@@ -361,3 +706,156 @@ class FollowTest(TestCase):
         response_follow = self.authorized_client.get(FOLLOW_INDEX)
         text_in_page = response_follow.context['page_obj'][0].text
         self.assertEqual(text_in_page, self.post.text)
+
+    def test_new_post_fanned_out(self):
+        """Новый пост автора раскладывается в ленту подписчика"""
+        post = Post.objects.create(text='Новый пост', author=self.user_2)
+        self.assertTrue(
+            TimelineEntry.objects.filter(user=self.user, post=post).exists()
+        )
+
+    def test_unfollow_purges_timeline(self):
+        """После отписки посты автора пропадают из ленты"""
+        self.authorized_client.get(
+            reverse(
+                'posts:profile_unfollow',
+                kwargs={'username': 'User_2'}
+            )
+        )
+        self.assertFalse(TimelineEntry.objects.filter(user=self.user))
+        response = self.authorized_client.get(FOLLOW_INDEX)
+        self.assertEqual(len(response.context['page_obj']), 0)
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_popular_author_pulled(self):
+        """Посты популярного автора подмешиваются в ленту при чтении"""
+        post = Post.objects.create(text='Популярный пост', author=self.user_2)
+        self.assertFalse(TimelineEntry.objects.filter(post=post).exists())
+        response = self.authorized_client.get(FOLLOW_INDEX)
+        self.assertIn(post, response.context['page_obj'])
+
+    def test_pulled_and_fanned_out_pages_merged(self):
+        """Страницы ленты сливают разложенные и подмешанные посты"""
+        Follow.objects.create(user=self.user, author=self.user_3)
+        with override_settings(TIMELINE_FANOUT_LIMIT=0):
+            for number in range(COUNT_POST):
+                Post.objects.create(text=f'Пост {number}', author=self.user_3)
+                Post.objects.create(text=f'Пост {number}', author=self.user_2)
+            expected = list(Post.objects.filter(
+                author__in=(self.user_2, self.user_3)
+            ).order_by('-created', '-id'))
+            seen = []
+            url = FOLLOW_INDEX
+            while url:
+                page = self.authorized_client.get(url).context['page_obj']
+                seen.extend(page)
+                cursor = page.next_cursor()
+                url = cursor and f'{FOLLOW_INDEX}?after={cursor}'
+            self.assertEqual(seen, expected)
+            previous = self.authorized_client.get(
+                f'{FOLLOW_INDEX}?before={page.previous_cursor()}'
+            ).context['page_obj']
+            self.assertEqual(
+                list(previous), expected[-len(page) - COUNT_POST:-len(page)]
+            )
+
+    @override_settings(TIMELINE_SIZE=1)
+    def test_timeline_size_bounded(self):
+        """Лента читает и хранит только последние TIMELINE_SIZE записей"""
+        post = Post.objects.create(text='Свежий пост', author=self.user_2)
+        response = self.authorized_client.get(FOLLOW_INDEX)
+        self.assertEqual(list(response.context['page_obj']), [post])
+        self.authorized_client.get(
+            reverse(
+                'posts:profile_follow',
+                kwargs={'username': 'User_3'}
+            )
+        )
+        self.assertEqual(TimelineEntry.objects.filter(user=self.user).count(),
+                         1)
+
+
+class QueryBudgetTest(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username=TEST_USERNAME)
+        cls.group = Group.objects.create(
+            title=TEST_TITLE,
+            slug=TEST_SLUG,
+            description=TEST_DESCRIPTION,
+        )
+        for number in range(COUNT_POST):
+            author = User.objects.create(username=f'author_{number}')
+            Follow.objects.create(user=cls.user, author=author)
+            cls.post = Post.objects.create(
+                text=TEST_TEXT,
+                author=author,
+                group=cls.group,
+            )
+            Comment.objects.create(
+                post=cls.post,
+                author=author,
+                text=TEST_TEXT,
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_feeds_within_budget(self):
+        """Число запросов ленты не растёт с числом постов"""
+        pages = {
+            MAIN: 10,
+            GROUP_LIST: 7,
+            FOLLOW_INDEX: 5,
+            f'/profile/{self.post.author.username}/': 9,
+            f'/posts/{self.post.id}/': 6,
+            f'/posts/{self.post.id}/comments/': 3,
+        }
+        for url, budget in pages.items():
+            with self.subTest(url=url):
+                with self.assertMaxQueries(budget):
+                    response = self.authorized_client.get(url)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    @override_settings(QUERY_COUNT_HEADER=True)
+    def test_query_count_header(self):
+        """Число запросов к БД отдаётся заголовком для benchmark"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.authorized_client.get(MAIN)
+        self.assertEqual(response['X-Query-Count'], str(len(queries)))
+
+    def test_budget_exceeded(self):
+        """Превышение бюджета запросов view ломает тест"""
+        with patch.object(views.index, 'query_budget', 0):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.authorized_client.get(MAIN)
+
+    def test_budget_counts_replicas(self):
+        """Запросы к репликам тоже входят в бюджет"""
+        default = connections['default']
+        replica = default.__class__(
+            dict(default.settings_dict), alias='replica_1'
+        )
+        self.addCleanup(replica.close)
+
+        @query_budget(1)
+        def view(request):
+            with replica.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            return HttpResponse()
+
+        middleware = QueryBudgetMiddleware(
+            lambda request: middleware.process_view(request, view, (), {})
+            or view(request)
+        )
+        with patch(
+            'core.middleware.query_budget.connections.all',
+            return_value=[default, replica],
+        ):
+            with self.assertRaises(QueryBudgetExceeded):
+                middleware(RequestFactory().get('/'))
@@ -0,0 +1,116 @@
+import logging
+import time
+
+from django.core.cache import cache
+from django.db import connections
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile
+
+from core.db_router import primary
+from core.jobs import task
+from core.timing import measure, timed
+
+from . import feed_cache, page_cache
+from .models import Post
+
+# Миниатюра, которую показывают ленты и страница поста
+FEED_GEOMETRY = '960x339'
+FEED_OPTIONS = {'crop': 'center', 'upscale': True}
+
+logger = logging.getLogger(__name__)
+
+
+def _thumbnail_file(image, geometry, options):
+    # Имя миниатюры считается так же, как в ThumbnailBackend.get_thumbnail
+    backend = default.backend
+    source = ImageFile(image)
+    options = dict(options)
+    if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(thumbnail_settings, attr)
+        if value != getattr(default_settings, attr):
+            options.setdefault(key, value)
+    name = backend._get_thumbnail_filename(source, geometry, options)
+    return ImageFile(name, default.storage)
+
+
+@timed('thumbnail')
+def feed_thumbnail(image):
+    """Готовая миниатюра для ленты или None, если её ещё не построили."""
+    if not image:
+        return None
+    return default.kvstore.get(
+        _thumbnail_file(image, FEED_GEOMETRY, FEED_OPTIONS)
+    )
+
+
+def _version_key(post_id):
+    return f'thumbnail_version:{post_id}'
+
+
+def version(post_id):
+    """Версия миниатюры поста для его ETag: меняется после построения.
+
+    Как поколения лент, начинается с текущего времени, чтобы после
+    вытеснения ключа не совпасть с прежним значением.
+    """
+    key = _version_key(post_id)
+    value = cache.get(key)
+    if value is None:
+        cache.add(key, int(time.time() * 1000), None)
+        value = cache.get(key)
+    return value
+
+
+@task('posts.thumbnail')
+def build(post_id):
+    """Строит миниатюру поста и сбрасывает ленты с заглушкой.
+
+    Возвращает False, если строить нечего: поста или картинки уже нет.
+    """
+    # Реплика может ещё не знать о только что созданном посте
+    with primary():
+        post = Post.objects.filter(pk=post_id).first()
+    if post is None or not post.image:
+        return False
+    with measure('thumbnail'):
+        get_thumbnail(post.image, FEED_GEOMETRY, **FEED_OPTIONS)
+    # Страница и API поста сменят ETag и покажут миниатюру;
+    # updated не трогаем, сам пост не менялся
+    cache.set(_version_key(post.pk), int(time.time() * 1000), None)
+    feed_cache.bump_for_post(post)
+    page_cache.purge_for_post(post)
+    return True
+
+
+def generate(post_id):
+    """Строит миниатюру сразу, ошибку только записывает в лог.
+
+    Возвращает True, если миниатюра построена.
+    """
+    try:
+        return build(post_id)
+    except Exception:
+        logger.exception('Не удалось построить миниатюру поста %s', post_id)
+        return False
+
+
+def generate_in_worker(post_id):
+    # У каждого потока пула свои соединения с БД, закрываем их сами
+    try:
+        return generate(post_id)
+    finally:
+        connections.close_all()
+
+
+def schedule(post):
+    """Ставит построение миниатюры в очередь после коммита транзакции.
+
+    Пока задача ждёт в очереди, повторная для того же поста не ставится.
+    """
+    build.delay(post.pk, dedup_key=f'thumbnail:{post.pk}')
@@ -0,0 +1,179 @@
+from django.conf import settings
+from django.db.models import Q
+
+from core.paginator import CursorPaginator, seek
+
+from . import follow_graph
+from .counters import user_counters
+from .models import Follow, Post, TimelineEntry, UserCounter
+
+
+def is_pulled(author):
+    """Посты автора читаются напрямую, а не из лент подписчиков."""
+    followers = user_counters(author).followers_count
+    return followers > settings.TIMELINE_FANOUT_LIMIT
+
+
+def _bulk_add(entries):
+    TimelineEntry.objects.bulk_create(
+        entries,
+        batch_size=settings.TIMELINE_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def fan_out(post):
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    if is_pulled(post.author):
+        return
+    followers = Follow.objects.filter(
+        author=post.author
+    ).values_list('user_id', flat=True)
+    _bulk_add(
+        TimelineEntry(
+            user_id=user_id, post=post, author=post.author,
+            created=post.created,
+        )
+        for user_id in followers.iterator()
+    )
+
+
+def fan_out_many(author, posts):
+    """Раскладывает посты автора по лентам всех его подписчиков.
+
+    Для постов, появившихся без сигналов, например при загрузке.
+    Возвращает id подписчиков, чьи ленты пополнились.
+    """
+    if is_pulled(author):
+        return []
+    followers = list(
+        Follow.objects.filter(author=author).values_list('user_id', flat=True)
+    )
+    posts = list(posts.filter(author=author).values_list('id', 'created')[
+        :settings.TIMELINE_BACKFILL_SIZE
+    ])
+    _bulk_add(
+        TimelineEntry(
+            user_id=user_id, post_id=post_id, author=author, created=created
+        )
+        for user_id in followers
+        for post_id, created in posts
+    )
+    return followers
+
+
+def backfill(user, author):
+    """Добавляет в ленту последние посты автора после подписки."""
+    if is_pulled(author):
+        return
+    posts = Post.objects.filter(author=author).values_list('id', 'created')
+    _bulk_add(
+        TimelineEntry(
+            user=user, post_id=post_id, author=author, created=created
+        )
+        for post_id, created in posts[:settings.TIMELINE_BACKFILL_SIZE]
+    )
+    trim(user)
+
+
+def trim(user):
+    """Удаляет из ленты записи старше последних TIMELINE_SIZE."""
+    boundary = user.timeline.order_by('-created', '-post_id').values_list(
+        'created', 'post_id'
+    )[settings.TIMELINE_SIZE:settings.TIMELINE_SIZE + 1]
+    for created, post_id in boundary:
+        user.timeline.filter(
+            Q(created__lt=created) | Q(created=created, post_id__lte=post_id)
+        ).delete()
+
+
+def purge(user, author):
+    """Убирает из ленты посты автора после отписки."""
+    TimelineEntry.objects.filter(user=user, author=author).delete()
+
+
+class TimelineFeed:
+    """Посты домашней ленты за курсором, ближайшие к нему первыми.
+
+    Разложенные записи читаются из TimelineEntry по индексу
+    (user, created, post), не дальше последних TIMELINE_SIZE. Посты
+    каждого популярного автора (pull) читаются по индексу
+    (author, created, id), все авторы одним запросом. Срез [:n] берёт
+    из каждого источника не больше n строк и сливает их в Python,
+    поэтому база не сортирует все посты популярных авторов ради
+    одной страницы.
+    """
+
+    def __init__(self, user, cursor=None, newer=False, offset=0):
+        self.user = user
+        self.cursor = cursor
+        self.newer = newer
+        self.offset = offset
+
+    def _entries(self):
+        latest = self.user.timeline.order_by('-created', '-post_id').values(
+            'pk'
+        )[:settings.TIMELINE_SIZE]
+        entries = TimelineEntry.objects.filter(
+            user=self.user, pk__in=latest
+        ).select_related('post__author', 'post__group')
+        return seek(
+            entries, ('created', 'post_id'), self.cursor, self.newer
+        )
+
+    def _pulled(self, authors, limit):
+        # Срез каждого автора - подзапрос по индексу, все срезы
+        # приходят одним запросом без сортировки
+        slices = Q()
+        for author_id in authors:
+            slices |= Q(id__in=seek(
+                Post.objects.filter(author_id=author_id),
+                ('created', 'id'),
+                self.cursor,
+                self.newer,
+            ).values('id')[:limit])
+        return Post.objects.filter(slices).select_related(
+            'author', 'group'
+        ).order_by()
+
+    def _posts(self, limit):
+        followees = follow_graph.followees(self.user.pk)
+        pulled = UserCounter.objects.filter(
+            user__in=followees,
+            followers_count__gt=settings.TIMELINE_FANOUT_LIMIT,
+        ).values_list('user', flat=True) if followees else []
+        posts = {
+            entry.post.pk: entry.post for entry in self._entries()[:limit]
+        }
+        if pulled:
+            posts.update(
+                (post.pk, post) for post in self._pulled(pulled, limit)
+            )
+        return sorted(
+            posts.values(),
+            key=lambda post: (post.created, post.pk),
+            reverse=not self.newer,
+        )[:limit]
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice) or key.stop is None:
+            raise TypeError('Ленту можно только срезать до номера: [:n]')
+        start = self.offset + (key.start or 0)
+        return self._posts(self.offset + key.stop)[start:]
+
+
+class TimelinePaginator(CursorPaginator):
+    """Курсорный пагинатор домашней ленты пользователя."""
+
+    def __init__(self, user, per_page):
+        super().__init__(Post.objects.none(), per_page)
+        self.user = user
+
+    def _older(self, cursor):
+        return TimelineFeed(self.user, cursor)
+
+    def _newer(self, cursor):
+        return TimelineFeed(self.user, cursor, newer=True)
+
+    def _first(self, number):
+        return TimelineFeed(self.user, offset=(number - 1) * self.per_page)
@@ -0,0 +1,344 @@
+"""Перенос групп, постов, комментариев и подписок в формате JSONL.
+
+Каждая строка файла - одна запись вида
+{"model": "posts.post", "pk": 1, "fields": {...}}. Пользователи
+не выгружаются, в записях они указаны по username.
+
+Загрузка идёт в процессе команды, поэтому страницы, ленты и множества
+подписок она сбрасывает в общем для процессов кэше.
+"""
+import json
+import time
+from collections import Counter
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils.dateparse import parse_datetime
+
+from . import feed_cache, follow_graph, image_refs, page_cache, timeline
+from .counters import count_of
+from .models import Comment, Follow, Group, Post, UserCounter
+
+User = get_user_model()
+
+# Сколько id подставлять в один IN при пересчёте счётчиков
+CHUNK_SIZE = 500
+
+# Порядок выгрузки: каждая модель ссылается только на предыдущие
+EXPORTS = (
+    ('posts.group', Group, ('title', 'slug', 'description')),
+    ('posts.post', Post, (
+        'text', 'created', 'updated', 'author__username', 'group_id',
+        'image',
+    )),
+    ('posts.comment', Comment, (
+        'post_id', 'author__username', 'text', 'created'
+    )),
+    ('posts.follow', Follow, ('user__username', 'author__username')),
+)
+
+# Названия полей в файле
+FIELD_NAMES = {
+    'author__username': 'author',
+    'user__username': 'user',
+    'group_id': 'group',
+    'post_id': 'post',
+}
+
+
+def export_records(chunk_size):
+    """Записи всех моделей по одной, без загрузки таблиц в память."""
+    for label, model, fields in EXPORTS:
+        rows = model.objects.order_by('pk').values_list('pk', *fields)
+        for pk, *values in rows.iterator(chunk_size=chunk_size):
+            yield label, {
+                'model': label,
+                'pk': pk,
+                'fields': {
+                    FIELD_NAMES.get(field, field): value
+                    for field, value in zip(fields, values)
+                },
+            }
+
+
+def _isoformat(value):
+    # DjangoJSONEncoder округлил бы время до миллисекунд
+    return value.isoformat()
+
+
+def dump_record(record):
+    return json.dumps(record, ensure_ascii=False, default=_isoformat)
+
+
+class Progress:
+    """Число обработанных записей и скорость по каждой модели."""
+
+    def __init__(self, write):
+        self.write = write
+        self.started = time.monotonic()
+        self.counts = {}
+
+    def add(self, label, count):
+        self.counts[label] = self.counts.get(label, 0) + count
+        elapsed = time.monotonic() - self.started
+        total = sum(self.counts.values())
+        self.write(
+            f'{label}: {self.counts[label]}, '
+            f'всего {total} ({total / max(elapsed, 1e-6):.0f} в секунду)'
+        )
+
+
+class Importer:
+    """Загружает записи пачками, каждая пачка в своей транзакции.
+
+    Новые id постов и комментариев получаются сдвигом старых за
+    текущий максимум таблицы, поэтому ссылки на них пересчитываются
+    без словаря соответствий. Группы сопоставляются по slug,
+    пользователи по username, недостающие пользователи создаются.
+    """
+
+    def __init__(self, batch_size, write):
+        self.batch_size = batch_size
+        self.progress = Progress(write)
+        self.post_offset = self._max_id(Post)
+        self.comment_offset = self._max_id(Comment)
+        self.groups = {}
+        self.users = {}
+        self.authors = set()
+        self.group_ids = set()
+        self.images = Counter()
+        self.builders = {
+            'posts.group': self._groups,
+            'posts.post': self._posts,
+            'posts.comment': self._comments,
+            'posts.follow': self._follows,
+        }
+
+    @staticmethod
+    def _max_id(model):
+        return model.objects.aggregate(top=Max('id'))['top'] or 0
+
+    def run(self, lines):
+        label, batch = None, []
+        for line in lines:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if record['model'] not in self.builders:
+                raise ValueError(f'Неизвестная модель {record["model"]}')
+            if batch and (
+                record['model'] != label or len(batch) >= self.batch_size
+            ):
+                self.flush(label, batch)
+                batch = []
+            label = record['model']
+            batch.append(record)
+        if batch:
+            self.flush(label, batch)
+        self.finish()
+
+    def flush(self, label, batch):
+        with transaction.atomic():
+            self.builders[label](batch)
+        self.progress.add(label, len(batch))
+
+    @staticmethod
+    def _insert(model, fields, rows):
+        # Без создания объектов моделей: bulk_create тратит на них
+        # основное время загрузки
+        quote = connection.ops.quote_name
+        columns = ', '.join(
+            quote(model._meta.get_field(field).column) for field in fields
+        )
+        values = ', '.join(['%s'] * len(fields))
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {quote(model._meta.db_table)} ({columns}) '
+                f'VALUES ({values})',
+                rows,
+            )
+
+    @staticmethod
+    def _created(value):
+        return connection.ops.adapt_datetimefield_value(
+            parse_datetime(value)
+        )
+
+    def _user_ids(self, usernames):
+        missing = set(usernames) - set(self.users)
+        if not missing:
+            return self.users
+        found = dict(
+            User.objects.filter(
+                username__in=missing
+            ).values_list('username', 'id')
+        )
+        new = missing - set(found)
+        if new:
+            password = make_password(None)
+            User.objects.bulk_create(
+                User(username=username, password=password)
+                for username in new
+            )
+            found.update(
+                User.objects.filter(
+                    username__in=new
+                ).values_list('username', 'id')
+            )
+        self.users.update(found)
+        return self.users
+
+    def _groups(self, batch):
+        slugs = {record['fields']['slug'] for record in batch}
+        existing = dict(
+            Group.objects.filter(slug__in=slugs).values_list('slug', 'id')
+        )
+        Group.objects.bulk_create(
+            Group(**record['fields'])
+            for record in batch
+            if record['fields']['slug'] not in existing
+        )
+        existing.update(
+            Group.objects.filter(slug__in=slugs).values_list('slug', 'id')
+        )
+        for record in batch:
+            self.groups[record['pk']] = existing[record['fields']['slug']]
+
+    def _posts(self, batch):
+        users = self._user_ids(
+            record['fields']['author'] for record in batch
+        )
+        rows = []
+        for record in batch:
+            fields = record['fields']
+            author_id = users[fields['author']]
+            group_id = self.groups.get(fields['group'])
+            self.authors.add(author_id)
+            self.group_ids.add(group_id)
+            # В старых выгрузках времени изменения нет
+            updated = fields.get('updated') or fields['created']
+            if fields['image']:
+                self.images[fields['image']] += 1
+            rows.append((
+                record['pk'] + self.post_offset,
+                fields['text'],
+                self._created(fields['created']),
+                self._created(updated),
+                author_id,
+                group_id,
+                fields['image'] or '',
+                0,
+            ))
+        self._insert(Post, (
+            'id', 'text', 'created', 'updated', 'author', 'group', 'image',
+            'comments_count',
+        ), rows)
+
+    def _comments(self, batch):
+        users = self._user_ids(
+            record['fields']['author'] for record in batch
+        )
+        self._insert(Comment, (
+            'id', 'post', 'author', 'text', 'created'
+        ), (
+            (
+                record['pk'] + self.comment_offset,
+                record['fields']['post'] + self.post_offset,
+                users[record['fields']['author']],
+                record['fields']['text'],
+                self._created(record['fields']['created']),
+            )
+            for record in batch
+        ))
+
+    def _follows(self, batch):
+        users = self._user_ids(
+            username
+            for record in batch
+            for username in (
+                record['fields']['user'], record['fields']['author']
+            )
+        )
+        pairs = {
+            (users[record['fields']['user']],
+             users[record['fields']['author']])
+            for record in batch
+        }
+        existing = set(
+            Follow.objects.filter(
+                user_id__in={user_id for user_id, _ in pairs},
+                author_id__in={author_id for _, author_id in pairs},
+            ).values_list('user_id', 'author_id')
+        )
+        follows = pairs - existing
+        self._insert(Follow, ('user', 'author'), follows)
+        # Сигналы при загрузке не срабатывают: ленты заполняем сами
+        for user_id, author_id in follows:
+            timeline.backfill(User(pk=user_id), User(pk=author_id))
+            follow_graph.forget(user_id)
+
+    @staticmethod
+    def _chunks(ids):
+        ids = sorted(ids)
+        for start in range(0, len(ids), CHUNK_SIZE):
+            yield ids[start:start + CHUNK_SIZE]
+
+    def recount(self):
+        """Счётчики загруженных записей одним UPDATE на пачку."""
+        Post.objects.filter(id__gt=self.post_offset).update(
+            comments_count=count_of(Comment, 'post')
+        )
+        for ids in self._chunks(self.group_ids - {None}):
+            Group.objects.filter(id__in=ids).update(
+                posts_count=count_of(Post, 'group')
+            )
+        for ids in self._chunks(set(self.users.values())):
+            UserCounter.objects.bulk_create(
+                (UserCounter(user_id=pk) for pk in ids),
+                ignore_conflicts=True,
+            )
+            UserCounter.objects.filter(user_id__in=ids).update(
+                posts_count=count_of(Post, 'author'),
+                followers_count=count_of(Follow, 'author'),
+                following_count=count_of(Follow, 'user'),
+            )
+        for name, count in self.images.items():
+            image_refs.acquire(name, count)
+
+    def fan_out(self):
+        """Загруженные посты в ленты подписчиков, бывших и загруженных."""
+        posts = Post.objects.filter(id__gt=self.post_offset)
+        followers = set()
+        for author_id in self.authors:
+            followers.update(
+                timeline.fan_out_many(User(pk=author_id), posts)
+            )
+        for user_id in followers:
+            timeline.trim(User(pk=user_id))
+
+    def finish(self):
+        with transaction.atomic():
+            self.recount()
+            self.fan_out()
+        usernames = {pk: username for username, pk in self.users.items()}
+        page_cache.purge(
+            page_cache.INDEX,
+            *(page_cache.author_tag(usernames[pk]) for pk in self.authors),
+            *(
+                page_cache.group_tag(slug)
+                for slug in Group.objects.filter(
+                    id__in=self.group_ids - {None}
+                ).values_list('slug', flat=True)
+            ),
+        )
+        feed_cache.bump(
+            feed_cache.INDEX_FEED,
+            *(feed_cache.author_feed(pk) for pk in self.authors),
+            *(
+                feed_cache.group_feed(pk)
+                for pk in self.group_ids
+                if pk is not None
+            ),
+        )
@@ -0,0 +1,220 @@
+"""Популярные посты и группы с затуханием по времени.
+
+Новый пост и комментарий прибавляют оценку посту и его группе одним
+UPDATE, без подсчёта по таблицам постов и комментариев. Затухание
+заложено в вес события (см. TrendingScore), поэтому прибавленное
+не надо пересчитывать, а порядок оценок не меняется со временем.
+
+Лучшие TRENDING_SIZE записей каждого типа лежат в кэше списком по
+убыванию оценки: запись правит его после коммита, блок на главной
+читает первые элементы. Список обновляется чтением и записью без
+блокировки, при гонке он поправится со следующим событием, после
+compact_trending или при перечитывании из базы раз в
+TRENDING_TOP_TIMEOUT секунд.
+"""
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import page_cache
+from .models import Group, Post, TrendingEpoch, TrendingScore
+
+VERSION_KEY = 'trending_version'
+
+# Наибольший показатель степени в весе события. 2 ** 1024 уже не
+# помещается во float; до такой границы эпоха доживает, только если
+# compact_trending давно не запускался
+MAX_EXPONENT = 256
+
+logger = logging.getLogger(__name__)
+
+
+def _top_key(kind):
+    return f'trending_top:{kind}'
+
+
+def _epoch_row():
+    epoch, created = TrendingEpoch.objects.get_or_create(
+        pk=1, defaults={'started': timezone.now()}
+    )
+    return epoch
+
+
+def get_epoch():
+    """Начало эпохи оценок, секунды Unix.
+
+    Читается из базы в транзакции события: compact_trending переносит
+    эпоху вместе с пересчётом оценок, и вес по прежней эпохе лёг бы
+    на уже пересчитанные оценки.
+    """
+    return _epoch_row().started.timestamp()
+
+
+def weight(amount):
+    """Вклад события сейчас в единицах текущей эпохи.
+
+    Вес ограничен сверху: без compact_trending новые события перестают
+    перевешивать старые, но запись не падает.
+    """
+    exponent = (time.time() - get_epoch()) / settings.TRENDING_HALF_LIFE
+    if exponent > MAX_EXPONENT:
+        logger.warning(
+            'Эпоха популярного старше %s полупериодов, '
+            'запустите compact_trending', MAX_EXPONENT
+        )
+        exponent = MAX_EXPONENT
+    return amount * 2.0 ** exponent
+
+
+def version():
+    """Меняется, когда меняются первые TRENDING_SHOW мест."""
+    current = cache.get(VERSION_KEY)
+    if current is None:
+        cache.add(VERSION_KEY, int(time.time() * 1000), None)
+        current = cache.get(VERSION_KEY)
+    return current
+
+
+def _changed():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, int(time.time() * 1000), None)
+    page_cache.purge(page_cache.INDEX)
+
+
+def _load_top(kind):
+    return list(
+        TrendingScore.objects.filter(kind=kind).order_by(
+            '-score'
+        ).values_list('score', 'object_id')[:settings.TRENDING_SIZE]
+    )
+
+
+def _entry(kind):
+    """Время загрузки и список лучших; старый список перечитывается."""
+    entry = cache.get(_top_key(kind))
+    if (
+        entry is not None
+        and time.time() - entry[0] < settings.TRENDING_TOP_TIMEOUT
+    ):
+        return entry
+    fresh = (time.time(), _load_top(kind))
+    cache.set(_top_key(kind), fresh, None)
+    if entry is not None and _shown(entry[1]) != _shown(fresh[1]):
+        # Список разошёлся с базой: блок на главной собирается заново
+        _changed()
+    return fresh
+
+
+def _top(kind):
+    return _entry(kind)[1]
+
+
+def _shown(top):
+    return [object_id for score, object_id in top[:settings.TRENDING_SHOW]]
+
+
+def _offer(kind, object_id, score):
+    # Место в списке лучших для новой оценки: старая запись
+    # объекта убирается, хвост за TRENDING_SIZE отбрасывается
+    loaded, top = _entry(kind)
+    updated = [entry for entry in top if entry[1] != object_id]
+    if score is not None:
+        updated.append((score, object_id))
+        updated.sort(reverse=True)
+        del updated[settings.TRENDING_SIZE:]
+    # Время загрузки прежнее: правки не продлевают жизнь списка
+    cache.set(_top_key(kind), (loaded, updated), None)
+    if _shown(updated) != _shown(top):
+        _changed()
+
+
+def _add(kind, object_id, amount):
+    scores = TrendingScore.objects.filter(kind=kind, object_id=object_id)
+    if not scores.update(score=F('score') + amount):
+        score, created = TrendingScore.objects.get_or_create(
+            kind=kind, object_id=object_id, defaults={'score': amount}
+        )
+        if not created:
+            scores.update(score=F('score') + amount)
+    score = scores.values_list('score', flat=True).first()
+    transaction.on_commit(lambda: _safe_offer(kind, object_id, score))
+
+
+def _safe_offer(kind, object_id, score):
+    # После коммита исключение уже не откатит запись, а ответ сломает;
+    # список лучших поправит следующее событие или compact_trending
+    try:
+        _offer(kind, object_id, score)
+    except Exception:
+        logger.exception('Не удалось обновить список популярного')
+
+
+def record(post, amount):
+    """Событие вокруг поста: прибавляет оценку посту и его группе.
+
+    Ошибка здесь только пишется в лог: из-за популярного не должны
+    ломаться публикация поста и комментария.
+    """
+    try:
+        # Точка сохранения: сбой UPDATE не испортит транзакцию запроса
+        with transaction.atomic():
+            amount = weight(amount)
+            _add(TrendingScore.POST, post.pk, amount)
+            if post.group_id is not None:
+                _add(TrendingScore.GROUP, post.group_id, amount)
+    except Exception:
+        logger.exception('Не удалось учесть в популярном пост %s', post.pk)
+
+
+def forget(kind, object_id):
+    """Убирает удалённый объект из оценок и списка лучших."""
+    TrendingScore.objects.filter(kind=kind, object_id=object_id).delete()
+    transaction.on_commit(lambda: _offer(kind, object_id, None))
+
+
+def compact():
+    """Переносит начало эпохи на сейчас и удаляет угасшие оценки.
+
+    Возвращает число удалённых оценок.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        epoch = TrendingEpoch.objects.select_for_update().filter(
+            pk=_epoch_row().pk
+        ).get()
+        age = (now - epoch.started).total_seconds()
+        factor = 2 ** (-age / settings.TRENDING_HALF_LIFE)
+        TrendingScore.objects.update(score=F('score') * factor)
+        removed, _ = TrendingScore.objects.filter(
+            score__lt=settings.TRENDING_MIN_SCORE
+        ).delete()
+        epoch.started = now
+        epoch.save(update_fields=('started',))
+    # Списки лучших хранят оценки в единицах прежней эпохи
+    cache.delete_many([_top_key(kind) for kind, name in TrendingScore.KINDS])
+    _changed()
+    return removed
+
+
+def _ids(kind, count):
+    return [object_id for score, object_id in _top(kind)[:count]]
+
+
+def trending_posts(count):
+    """Популярные посты по убыванию оценки."""
+    ids = _ids(TrendingScore.POST, count)
+    posts = Post.objects.select_related('author', 'group').in_bulk(ids)
+    return [posts[pk] for pk in ids if pk in posts]
+
+
+def trending_groups(count):
+    ids = _ids(TrendingScore.GROUP, count)
+    groups = Group.objects.in_bulk(ids)
+    return [groups[pk] for pk in ids if pk in groups]
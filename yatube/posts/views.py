@@ -1,26 +1,55 @@
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.db import transaction
+from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
 
+from core.middleware.query_budget import query_budget
+from core.ratelimit import rate_limit
+from core.paginator import CursorPaginator
+
+from . import (feed_cache, follow_graph, page_cache, recommendations,
+               trending)
+from .conditional import (conditional, group_validators, index_validators,
+                          post_validators, profile_validators)
+from .counters import user_counters
 from .forms import CommentForm, PostForm
 from .models import Comment, Follow, Group, Post
+from .page_cache import anonymous_page_cache
+from .search import search_posts
+from .timeline import TimelinePaginator
 
 COUNT_POST = settings.COUNT_POST
+COUNT_COMMENT = settings.COUNT_COMMENT
+FEED_CACHE_TIMEOUT = settings.FEED_CACHE_TIMEOUT
 
 
 User = get_user_model()
 
 
+def get_page_obj(request, post_list):
+    """Страница ленты по курсору из параметров запроса."""
+    paginator = CursorPaginator(post_list, COUNT_POST)
+    return paginator.get_cursor_page(request.GET)
+
+
+def get_comments_page(request, post_id):
+    """Страница комментариев поста, новые первыми."""
+    comment_list = Comment.objects.filter(
+        post_id=post_id
+    ).select_related('author')
+    paginator = CursorPaginator(comment_list, COUNT_COMMENT)
+    return paginator.get_cursor_page(request.GET, lazy=False)
+
+
+@query_budget(10)
+@conditional(index_validators)
+@anonymous_page_cache(page_cache.INDEX)
 def index(request):
-    post_list = Post.objects.all()
-    # Показывать по 10 записей на странице
-    paginator = Paginator(post_list, COUNT_POST)
-    # Из URL извлекаем номер запрошенной страницы - это значение параметра page
-    page_number = request.GET.get('page')
-    # Получаем набор записей для страницы с запрошенным номером
-    page_obj = paginator.get_page(page_number)
+    post_list = Post.objects.select_related('author', 'group')
+    # Показывать по 10 записей на странице, курсор берём из URL
+    page_obj = get_page_obj(request, post_list)
     template = 'posts/index.html'
     title = 'Последние обновления на сайте'
     heading = 'Последние обновления на сайте'
@@ -28,18 +57,35 @@ def index(request):
         'heading': heading,
         'title': title,
         'page_obj': page_obj,
+        'feed_key': feed_cache.fragment_key(request, feed_cache.INDEX_FEED),
+        'feed_cache_timeout': FEED_CACHE_TIMEOUT,
+        'trending_version': trending.version(),
+        'recommendations_key': recommendations.fragment_key(request.user),
     }
     return render(request, template, context)
 
 
+@query_budget(4)
+def trending_list(request):
+    template = 'posts/trending.html'
+    context = {
+        'title': 'Популярное',
+        'heading': 'Популярное',
+        'posts': trending.trending_posts(settings.TRENDING_SIZE),
+        'groups': trending.trending_groups(settings.TRENDING_SIZE),
+    }
+    return render(request, template, context)
+
+
+@query_budget(7)
+@conditional(group_validators)
+@anonymous_page_cache(page_cache.group_tag('{slug}'))
 def group_posts(request, slug):
     template = 'posts/group_list.html'
     group = get_object_or_404(Group, slug=slug)
     # Подключен Paginator
-    post_list = group.posts.all()
-    paginator = Paginator(post_list, COUNT_POST)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    post_list = group.posts.select_related('author', 'group')
+    page_obj = get_page_obj(request, post_list)
     heading = group.title
 
     context = {
@@ -47,46 +93,69 @@ def group_posts(request, slug):
         'group': group,
         'page_obj': page_obj,
         'heading': heading,
+        'feed_key': feed_cache.fragment_key(
+            request, feed_cache.group_feed(group.id)
+        ),
+        'feed_cache_timeout': FEED_CACHE_TIMEOUT,
     }
     return render(request, template, context)
 
 
+@query_budget(9)
+@conditional(profile_validators)
+@anonymous_page_cache(page_cache.author_tag('{username}'))
 def profile(request, username):
     template = 'posts/profile.html'
-    author = get_object_or_404(User, username=username)
+    author = get_object_or_404(
+        User.objects.select_related('counters'),
+        username=username
+    )
     # Подключен Paginator
-    post_list = Post.objects.filter(author=author)
-    paginator = Paginator(post_list, COUNT_POST)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    following = request.user.is_authenticated and author.following.exists()
+    post_list = Post.objects.filter(
+        author=author
+    ).select_related('author', 'group')
+    page_obj = get_page_obj(request, post_list)
+    following = request.user.is_authenticated and follow_graph.follows(
+        request.user.pk, author.id
+    )
     context = {
         'title': 'Профайл пользователя',
-        'post_list': post_list,
+        'counters': user_counters(author),
         'author': author,
         'page_obj': page_obj,
         'following': following,
         'user_profile': request.user,
+        'feed_key': feed_cache.fragment_key(
+            request, feed_cache.author_feed(author.id)
+        ),
+        'feed_cache_timeout': FEED_CACHE_TIMEOUT,
     }
     return render(request, template, context)
 
 
+@query_budget(6)
+@conditional(post_validators)
+@anonymous_page_cache(page_cache.post_tag('{post_id}'))
 def post_detail(request, post_id):
     template = 'posts/post_detail.html'
-    get_post = Post.objects.get(id=post_id)
+    get_post = Post.objects.select_related(
+        'author__counters', 'group'
+    ).get(id=post_id)
     author = get_post.author
-    posts = Post.objects.filter(author=author)
+    # Число постов автора на странице меняется с каждым его постом
+    page_cache.depends_on(request, page_cache.author_tag(author.username))
     text = get_post.text
     created = get_post.created
     group = get_post.group
     form = CommentForm(request.POST or None)
     title = f'Пост: {text[0:29]}'
-    comments = Comment.objects.filter(post=get_post)
+    # Остальные комментарии подгружаются через post_comments
+    comments = get_comments_page(request, get_post.id)
     context = {
         'title': title,
         'created': created,
         'author': author,
-        'posts': posts,
+        'counters': user_counters(author),
         'group': group,
         'get_post': get_post,
         'text': text,
@@ -96,7 +165,52 @@ def post_detail(request, post_id):
     return render(request, template, context)
 
 
+@query_budget(3)
+def post_comments(request, post_id):
+    post = get_object_or_404(Post.objects.only('id'), id=post_id)
+    comments = get_comments_page(request, post.id)
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'comments': [
+                {
+                    'id': comment.id,
+                    'author': comment.author.username,
+                    'text': comment.text,
+                    'created': comment.created,
+                }
+                for comment in comments
+            ],
+            'next_cursor': comments.next_cursor(),
+        })
+    template = 'posts/includes/comments.html'
+    context = {
+        'post_id': post.id,
+        'comments': comments,
+    }
+    return render(request, template, context)
+
+
+@query_budget(4)
+def search(request):
+    query = request.GET.get('q', '').strip()
+    # Курсор хранит оценку релевантности и id последнего поста
+    posts, next_cursor = search_posts(
+        query, request.GET.get('after'), COUNT_POST
+    )
+    template = 'posts/search.html'
+    context = {
+        'title': f'Поиск: {query}' if query else 'Поиск',
+        'heading': 'Поиск по записям',
+        'query': query,
+        'posts': posts,
+        'next_cursor': next_cursor,
+    }
+    return render(request, template, context)
+
+
 @login_required
+@rate_limit('post_create', '10/m', methods=('POST',))
+@transaction.atomic
 def post_create(request):
     template = 'posts/create_post.html'
     form = PostForm(
@@ -113,6 +227,7 @@ def post_create(request):
 
 
 @login_required
+@transaction.atomic
 def post_edit(request, post_id):
     template = 'posts/create_post.html'
     get_post = get_object_or_404(Post, id=post_id)
@@ -128,7 +243,9 @@ def post_edit(request, post_id):
             if form.is_valid():
                 post = form.save(commit=False)
                 post.author = request.user
-                form.save()
+                # Сохраняем только поля формы, чтобы не затереть счётчики;
+                # updated меняет ETag страницы поста
+                post.save(update_fields=(*PostForm.Meta.fields, 'updated'))
                 return redirect('posts:post_detail', post_id=post_id)
             return (render(request, template,
                     {'form': form, 'is_edit': is_edit}))
@@ -137,6 +254,8 @@ def post_edit(request, post_id):
 
 
 @login_required
+@rate_limit('add_comment', '20/m', methods=('POST',))
+@transaction.atomic
 def add_comment(request, post_id):
     post = Post.objects.get(id=post_id)
     form = CommentForm(request.POST or None)
@@ -149,14 +268,12 @@ def add_comment(request, post_id):
 
 
 @login_required
+@query_budget(6)
 def follow_index(request):
-    user = request.user
-    author = user.follower.values('author')
-    # Подключен paginator
-    post_list = Post.objects.filter(author__id__in=author)
-    paginator = Paginator(post_list, COUNT_POST)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Лента собрана заранее при публикации постов; посты популярных
+    # авторов читаются отдельным запросом
+    paginator = TimelinePaginator(request.user, COUNT_POST)
+    page_obj = paginator.get_cursor_page(request.GET, lazy=False)
 
     title = 'Новые записи ваших авторов'
     heading = 'Новые записи ваших авторов'
@@ -170,6 +287,8 @@ def follow_index(request):
 
 
 @login_required
+@rate_limit('profile_follow', '30/m')
+@transaction.atomic
 def profile_follow(request, username):
     author = User.objects.get(username=username)
     if author != request.user:
@@ -181,6 +300,7 @@ def profile_follow(request, username):
 
 
 @login_required
+@transaction.atomic
 def profile_unfollow(request, username):
     author = User.objects.get(username=username)
     Follow.objects.filter(
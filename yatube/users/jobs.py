@@ -0,0 +1,12 @@
+from django.core.mail import EmailMultiAlternatives
+
+from core.jobs import task
+
+
+@task('users.send_email', priority=10)
+def send_email(subject, body, from_email, to, html_body=None):
+    """Отправляет письмо через EMAIL_BACKEND вне запроса."""
+    message = EmailMultiAlternatives(subject, body, from_email, to)
+    if html_body is not None:
+        message.attach_alternative(html_body, 'text/html')
+    message.send()
@@ -5,9 +5,10 @@ from django.contrib.auth.views import (LoginView, LogoutView,
                                        PasswordResetConfirmView,
                                        PasswordResetDoneView,
                                        PasswordResetView)
-from django.urls import path
+from django.urls import path, reverse_lazy
 
 from . import views
+from .forms import QueuedPasswordResetForm
 
 app_name = 'users'
 
@@ -37,8 +38,12 @@ urlpatterns = [
     ),
     path(
         'password_reset/',
-        PasswordResetView.as_view
-        (template_name='users/password_reset_form.html'),
+        PasswordResetView.as_view(
+            template_name='users/password_reset_form.html',
+            email_template_name='users/password_reset_email.html',
+            form_class=QueuedPasswordResetForm,
+            success_url=reverse_lazy('users:password_reset_done'),
+        ),
         name='password_reset_form'
     ),
     path(
@@ -48,9 +53,11 @@ urlpatterns = [
         name='password_reset_done'
     ),
     path(
-        'reset/<uid64>/<token>/',
-        PasswordResetConfirmView.as_view
-        (template_name='users/password_reset_confirm.html'),
+        'reset/<uidb64>/<token>/',
+        PasswordResetConfirmView.as_view(
+            template_name='users/password_reset_confirm.html',
+            success_url=reverse_lazy('users:reset_done'),
+        ),
         name='password_reset_confirm'
     ),
     path(
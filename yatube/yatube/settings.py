@@ -39,7 +39,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.server_timing.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.replica.ReplicaPinMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -47,6 +49,9 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'debug_toolbar.middleware.DebugToolbarMiddleware',
+    'core.middleware.query_budget.QueryBudgetMiddleware',
+    'core.middleware.ratelimit.RateLimitMiddleware',
+    'core.middleware.profiler.ProfilerMiddleware',
 ]
 
 INTERNAL_IPS = [
@@ -58,7 +63,7 @@ ROOT_URLCONF = 'yatube.urls'
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.timing.DjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -75,6 +80,8 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'yatube.wsgi.application'
 
+TEST_RUNNER = 'core.testing.TestRunner'
+
 
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
@@ -86,6 +93,21 @@ DATABASES = {
     }
 }
 
+# Реплики только для чтения. Локально их заменяют копии db.sqlite3:
+# файлы из списка подключаются под алиасами replica_1, replica_2...
+REPLICA_DATABASE_FILES = []
+for number, name in enumerate(REPLICA_DATABASE_FILES, 1):
+    DATABASES[f'replica_{number}'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, name),
+        # В тестах реплика - та же база, что и основная
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['core.db_router.ReplicaRouter']
+# Сколько секунд после записи клиент читает из основной базы
+REPLICA_PIN_SECONDS = 5
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -138,15 +160,133 @@ EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 COUNT_POST = 10
+# Сколько комментариев показывать на странице поста за раз
+COUNT_COMMENT = 20
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Фрагменты лент инвалидируются при записи, поэтому живут долго
+FEED_CACHE_TIMEOUT = 60 * 60 * 3
+# Целые страницы для анонимов; 0 - не кэшировать.
+# Ограничивает и жизнь страницы, потерянной картой зависимостей
+PAGE_CACHE_TIMEOUT = 60 * 10
+
+# Множества подписок читателей сбрасываются при подписке и отписке,
+# срок только ограничивает память под давно не заходивших
+FOLLOW_GRAPH_TIMEOUT = 60 * 60 * 24
+
+# Рекомендации авторов (команда recommend_follows): сколько хранить
+# на читателя и сколько соседей вершины графа брать в расчёт
+RECOMMEND_COUNT = 10
+RECOMMEND_FANOUT = 50
+# Сколько рекомендаций показывать на главной
+RECOMMEND_SHOW = 5
+
+# Популярное: оценка события вдвое меньше через TRENDING_HALF_LIFE
+# секунд. Оценки пересчитывает compact_trending, его надо запускать
+# хотя бы раз в несколько полупериодов (например, раз в час)
+TRENDING_HALF_LIFE = 60 * 60 * 6
+TRENDING_POST_WEIGHT = 1
+TRENDING_COMMENT_WEIGHT = 2
+# Угасшие ниже этой оценки удаляет compact_trending
+TRENDING_MIN_SCORE = 0.05
+# Сколько лучших держать в кэше и сколько показывать на главной
+TRENDING_SIZE = 50
+TRENDING_SHOW = 5
+# Через сколько секунд список лучших в кэше перечитывается из базы:
+# после гонки или сбоя он поправится не позже
+TRENDING_TOP_TIMEOUT = 60 * 5
+
+# Ограничение частоты запросов (отказы в /admin/ratelimit/).
+# RATE_LIMITS переопределяет лимиты декораторов rate_limit по их
+# области и задаёт лимиты view без декоратора по имени URL:
+# rate - 'число/период' (s, m, h, d), burst - размер всплеска,
+# methods - какие методы считать (None - все)
+RATE_LIMIT_ENABLED = True
+RATE_LIMITS = {
+    'users:login': {'rate': '10/m', 'methods': ('POST',)},
+    'users:signup': {'rate': '5/h', 'burst': 3, 'methods': ('POST',)},
+}
+
+# RSS и Atom: сколько последних постов и сколько секунд читалка
+# может не перепроверять ленту
+SYNDICATION_COUNT = 20
+SYNDICATION_MAX_AGE = 60
+
+# Кэш общий для всех процессов: сбросы из обработчиков run_jobs и
+# команд должны доходить до веб-процессов. Файлы подходят для одного
+# сервера, на нескольких нужен memcached с тем же TimedCacheMixin
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'LOCATION': '127.0.0.1:8000',
+        'BACKEND': 'core.timing.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache'),
+        'OPTIONS': {'MAX_ENTRIES': 50000},
     }
 }
+
+# Домашняя лента: авторов, у которых подписчиков больше лимита,
+# не раскладываем по лентам при публикации, а подмешиваем при чтении
+TIMELINE_FANOUT_LIMIT = 1000
+# Сколько записей раскладывать за один INSERT
+TIMELINE_BATCH_SIZE = 500
+# Сколько последних постов автора добавлять в ленту при подписке
+TIMELINE_BACKFILL_SIZE = 500
+# Сколько последних записей ленты читать; лишние удаляются при подписке
+TIMELINE_SIZE = 1000
+
+# Превышение бюджета запросов view: True - исключение, False - запись в лог
+QUERY_BUDGET_RAISE = False
+# Отдавать число запросов к БД в заголовке X-Query-Count (для benchmark)
+QUERY_COUNT_HEADER = False
+
+# Сколько потоков строят миниатюры в команде build_thumbnails
+THUMBNAIL_WORKERS = 2
+
+# Фоновые задачи (команда run_jobs): число процессов-обработчиков
+JOB_WORKERS = 2
+# Как часто обработчик без задач заглядывает в очередь, в секундах
+JOB_POLL_INTERVAL = 1
+# Через сколько секунд задача без ответа обработчика считается упавшей
+# попыткой. Должно быть больше самой долгой задачи: иначе её сочтут
+# упавшей и выполнят ещё раз, пока она идёт
+JOB_TIMEOUT = 10 * 60
+# Попыток на задачу; пауза между ними удваивается от первой до наибольшей
+JOB_MAX_ATTEMPTS = 5
+JOB_RETRY_DELAY = 10
+JOB_RETRY_MAX_DELAY = 60 * 60
+
+# Файлы хранятся по хэшу содержимого: одинаковые загрузки - один файл.
+# Миниатюры sorl называет сам, им нужно обычное хранилище
+DEFAULT_FILE_STORAGE = 'core.storage.ContentAddressedStorage'
+THUMBNAIL_STORAGE = 'django.core.files.storage.FileSystemStorage'
+
+# Загрузки больше этого размера Django пишет во временный файл
+FILE_UPLOAD_MAX_MEMORY_SIZE = 1024 * 1024
+# Картинки постов: наибольшая ширина и высота
+IMAGE_MAX_SIZE = (1920, 1920)
+# Формат и качество (1-95), в которые пережимаются картинки
+IMAGE_FORMAT = 'JPEG'
+IMAGE_QUALITY = 82
+# Больше точек не распаковываем: защита от «бомб»
+IMAGE_MAX_PIXELS = 50_000_000
+# Наибольший размер загружаемого файла в байтах
+IMAGE_MAX_UPLOAD_SIZE = 25 * 1024 * 1024
+
+# Профилирование запросов (отчёт в /admin/profiler/):
+# доля запросов в выборке
+PROFILER_SAMPLE_RATE = 0.01
+# Сохранять и запросы дольше порога в мс; None - только выборку.
+# С порогом стеки снимаются у всех запросов, это дороже
+PROFILER_SLOW_MS = None
+# Как часто снимать стеки, в секундах
+PROFILER_INTERVAL = 0.005
+# Сколько последних профилей хранить
+PROFILER_BUFFER_SIZE = 200
+# Глубина сохраняемого стека
+PROFILER_MAX_DEPTH = 64
+
+# Заголовок Server-Timing с временем БД, кэша, шаблонов и миниатюр
+SERVER_TIMING = True
@@ -3,7 +3,20 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
+from core.views import profiler_report, ratelimit_report
+
 urlpatterns = [
+    # Только для персонала: admin_view проверяет is_staff
+    path(
+        'admin/profiler/',
+        admin.site.admin_view(profiler_report),
+        name='profiler_report'
+    ),
+    path(
+        'admin/ratelimit/',
+        admin.site.admin_view(ratelimit_report),
+        name='ratelimit_report'
+    ),
     path('admin/', admin.site.urls),
     path('about/', include('about.urls', namespace='about')),
     path('auth/', include('users.urls', namespace='users')),